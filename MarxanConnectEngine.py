@@ -0,0 +1,2960 @@
+"""
+The engines of Marxan Connect, which don't need the GUI (or wx): reading and writing connectivity data within the
+memory budget, rescaling, boundary definitions, post-hoc evaluation, Marxan input and output files, the Python
+annealer, the landscape connectivity models, the project build graph and the profiler. MarxanConnectGUI builds on
+them, and the benchmarks (see benchmarks/) run them without the GUI.
+"""
+import time
+import os
+import sys
+import pandas
+import numpy
+import json
+import re
+import csv
+import math
+import platform
+import glob
+import hashlib
+import functools
+import collections
+import importlib
+import importlib.util
+import contextlib
+import inspect
+import concurrent.futures
+import threading
+import atexit
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+
+class LazyModule(object):
+    """
+    Stands in for a module which is only imported when one of its attributes is first used, so that the plotting and
+    spatial libraries are not loaded before the window appears. 'requires' are lazy modules loaded first, 'submodules'
+    are imported along with the module and 'setup' is called with the module once imported.
+    """
+    # seconds spent importing each lazy module, by name (see MarxanConnectGUI.startup_report)
+    import_times = {}
+    _lock = threading.RLock()
+
+    def __init__(self, name, requires=(), submodules=(), setup=None):
+        self.__dict__.update(_name=name, _requires=requires, _submodules=submodules, _setup=setup, _module=None)
+
+    def _load(self):
+        with LazyModule._lock:
+            if self._module is None:
+                start = time.time()
+                for module in self._requires:
+                    module._load()
+                module = importlib.import_module(self._name)
+                for submodule in self._submodules:
+                    importlib.import_module(submodule)
+                if self._setup is not None:
+                    self._setup(module)
+                LazyModule.import_times[self._name] = time.time() - start
+                self.__dict__['_module'] = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        return "<lazy module '" + self._name + "'" + (" (not imported)>" if self._module is None else ">")
+
+
+# the backend of matplotlib, which is used once it is imported (MarxanConnectGUI sets it to 'WXAgg')
+matplotlib_backend = None
+
+
+def use_matplotlib_backend(module):
+    if matplotlib_backend is not None:
+        module.use(matplotlib_backend)
+
+
+# matplotlib is imported along with marxanconpy, which plots with it
+matplotlib = LazyModule('matplotlib', submodules=['matplotlib.colors', 'matplotlib.cm', 'matplotlib.colorbar'],
+                        setup=use_matplotlib_backend)
+
+# spatial modules are imported when a shapefile is first read
+gpd = LazyModule('geopandas')
+shapely = LazyModule('shapely', submodules=['shapely.geometry', 'shapely.strtree'])
+
+# import MarxanConnect python module (which loads its own plotting and spatial modules) when first used
+marxanconpy = LazyModule('marxanconpy', requires=[matplotlib])
+
+
+# ########################## profiling #################################################################################
+
+def memory_mb():
+    """
+    Returns the resident memory of this process in MB (with psutil if it is installed, otherwise from /proc on Linux),
+    or None if it isn't available
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def cpu_seconds():
+    """
+    Returns the CPU time of this process and of its child processes which have ended (e.g. Marxan or the workers of
+    a process pool, once it is shut down). Child processes are not counted on Windows.
+    """
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+class Profiler(object):
+    """
+    Records named spans of work (read, reproject, overlay, rescale, metrics, export, marxan, ...) with their wall time,
+    CPU time (see cpu_seconds), the peak memory of the process during the span and how much it changed (sampled every
+    'sample_interval' seconds by a thread which waits while no span is open) and what was processed (e.g. 'rows').
+    Spans can be nested and come from any thread, but not from worker processes. The last 'max_spans' spans are kept,
+    each one is passed to the listeners (see MarxanConnectGUI.PerformancePanel) and, if a trace file is set, appended
+    to it as a Chrome trace event (chrome://tracing and https://ui.perfetto.dev open these files).
+    """
+    def __init__(self, max_spans=10000, sample_interval=0.05):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.spans = []
+        self.max_spans = max_spans
+        self.listeners = []
+        self.trace = None
+        self.trace_events = 0
+        self.wrapped = []
+        self.sample_interval = sample_interval
+        self.open = {}
+        self.sampling = threading.Event()
+        self.sampler = None
+
+    @contextlib.contextmanager
+    def span(self, name, min_seconds=0, **args):
+        """
+        Times the 'with' block as a span called 'name'. 'args' (e.g. file=...) are recorded with the span and the block
+        can add to them: "with profiler.span('read', file=f) as args: ... args['rows'] = len(table)". Spans shorter
+        than 'min_seconds' are not recorded.
+        """
+        depth = getattr(self.local, 'depth', 0)
+        self.local.depth = depth + 1
+        memory = memory_mb()
+        key = object()
+        self.start_sampling(key, memory)
+        start, cpu = time.time(), cpu_seconds()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = repr(e)
+            raise
+        finally:
+            self.local.depth = depth
+            wall = time.time() - start
+            end = memory_mb()
+            with self.lock:
+                peak = self.open.pop(key)
+            if wall >= min_seconds:
+                self.add({'name': name, 'start': start, 'wall': wall, 'cpu': cpu_seconds() - cpu,
+                          'peak_mb': None if end is None else max(peak, end),
+                          'delta_mb': None if end is None or memory is None else end - memory,
+                          'depth': depth, 'thread': threading.get_ident(), 'args': args})
+
+    def start_sampling(self, key, memory):
+        """
+        Tracks the peak memory of a new span, starting the sampling thread if it isn't running
+        """
+        with self.lock:
+            self.open[key] = memory if memory is not None else 0
+            if memory is None:
+                return
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self.sample, name='profiler sampler', daemon=True)
+                self.sampler.start()
+            self.sampling.set()
+
+    def sample(self):
+        while True:
+            self.sampling.wait()
+            memory = memory_mb() or 0
+            with self.lock:
+                for key, peak in self.open.items():
+                    self.open[key] = max(peak, memory)
+                if len(self.open) == 0:
+                    self.sampling.clear()
+            time.sleep(self.sample_interval)
+
+    def listen(self, listener):
+        """
+        Passes each new span to 'listener' and returns the spans recorded so far, so that none is missed or repeated
+        """
+        with self.lock:
+            self.listeners.append(listener)
+            return list(self.spans)
+
+    def unlisten(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+            del self.spans[:-self.max_spans]
+            if self.trace is not None:
+                self.write_trace(span)
+                self.trace.flush()
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(span)
+
+    def set_trace(self, filepath):
+        """
+        Writes the spans recorded so far, and then each new span, to the trace file 'filepath' (none if None). The
+        file is a JSON array of trace events, which is closed when the trace is stopped or the program exits.
+        """
+        with self.lock:
+            if self.trace is not None:
+                self.trace.write("\n]\n")
+                self.trace.close()
+                self.trace = None
+            if filepath is not None:
+                self.trace = open(filepath, 'w')
+                self.trace.write("[")
+                self.trace_events = 0
+                for span in self.spans:
+                    self.write_trace(span)
+                self.trace.flush()
+
+    def write_trace(self, span):
+        # events are separated (not followed) by commas, so that the closed file is valid JSON
+        self.trace.write(("\n" if self.trace_events == 0 else ",\n") + json.dumps(trace_event(span)))
+        self.trace_events += 1
+
+    def instrument(self, package, min_seconds=0.001):
+        """
+        Wraps the functions of the imported modules of 'package' (e.g. each metric of marxanconpy) in spans named
+        after them. A function is wrapped wherever it was imported, so that calls between the package's own modules
+        are timed too. Calls shorter than 'min_seconds' are not recorded.
+        """
+        wrappers = {}
+        for modname, module in list(sys.modules.items()):
+            if module is None or not (modname == package or modname.startswith(package + '.')):
+                continue
+            for attr, value in list(vars(module).items()):
+                origin = (value.__module__ or '') if inspect.isfunction(value) else ''
+                if (origin == package or origin.startswith(package + '.')) and not hasattr(value, '_profiled'):
+                    if value not in wrappers:
+                        wrappers[value] = self.wrap(value, value.__module__ + '.' + value.__name__, min_seconds)
+                    self.wrapped.append((module, attr, value))
+                    setattr(module, attr, wrappers[value])
+        return len(wrappers)
+
+    def uninstrument(self):
+        for module, attr, value in reversed(self.wrapped):
+            setattr(module, attr, value)
+        self.wrapped = []
+
+    def wrap(self, function, name, min_seconds):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.span(name, min_seconds=min_seconds):
+                return function(*args, **kwargs)
+        wrapper._profiled = True
+        return wrapper
+
+
+def trace_event(span):
+    """
+    Returns a span as a complete ('X') Chrome trace event
+    """
+    args = {k: v if isinstance(v, (int, float, bool, type(None))) else str(v) for k, v in span['args'].items()}
+    args.update({'cpu_seconds': round(span['cpu'], 6), 'peak_mb': span['peak_mb'], 'delta_mb': span['delta_mb']})
+    return {'name': span['name'], 'cat': 'marxanconpy' if span['name'].startswith('marxanconpy.') else 'MarxanConnect',
+            'ph': 'X', 'ts': int(span['start'] * 1e6), 'dur': int(span['wall'] * 1e6), 'pid': os.getpid(),
+            'tid': span['thread'], 'args': args}
+
+
+def profiled(name):
+    """
+    Decorator which records each call of a function as a span called 'name' (see Profiler.span)
+    """
+    def decorator(function):
+        return profiler.wrap(function, name, 0)
+    return decorator
+
+
+profiler = Profiler()
+atexit.register(profiler.set_trace, None)
+if os.environ.get('MARXANCONNECT_TRACE'):
+    profiler.set_trace(os.environ['MARXANCONNECT_TRACE'])
+
+
+# ########################## project defaults ##########################################################################
+
+def marxanconpy_version():
+    """
+    Returns the version of marxanconpy, read from the package without importing it (importing marxanconpy loads the
+    plotting and spatial modules)
+    """
+    if marxanconpy._module is not None:
+        return marxanconpy.__version__
+    try:
+        spec = importlib.util.find_spec('marxanconpy')
+        with open(spec.origin) as file:
+            for line in file:
+                version = re.match(r"""^__version__\s*=\s*['"]([^'"]+)['"]""", line)
+                if version:
+                    return version.group(1)
+    except Exception:
+        pass
+    return 'NA'
+
+
+def new_project(rootpath='.'):
+    """
+    Returns a new project dictionary with the same defaults as marxanconpy.marcon.new_project, so that a new project
+    (and the first window) does not wait for marxanconpy to be imported
+    """
+    project = {}
+    project['version'] = {}
+    project['version']['marxanconpy'] = marxanconpy_version()
+    project['version']['MarxanConnect'] = 'NA'
+    project['operating_system'] = platform.system()
+    project['filepaths'] = {}
+    project['options'] = {}
+
+    # set default options
+    project['options']['fa_status'] = "Status-quo"
+    project['options']['aa_status'] = "Status-quo"
+    project['options']['demo_pu_cm_progress'] = True
+    project['options']['demo_conmat_type'] = "Probability"
+    project['options']['demo_conmat_format'] = "Matrix"
+    project['options']['demo_conmat_rescale'] = "Identical Grids"
+    project['options']['demo_conmat_rescale_edge'] = "Proportional to overlap"
+    project['options']['land_hab_buff'] = "1"
+    project['options']['land_hab_thresh'] = "0.001"
+    project['options']['land_pu_cm_progress'] = True
+    project['options']['land_conmat_type'] = "Habitat Type + Resistance"
+    project['options']['land_res_matrixType'] = "Least-Cost Path"
+    project['options']['calc_metrics_pu'] = True
+    project['options']['calc_metrics_cu'] = False
+    project['options']['metricsCalculated'] = False
+
+    project['options']['demo_metrics'] = {}
+    for metric in ['in_degree', 'out_degree', 'between_cent', 'eig_vect_cent', 'google', 'self_recruit',
+                   'local_retention', 'outflow', 'inflow', 'stochasticity', 'fa_recipients', 'fa_donors',
+                   'aa_recipients', 'aa_donors', 'conn_boundary']:
+        project['options']['demo_metrics'][metric] = False
+
+    project['options']['land_metrics'] = {}
+    for metric in ['in_degree', 'out_degree', 'between_cent', 'eig_vect_cent', 'google', 'fa_recipients',
+                   'fa_donors', 'aa_recipients', 'aa_donors', 'conn_boundary']:
+        project['options']['land_metrics'][metric] = False
+
+    project['options']['cf_export'] = "Append"
+    project['options']['spec_set'] = "Proportion"
+    project['options']['targets'] = "0.5"
+
+    project['options']['bd_filecheck'] = True
+    project['options']['pudat_filecheck'] = True
+
+    project['options']['NUMREPS'] = "100"
+    project['options']['SCENNAME'] = "connect"
+    project['options']['NUMITNS'] = "1000000"
+    project['options']['marxan_CF'] = "New"
+    project['options']['marxan_bound'] = "New"
+    project['options']['inputdat_boundary'] = "Symmetric"
+    project['options']['CSM'] = "10"
+    project['options']['marxan_PU'] = "New"
+    project['options']['marxan_bit'] = "64-bit"
+    project['options']['marxan'] = "Marxan"
+
+    project['options']['pushp_filecheck'] = True
+    project['options']['pucsv_filecheck'] = True
+    project['options']['map_filecheck'] = True
+
+    # set default file paths
+    for filepath in ['pu_filepath', 'pu_file_pu_id', 'fa_filepath', 'aa_filepath',
+                     'demo_cu_filepath', 'demo_cu_file_pu_id', 'demo_cu_cm_filepath', 'demo_pu_cm_filepath',
+                     'land_cu_filepath', 'land_cu_file_hab_id', 'land_res_mat_filepath', 'land_res_filepath',
+                     'land_res_file_hab_id', 'land_pu_cm_filepath', 'lp_filepath']:
+        project['filepaths'][filepath] = ""
+
+    # Marxan metrics files
+    project['filepaths']['cf_filepath'] = os.path.join(rootpath, "input", "puvspr_connect.dat")
+    project['filepaths']['orig_cf_filepath'] = os.path.join(rootpath, "input", "puvspr.dat")
+    project['filepaths']['spec_filepath'] = os.path.join(rootpath, "input", "spec_connect.dat")
+    project['filepaths']['orig_spec_filepath'] = os.path.join(rootpath, "input", "spec.dat")
+    project['filepaths']['bd_filepath'] = os.path.join(rootpath, "input", "boundary_connect.dat")
+    project['filepaths']['orig_bd_filepath'] = os.path.join(rootpath, "input", "boundary.dat")
+    project['filepaths']['pudat_filepath'] = os.path.join(rootpath, "input", "pu_connect.dat")
+    project['filepaths']['orig_pudat_filepath'] = os.path.join(rootpath, "input", "pu.dat")
+
+    # Marxan analysis
+    project['filepaths']['marxan_template_input'] = "Default"
+    project['filepaths']['marxan_input'] = os.path.join(rootpath, "input.dat")
+
+    # Post-Hoc Evaluation
+    project['filepaths']['posthoc'] = os.path.join(rootpath, "output", "posthoc.csv")
+
+    # Export plot data
+    project['filepaths']['pushp'] = os.path.join(rootpath, "output", "pu.shp")
+    project['filepaths']['pucsv'] = os.path.join(rootpath, "output", "pu.csv")
+    project['filepaths']['map'] = os.path.join(rootpath, "output", "map.png")
+
+    return project
+
+
+def edit_working_directory(project, wd, type="relative"):
+    """
+    Makes the file paths in the project relative to the working directory wd (type='relative') or absolute
+    (type='absolute'), as marxanconpy.marcon.edit_working_directory does
+    """
+    for p in project['filepaths']:
+        if p != "working_directory":
+            if type == "relative" and project['filepaths'][p].startswith(wd):
+                project['filepaths'][p] = os.path.join('.', os.path.relpath(project['filepaths'][p], wd))
+            elif type == "absolute" and project['filepaths'][p].startswith('.'):
+                project['filepaths'][p] = os.path.abspath(project['filepaths'][p])
+    return project
+
+
+# ########################## memory budget #############################################################################
+
+def physical_memory_mb():
+    """
+    Returns the physical memory of the computer in MB (with psutil if it is installed), or None if it is unknown
+    """
+    try:
+        import psutil
+        return psutil.virtual_memory().total / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 2 ** 20
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+# memory (in MB) the engines can use before they switch to chunked processing (see set_memory_budget)
+memory_budget_mb = None
+
+
+def set_memory_budget(mb=None):
+    """
+    Sets the memory budget in MB. By default (None or '') it is MARXANCONNECT_MEMORY_BUDGET if that is set, otherwise
+    half of the physical memory (4 GB if that is unknown). Raises ValueError if it is not a number above 0.
+    """
+    global memory_budget_mb
+    if mb is None or str(mb).strip() == '':
+        mb = os.environ.get('MARXANCONNECT_MEMORY_BUDGET') or (physical_memory_mb() or 8192) / 2
+    mb = float(mb)
+    if not 0 < mb < numpy.inf:
+        raise ValueError("The memory budget must be above 0 MB, not " + str(mb))
+    memory_budget_mb = mb
+    return memory_budget_mb
+
+
+def over_budget(mb, what, fallback="Processing it in chunks."):
+    """
+    Returns True, and says so in the log, if 'what' is estimated to need more than the memory budget ('mb' MB)
+    """
+    if mb <= memory_budget_mb:
+        return False
+    print("Memory budget: " + what + " would need about " + str(int(mb)) + " MB, more than the budget of " +
+          str(int(memory_budget_mb)) + " MB. " + fallback)
+    return True
+
+
+def chunk_rows(row_mb, fraction=0.25):
+    """
+    Returns the number of rows (of 'row_mb' MB each) which fit in a fraction of the memory budget
+    """
+    return max(1, int(memory_budget_mb * fraction / max(row_mb, 1e-9)))
+
+
+# estimated memory, in MB, of the forms the connectivity data takes. Reading a dense csv matrix with pandas holds
+# about three copies of it, a table with string IDs takes about 250 bytes a row and csv text about 60 bytes a field
+# while it is formatted.
+def dense_matrix_mb(rows, cols, copies=3):
+    return rows * cols * 8.0 * copies / 2 ** 20
+
+
+def edge_table_mb(rows):
+    return rows * 250.0 / 2 ** 20
+
+
+def sparse_matrix_mb(rows, nnz):
+    return (nnz * 12.0 + rows * 8.0) / 2 ** 20
+
+
+def csv_text_mb(rows, cols):
+    return rows * cols * 60.0 / 2 ** 20
+
+
+def csv_separator(filepath):
+    """
+    Returns the separator of a csv or tab separated file, from its first line
+    """
+    with open(filepath, 'r') as file:
+        return '\t' if '\t' in file.readline() else ','
+
+
+def estimate_csv_rows(filepath, sample=1 << 16):
+    """
+    Estimates the number of lines of a text file from the length of its first lines
+    """
+    with open(filepath, 'rb') as file:
+        head = file.read(sample)
+    lines = max(head.count(b'\n'), 1)
+    return int(os.path.getsize(filepath) * lines / max(len(head), 1))
+
+
+def shapefile_records(filepath):
+    """
+    Returns the number of features of a shapefile, from the header of its .dbf file (None if it can't be read)
+    """
+    try:
+        with open(os.path.splitext(filepath)[0] + '.dbf', 'rb') as file:
+            return int.from_bytes(file.read(8)[4:8], 'little')
+    except (OSError, TypeError):
+        return None
+
+
+def conmat_read_mb(filepath, matrixformat):
+    """
+    Estimates the memory needed to read a connectivity matrix (a square "Matrix") or edge list in one piece
+    """
+    if matrixformat == "Matrix":
+        with open(filepath, 'r') as file:
+            n = len(file.readline().split(',')) - 1
+        return dense_matrix_mb(n, n)
+    return edge_table_mb(estimate_csv_rows(filepath))
+
+
+set_memory_budget()
+
+
+# ########################## connectivity engines ######################################################################
+
+def conmat_id_strings(ids):
+    """
+    Converts unit IDs to strings so that IDs read from shapefiles (often floats) and from csv headers match
+    """
+    ids = pandas.Series(ids)
+    try:
+        ids = ids.astype('int').astype('str')
+    except:
+        ids = ids.astype('str')
+    # a plain numpy array: numpy.isin is very slow on pandas' own string arrays
+    return numpy.asarray(ids, dtype='str')
+
+
+def conmat_group(matrixformat):
+    """
+    Returns the column of an edge list format which holds several matrices ('type', 'time' or 'habitat'), or None
+    """
+    return {"Edge List with Type": 'type',
+            "Edge List with Time": 'time',
+            "Edge List with Habitat": 'habitat'}.get(matrixformat)
+
+
+@profiled('read connectivity')
+def read_conmat_sparse(filepath, matrixformat, ids=None):
+    """
+    Reads a connectivity matrix or edge list as sparse matrices. Files which would not fit in the memory budget in one
+    piece are read in chunks (see read_conmat_sparse_chunked).
+
+    Returns the unit IDs (as strings) and a dictionary of CSR matrices keyed by the value of the type/time/habitat
+    column, or by None for the "Matrix" and "Edge List" formats. If 'ids' are supplied, rows and columns follow their
+    order and connections involving other IDs are dropped.
+    """
+    if over_budget(conmat_read_mb(filepath, matrixformat), "reading " + os.path.basename(filepath)):
+        return read_conmat_sparse_chunked(filepath, matrixformat, ids)
+
+    group = conmat_group(matrixformat)
+    if matrixformat == "Matrix":
+        conmat = pandas.read_csv(filepath, index_col=0)
+        rows = conmat_id_strings(conmat.index)
+        cols = conmat_id_strings(conmat.columns)
+        values = conmat.values
+        r, c = numpy.nonzero(values)
+        edges = pandas.DataFrame({'id1': rows[r], 'id2': cols[c], 'value': values[r, c]})
+        if ids is None:
+            ids = rows
+    else:
+        edges = marxanconpy.read_csv_tsv(filepath)
+        edges['id1'] = conmat_id_strings(edges['id1'])
+        edges['id2'] = conmat_id_strings(edges['id2'])
+        edges = edges[edges['value'] != 0]
+        if ids is None:
+            ids = numpy.unique(numpy.concatenate([edges['id1'].values, edges['id2'].values]))
+
+    ids = numpy.asarray(ids).astype('str')
+    lookup = pandas.Series(numpy.arange(len(ids)), index=ids)
+    edges = edges.assign(i=lookup.reindex(edges['id1'].values).values,
+                         j=lookup.reindex(edges['id2'].values).values).dropna(subset=['i', 'j'])
+
+    conmats = {}
+    for key, e in (edges.groupby(group, sort=False) if group else [(None, edges)]):
+        conmats[key] = scipy.sparse.csr_matrix((e['value'].values.astype('float'),
+                                                (e['i'].values.astype('int'), e['j'].values.astype('int'))),
+                                               shape=(len(ids), len(ids)))
+    return ids, conmats
+
+
+def read_conmat_chunks(filepath, matrixformat, chunksize):
+    """
+    Yields the non-zero connections of a connectivity matrix or edge list as edge list tables, 'chunksize' rows of the
+    file at a time
+    """
+    if matrixformat == "Matrix":
+        for chunk in pandas.read_csv(filepath, index_col=0, chunksize=chunksize):
+            rows = conmat_id_strings(chunk.index)
+            cols = conmat_id_strings(chunk.columns)
+            values = chunk.values
+            r, c = numpy.nonzero(values)
+            yield pandas.DataFrame({'id1': rows[r], 'id2': cols[c], 'value': values[r, c]})
+    else:
+        for chunk in pandas.read_csv(filepath, sep=csv_separator(filepath), chunksize=chunksize):
+            chunk = chunk[chunk['value'] != 0]
+            yield chunk.assign(id1=conmat_id_strings(chunk['id1']), id2=conmat_id_strings(chunk['id2']))
+
+
+def read_conmat_sparse_chunked(filepath, matrixformat, ids=None):
+    """
+    Reads a connectivity matrix or edge list like 'read_conmat_sparse', but a chunk of rows at a time: only the
+    non-zero connections, as row and column indices, are ever held in memory. Without 'ids', the IDs are read in a
+    first pass over the file.
+    """
+    group = conmat_group(matrixformat)
+    if matrixformat == "Matrix":
+        with open(filepath, 'r') as file:
+            n = len(file.readline().split(',')) - 1
+        chunksize = chunk_rows(dense_matrix_mb(1, n))
+        if ids is None:
+            ids = conmat_id_strings(pandas.read_csv(filepath, usecols=[0]).iloc[:, 0])
+    else:
+        chunksize = chunk_rows(edge_table_mb(1))
+        if ids is None:
+            ids = numpy.array([], dtype='str')
+            for chunk in pandas.read_csv(filepath, sep=csv_separator(filepath), usecols=['id1', 'id2', 'value'],
+                                         chunksize=chunksize):
+                chunk = chunk[chunk['value'] != 0]
+                ids = numpy.union1d(ids, numpy.union1d(conmat_id_strings(chunk['id1']),
+                                                       conmat_id_strings(chunk['id2'])))
+
+    ids = numpy.asarray(ids).astype('str')
+    lookup = pandas.Series(numpy.arange(len(ids)), index=ids)
+    parts = {}
+    for edges in read_conmat_chunks(filepath, matrixformat, chunksize):
+        edges = edges.assign(i=lookup.reindex(edges['id1'].values).values,
+                             j=lookup.reindex(edges['id2'].values).values).dropna(subset=['i', 'j'])
+        for key, e in (edges.groupby(group, sort=False) if group else [(None, edges)]):
+            parts.setdefault(key, []).append((e['i'].values.astype('int32'), e['j'].values.astype('int32'),
+                                              e['value'].values.astype('float')))
+
+    conmats = {}
+    for key, p in parts.items():
+        conmats[key] = scipy.sparse.csr_matrix((numpy.concatenate([v for i, j, v in p]),
+                                                (numpy.concatenate([i for i, j, v in p]),
+                                                 numpy.concatenate([j for i, j, v in p]))),
+                                               shape=(len(ids), len(ids)))
+    if len(conmats) == 0 and group is None:
+        conmats[None] = scipy.sparse.csr_matrix((len(ids), len(ids)))
+    return ids, conmats
+
+
+def write_conmat_sparse(filepath, conmats, ids, matrixformat):
+    """
+    Writes sparse connectivity matrices (as returned by 'read_conmat_sparse') in the given format. Matrices which
+    would not fit in the memory budget as a dense matrix or a table are written a chunk of rows at a time.
+    """
+    group = conmat_group(matrixformat)
+    if matrixformat == "Matrix":
+        conmat = conmats[None].tocsr()
+        rows = len(ids)
+        if over_budget(dense_matrix_mb(len(ids), len(ids), copies=2), "writing " + os.path.basename(filepath)):
+            rows = chunk_rows(dense_matrix_mb(1, len(ids), copies=2))
+        with open(filepath, 'w', newline='') as file:
+            for start in range(0, len(ids), rows):
+                pandas.DataFrame(conmat[start:start + rows].toarray(), index=ids[start:start + rows],
+                                 columns=ids).to_csv(file, index=True, header=start == 0)
+        return
+
+    nnz = sum(conmat.nnz for conmat in conmats.values())
+    if over_budget(edge_table_mb(nnz), "writing " + os.path.basename(filepath)):
+        rows = chunk_rows(edge_table_mb(1))
+        with open(filepath, 'w', newline='') as file:
+            file.write(",".join(([group] if group else []) + ['id1', 'id2', 'value']) + "\n")
+            for key, conmat in conmats.items():
+                conmat = conmat.tocoo()
+                for start in range(0, conmat.nnz, rows):
+                    e = {'id1': ids[conmat.row[start:start + rows]], 'id2': ids[conmat.col[start:start + rows]],
+                         'value': conmat.data[start:start + rows]}
+                    if group:
+                        e = dict([(group, numpy.repeat(key, len(e['value'])))] + list(e.items()))
+                    file.write(format_csv_table(e, header=False))
+        return
+
+    edges = []
+    for key, conmat in conmats.items():
+        conmat = conmat.tocoo()
+        e = pandas.DataFrame({'id1': ids[conmat.row], 'id2': ids[conmat.col], 'value': conmat.data})
+        if group:
+            e.insert(0, group, key)
+        edges.append(e)
+    pandas.concat(edges).to_csv(filepath, index=False, header=True)
+
+
+def boundary_conmat(filepath, matrixformat, hab_thresh=0):
+    """
+    Reads a planning unit connectivity matrix for use as a connectivity boundary. Files with several matrices (types,
+    times or habitats) are averaged over the matrices listed for each pair of units (see read_conmat_mean). In an
+    "Edge List with Habitat", connectivity under 'hab_thresh' is 0 (as in the landscape metrics) before the habitats
+    are averaged.
+
+    Returns the planning unit IDs (as strings) and the sparse matrix
+    """
+    if conmat_group(matrixformat) is None:
+        ids, conmats = read_conmat_sparse(filepath, matrixformat)
+    else:
+        ids, conmats = read_conmat_mean(filepath, threshold=hab_thresh if matrixformat == "Edge List with Habitat"
+                                        else 0)
+    return ids, conmats[None]
+
+
+def boundary_threshold(project):
+    """
+    Returns the connectivity at or below which connections are left out of connectivity boundary files (0 if it is
+    empty). Raises ValueError with a message for the user if it is not a number.
+    """
+    threshold = str(project['options'].get('bd_threshold', '')).strip()
+    if threshold == '':
+        return 0
+    try:
+        return float(threshold)
+    except ValueError:
+        raise ValueError("The connectivity boundary threshold must be a number (or empty for 0), not '" + threshold +
+                         "'.")
+
+
+def write_boundary_sparse(filepath, conmat, ids, threshold=0, chunksize=1000000):
+    """
+    Streams the connections of a sparse connectivity matrix to a boundary definition file (id1,id2,boundary) without
+    ever building it as a table. Connections weaker than or equal to 'threshold' are dropped. The rows are written
+    'chunksize' connections at a time, to a temporary file which only replaces 'filepath' if the content changed (see
+    replace_if_changed).
+
+    Returns the number of connections written and whether the file was replaced
+    """
+    conmat = scipy.sparse.csr_matrix(conmat)
+    conmat.eliminate_zeros()
+    rows = numpy.repeat(numpy.arange(conmat.shape[0]), numpy.diff(conmat.indptr))
+    written = 0
+    digest = hashlib.blake2b()
+    with open(filepath + '.tmp', 'wb') as f:
+        for start in range(0, max(conmat.nnz, 1), chunksize):
+            stop = min(start + chunksize, conmat.nnz)
+            value = conmat.data[start:stop]
+            keep = value > threshold
+            data = format_csv_table({'id1': ids[rows[start:stop][keep]],
+                                     'id2': ids[conmat.indices[start:stop][keep]],
+                                     'boundary': value[keep]}, header=start == 0).encode('utf8')
+            digest.update(data)
+            f.write(data)
+            written += int(keep.sum())
+    return written, replace_if_changed(filepath + '.tmp', filepath, digest.hexdigest())
+
+
+def min_plan_graph(conmat, method="Kruskal"):
+    """
+    Builds the minimum planning graph of a connectivity matrix: the spanning tree (a forest if the graph is not
+    connected) which keeps the strongest connections. Connections are undirected (C + C^T) and the tree minimises the
+    sum of 1/connectivity.
+
+    'method' is "Kruskal" (scipy's sparse implementation) or "Boruvka" (see 'boruvka_spanning_tree'). Returns the
+    undirected connectivity of the tree's edges as a sparse upper triangular matrix.
+    """
+    conmat = scipy.sparse.csr_matrix(conmat)
+    strength = scipy.sparse.triu(conmat + conmat.T, k=1).tocoo()
+    keep = strength.data > 0
+    rows, cols, strength = strength.row[keep], strength.col[keep], strength.data[keep]
+    n = conmat.shape[0]
+
+    if method == "Kruskal":
+        tree = scipy.sparse.csgraph.minimum_spanning_tree(
+            scipy.sparse.csr_matrix((1.0 / strength, (rows, cols)), shape=(n, n))).tocoo()
+        rows, cols, strength = numpy.minimum(tree.row, tree.col), numpy.maximum(tree.row, tree.col), 1.0 / tree.data
+    elif method == "Boruvka":
+        selected = boruvka_spanning_tree(rows, cols, 1.0 / strength, n)
+        rows, cols, strength = rows[selected], cols[selected], strength[selected]
+    else:
+        raise Exception("Unknown minimum planning graph method: " + str(method))
+    return scipy.sparse.csr_matrix((strength, (rows, cols)), shape=(n, n))
+
+
+def boruvka_spanning_tree(rows, cols, weights, n):
+    """
+    Boruvka's minimum spanning tree algorithm on an edge list. Every round finds the cheapest edge leaving each
+    component for all components at once (vectorised over the edges) and merges along them, so it needs at most
+    log2(n) rounds. Ties are broken by edge order, which makes the tree unique.
+
+    Returns a boolean mask of the selected edges
+    """
+    m = len(weights)
+    order = numpy.lexsort((numpy.arange(m), weights))
+    rank = numpy.empty(m, dtype='int')
+    rank[order] = numpy.arange(m)
+
+    component = numpy.arange(n)
+    selected = numpy.zeros(m, dtype='bool')
+    active = numpy.arange(m)
+    while True:
+        a, b = component[rows[active]], component[cols[active]]
+        crossing = a != b
+        active, a, b = active[crossing], a[crossing], b[crossing]
+        if len(active) == 0:
+            break
+
+        # cheapest edge leaving each component
+        cheapest = numpy.full(n, m, dtype='int')
+        numpy.minimum.at(cheapest, numpy.concatenate([a, b]), numpy.tile(rank[active], 2))
+        chosen = order[numpy.unique(cheapest[cheapest < m])]
+        selected[chosen] = True
+
+        merged = scipy.sparse.csr_matrix((numpy.ones(len(chosen)), (component[rows[chosen]], component[cols[chosen]])),
+                                         shape=(n, n))
+        component = scipy.sparse.csgraph.connected_components(merged, directed=False)[1][component]
+    return selected
+
+
+def rescale_weights(pu_filepath, pu_id, cu_filepath, cu_id, edge="Proportional to overlap"):
+    """
+    Computes the overlay of connectivity units (rows) and planning units (columns) as a sparse weight matrix.
+
+    As in marxanconpy.spatial.rescale_matrix, with "Proportional to overlap" each weight is the share of the covered
+    part of the planning unit which overlaps the connectivity unit, otherwise it is the share of the whole planning
+    unit. A connectivity matrix C is rescaled to the planning units as W.T * C * W.
+    """
+    with profiler.span('read', file=pu_filepath) as args:
+        pu = gpd.GeoDataFrame.from_file(pu_filepath)
+        args['rows'] = pu.shape[0]
+    with profiler.span('read', file=cu_filepath) as args:
+        cu = gpd.GeoDataFrame.from_file(cu_filepath)
+        args['rows'] = cu.shape[0]
+    with profiler.span('reproject', rows=pu.shape[0] + cu.shape[0]):
+        pu = pu.to_crs('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
+        proj = marxanconpy.spatial.get_appropriate_projection(pu, 'area')
+        pu = pu.to_crs(proj)
+        cu = cu.to_crs(proj)
+
+    pu_ids = conmat_id_strings(pu[pu_id])
+    cu_ids = conmat_id_strings(cu[cu_id])
+    pu['pu_index'] = numpy.arange(pu.shape[0])
+    cu['cu_index'] = numpy.arange(cu.shape[0])
+
+    with profiler.span('overlay') as args:
+        overlay = gpd.overlay(cu[['cu_index', 'geometry']], pu[['pu_index', 'geometry']], how='intersection')
+        args['rows'] = overlay.shape[0]
+    area = overlay.geometry.area.values
+    pu_index = overlay['pu_index'].values.astype('int')
+    cu_index = overlay['cu_index'].values.astype('int')
+    if edge == "Proportional to overlap":
+        covered = numpy.bincount(pu_index, weights=area, minlength=pu.shape[0])
+        weight = area / covered[pu_index]
+    else:
+        weight = area / pu.geometry.area.values[pu_index]
+
+    weights = scipy.sparse.csr_matrix((weight, (cu_index, pu_index)), shape=(cu.shape[0], pu.shape[0]))
+    return pu_ids, cu_ids, weights
+
+
+@profiled('rescale')
+def rescale_matrix_sparse(pu_filepath, pu_id, cu_filepath, cu_id, cm_filepath, outpath, matrixformat="Matrix",
+                          edge="Proportional to overlap"):
+    """
+    Rescales a connectivity matrix to the planning units (as marxanconpy.spatial.rescale_matrix does) and writes it to
+    'outpath' in the same format. The matrix is read, rescaled and written as sparse matrices within the memory budget
+    (see read_conmat_sparse and write_conmat_sparse). An "Edge List with Time" is rescaled for each time step, and
+    the mean over time is also written as a "Matrix" to '<outpath>_mean_of_times.csv'.
+    """
+    pu_ids, cu_ids, weights = rescale_weights(pu_filepath, pu_id, cu_filepath, cu_id, edge)
+    ids, conmats = read_conmat_sparse(cm_filepath, matrixformat, ids=cu_ids)
+    nnz = 0
+    for key in conmats:
+        conmats[key] = (weights.T @ conmats[key] @ weights).tocsr()
+        nnz += conmats[key].nnz
+    write_conmat_sparse(outpath, conmats, pu_ids, matrixformat)
+    if matrixformat == "Edge List with Time":
+        ids, mean = read_conmat_mean(cm_filepath, ids=cu_ids)
+        write_conmat_sparse(str.replace(outpath, '.csv', '_mean_of_times.csv'),
+                            {None: (weights.T @ mean[None] @ weights).tocsr()}, pu_ids, "Matrix")
+    print("Connectivity matrix of " + str(len(cu_ids)) + " connectivity units rescaled to " + str(len(pu_ids)) +
+          " planning units (" + str(nnz) + " connections)")
+
+
+# state shared by the batch rescaling worker processes (set once per process by '_init_rescale_worker')
+_rescale_worker_state = {}
+
+
+def _init_rescale_worker(weights, pu_ids, cu_ids, budget):
+    set_memory_budget(budget)
+    _rescale_worker_state['weights'] = weights
+    _rescale_worker_state['pu_ids'] = pu_ids
+    _rescale_worker_state['cu_ids'] = cu_ids
+
+
+def _rescale_worker(filepath, outpath, matrixformat):
+    weights = _rescale_worker_state['weights']
+    report = {'filepath': filepath, 'outpath': outpath, 'status': 'ok', 'nnz': 0}
+    try:
+        start = time.time()
+        ids, conmats = read_conmat_sparse(filepath, matrixformat, ids=_rescale_worker_state['cu_ids'])
+        report['read_seconds'] = time.time() - start
+
+        start = time.time()
+        for key in conmats:
+            conmats[key] = (weights.T @ conmats[key] @ weights).tocsr()
+            report['nnz'] += conmats[key].nnz
+        report['rescale_seconds'] = time.time() - start
+
+        start = time.time()
+        write_conmat_sparse(outpath, conmats, _rescale_worker_state['pu_ids'], matrixformat)
+        report['write_seconds'] = time.time() - start
+    except Exception as e:
+        report['status'] = repr(e)
+    return report
+
+
+@profiled('rescale')
+def batch_rescale_matrices(filepaths, outdir, pu_filepath, pu_id, cu_filepath, cu_id, matrixformat="Matrix",
+                           edge="Proportional to overlap", processes=None, suffix="_pu", callback=None):
+    """
+    Rescales many connectivity matrices to the planning units. The overlay is computed once, then the sparse products
+    run in a process pool and each input is written to 'outdir' as '<name><suffix>.csv' in the same format.
+
+    'filepaths' is a list of files or a glob pattern. 'callback(done, files)' is called as the files are rescaled.
+    Returns a timing report with one row per input file.
+    """
+    if isinstance(filepaths, str):
+        filepaths = sorted(glob.glob(filepaths))
+    if len(filepaths) == 0:
+        raise Exception("No connectivity matrices to rescale")
+
+    start = time.time()
+    pu_ids, cu_ids, weights = rescale_weights(pu_filepath, pu_id, cu_filepath, cu_id, edge)
+    overlay_seconds = time.time() - start
+    print("Overlay of " + str(len(cu_ids)) + " connectivity units and " + str(len(pu_ids)) +
+          " planning units computed in " + str(round(overlay_seconds, 2)) + " seconds")
+
+    outpaths = [os.path.join(outdir, os.path.splitext(os.path.basename(f))[0] + suffix + '.csv') for f in filepaths]
+    # the workers share the memory budget
+    processes = min(processes or os.cpu_count() or 1, len(filepaths))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes,
+                                                initializer=_init_rescale_worker,
+                                                initargs=(weights, pu_ids, cu_ids,
+                                                          memory_budget_mb / processes)) as pool:
+        futures = [pool.submit(_rescale_worker, f, o, matrixformat) for f, o in zip(filepaths, outpaths)]
+        if callback is not None:
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                callback(done, len(futures))
+        report = pandas.DataFrame([f.result() for f in futures])
+
+    report['overlay_seconds'] = overlay_seconds
+    print("Batch rescaling completed in " + str(round(time.time() - start, 2)) + " seconds")
+    print(report.to_string(index=False))
+    return report
+
+
+# ########################## post-hoc engine ###########################################################################
+
+# sparse connectivity graphs already read for post-hoc evaluation, keyed by (file path, modification time, format)
+_posthoc_graph_cache = {}
+
+
+def posthoc_graph(filepath, matrixformat):
+    """
+    Reads a planning unit connectivity file for post-hoc evaluation once, and then returns it from the cache for as
+    long as the file is unchanged (see 'read_conmat_sparse'). An "Edge List with Time" is averaged over time (see
+    'read_conmat_mean').
+    """
+    key = (os.path.abspath(filepath), os.path.getmtime(filepath), matrixformat)
+    if key not in _posthoc_graph_cache:
+        _posthoc_graph_cache.clear()
+        if matrixformat == "Edge List with Time":
+            _posthoc_graph_cache[key] = read_conmat_mean(filepath)
+        else:
+            _posthoc_graph_cache[key] = read_conmat_sparse(filepath, matrixformat)
+    return _posthoc_graph_cache[key]
+
+
+def read_conmat_mean(filepath, ids=None, threshold=0):
+    """
+    Reads an edge list with several matrices ("Edge List with Time", "with Type" or "with Habitat") as one sparse
+    matrix of the mean connectivity between each pair of units over the matrices (time steps, types or habitats) listed
+    for that pair, as marxanconpy does (e.g. in marxanconpy.posthoc.calc_postHoc), a chunk of rows at a time.
+    Connectivity under 'threshold' counts as 0. Returns the unit IDs and a dictionary {None: matrix}, like
+    'read_conmat_sparse'.
+    """
+    pairs = []
+    for chunk in pandas.read_csv(filepath, sep=csv_separator(filepath), usecols=['id1', 'id2', 'value'],
+                                 chunksize=chunk_rows(edge_table_mb(1))):
+        chunk = chunk.assign(id1=conmat_id_strings(chunk['id1']), id2=conmat_id_strings(chunk['id2']))
+        if threshold > 0:
+            chunk['value'] = chunk['value'].where(chunk['value'] >= threshold, 0)
+        pairs.append(chunk.groupby(['id1', 'id2'])['value'].agg(['sum', 'count']))
+    pairs = pandas.concat(pairs).groupby(level=[0, 1]).sum()
+    mean = pairs['sum'] / pairs['count']
+    mean = mean[mean != 0]
+    id1 = mean.index.get_level_values(0).values.astype('str')
+    id2 = mean.index.get_level_values(1).values.astype('str')
+    if ids is None:
+        ids = numpy.unique(numpy.concatenate([id1, id2]))
+
+    ids = numpy.asarray(ids).astype('str')
+    lookup = pandas.Series(numpy.arange(len(ids)), index=ids)
+    i, j = lookup.reindex(id1).values, lookup.reindex(id2).values
+    keep = ~(numpy.isnan(i) | numpy.isnan(j))
+    return ids, {None: scipy.sparse.csr_matrix((mean.values[keep].astype('float'),
+                                                (i[keep].astype('int'), j[keep].astype('int'))),
+                                               shape=(len(ids), len(ids)))}
+
+
+def graph_eigenvalue(conmat):
+    """
+    Dominant eigenvalue of a sparse connectivity matrix
+    """
+    if conmat.shape[0] == 0 or conmat.nnz == 0:
+        return 0.0
+    if conmat.shape[0] < 3:
+        return numpy.linalg.eigvals(conmat.toarray()).real.max()
+    try:
+        return scipy.sparse.linalg.eigs(conmat, k=1, which='LR', return_eigenvectors=False)[0].real
+    except scipy.sparse.linalg.ArpackNoConvergence:
+        return numpy.linalg.eigvals(conmat.toarray()).real.max()
+
+
+def subgraph_eigenvalues(conmat, S, dense_max=64):
+    """
+    Dominant eigenvalues of the subgraphs of a sparse connectivity matrix selected by each row of a selection matrix S
+    (see calc_postHoc_replicates), all solved together. The subgraphs are cut out of the matrix at once, as one
+    block diagonal matrix, and split into strongly connected components: the eigenvalues of a subgraph are those of
+    its components, so its dominant eigenvalue is the largest of theirs. A component of one unit has its
+    self-connection as eigenvalue, components of up to 'dense_max' units are solved in stacks of dense matrices (padded
+    with zeros, which doesn't change the dominant eigenvalue of a non-negative matrix) which fit in the memory budget
+    and larger ones one by one (see graph_eigenvalue).
+    """
+    conmat = scipy.sparse.csr_matrix(conmat)
+    S = scipy.sparse.csr_matrix(S)
+    S.sort_indices()
+    block = numpy.repeat(numpy.arange(S.shape[0]), numpy.diff(S.indptr))
+
+    # the connections of every selected unit, kept if they go to a unit of the same subgraph
+    rows = conmat[S.indices]
+    source = numpy.repeat(numpy.arange(S.nnz), numpy.diff(rows.indptr))
+    keys = block.astype('int64') * conmat.shape[1] + S.indices
+    targets = block[source].astype('int64') * conmat.shape[1] + rows.indices
+    target = numpy.minimum(numpy.searchsorted(keys, targets), max(S.nnz - 1, 0))
+    inside = (keys[target] == targets) & (rows.data != 0) if S.nnz else numpy.zeros(0, dtype='bool')
+    subgraphs = scipy.sparse.csr_matrix((rows.data[inside], (source[inside], target[inside])), shape=(S.nnz, S.nnz))
+
+    count, component = scipy.sparse.csgraph.connected_components(subgraphs, directed=True, connection='strong')
+    sizes = numpy.bincount(component, minlength=count)
+    order = numpy.argsort(component, kind='stable')
+    position = numpy.empty(S.nnz, dtype='int')
+    position[order] = numpy.arange(S.nnz) - numpy.repeat(numpy.cumsum(sizes) - sizes, sizes)
+    eigenvalue = numpy.zeros(count)
+    eigenvalue[component[sizes[component] == 1]] = subgraphs.diagonal()[sizes[component] == 1]
+
+    # the connections within each component of more than one unit, by component
+    edges = subgraphs.tocoo()
+    within = (component[edges.row] == component[edges.col]) & (sizes[component[edges.row]] > 1)
+    by_component = numpy.argsort(component[edges.row[within]], kind='stable')
+    edge_component = component[edges.row[within]][by_component]
+    edge_rows = position[edges.row[within]][by_component]
+    edge_cols = position[edges.col[within]][by_component]
+    edge_values = edges.data[within][by_component]
+    starts = numpy.searchsorted(edge_component, numpy.arange(count + 1))
+
+    small = [c for c in numpy.argsort(sizes, kind='stable') if 1 < sizes[c] <= dense_max]
+    step = chunk_rows(dense_matrix_mb(dense_max, dense_max, copies=2))
+    for chunk in range(0, len(small), step):
+        stack = small[chunk:chunk + step]
+        dense = numpy.zeros((len(stack), sizes[stack].max(), sizes[stack].max()))
+        for i, c in enumerate(stack):
+            edges_c = slice(starts[c], starts[c + 1])
+            numpy.add.at(dense[i], (edge_rows[edges_c], edge_cols[edges_c]), edge_values[edges_c])
+        eigenvalue[stack] = numpy.linalg.eigvals(dense).real.max(axis=1)
+    for c in numpy.flatnonzero(sizes > dense_max):
+        edges_c = slice(starts[c], starts[c + 1])
+        eigenvalue[c] = graph_eigenvalue(scipy.sparse.csr_matrix(
+            (edge_values[edges_c], (edge_rows[edges_c], edge_cols[edges_c])), shape=(sizes[c], sizes[c])))
+
+    eigenvalues = numpy.zeros(S.shape[0])
+    numpy.maximum.at(eigenvalues, block[order[numpy.cumsum(sizes) - sizes]], eigenvalue)
+    return eigenvalues
+
+
+# the size and spacing metrics of a solution (see calc_postHoc_spatial), which have no planning area value
+postHoc_spatial_metrics = ["Mean Size (km^2)", "Mean Min Spacing (km)", "ProtConn (10 km)", "ProtConn (50 km)",
+                           "ProtConn (150 km)"]
+
+
+def postHoc_projections(pu):
+    """
+    Returns the planning units (in longitude/latitude) in the equal-area and the equal-distance projections used by
+    'calc_postHoc_spatial'
+    """
+    return (pu.to_crs(marxanconpy.spatial.get_appropriate_projection(pu, 'area')),
+            pu.to_crs(marxanconpy.spatial.get_appropriate_projection(pu, 'distance')))
+
+
+def calc_postHoc_spatial(pu_area, pu_dist, IDs, selectionIDs):
+    """
+    Returns the size and spacing metrics of a solution (in the order of 'postHoc_spatial_metrics'), as
+    marxanconpy.posthoc.calc_postHoc does: the mean area of its reserves (the parts of the union of its planning
+    units), the mean distance from each reserve to the nearest other one and the proportion of reserves within 10, 50
+    and 150 km of another. 'pu_area' and 'pu_dist' are the planning units, in the order of 'IDs', in the projections
+    returned by 'postHoc_projections'.
+    """
+    selected = pandas.Series(IDs).isin(selectionIDs).values
+    if not selected.any():
+        return [numpy.nan] * len(postHoc_spatial_metrics)
+    reserves_area = pu_area[selected].geometry.unary_union
+    reserves_area = gpd.GeoSeries(list(getattr(reserves_area, 'geoms', [reserves_area])))
+    reserves = pu_dist[selected].geometry.unary_union
+    reserves = gpd.GeoSeries(list(getattr(reserves, 'geoms', [reserves])))
+
+    min_dist = numpy.array([reserves.distance(reserve).values for reserve in reserves])
+    min_dist[min_dist == 0] = min_dist.max()
+    return [round(reserves_area.area.mean() / 1000000, 1),
+            round(min_dist.min(axis=1).mean() / 1000, 1),
+            (min_dist < 10000).any(axis=1).mean(),
+            (min_dist < 50000).any(axis=1).mean(),
+            (min_dist < 150000).any(axis=1).mean()]
+
+
+@profiled('post-hoc')
+def calc_postHoc_sparse(filepath, matrixformat, IDs, selectionIDs, pu=None):
+    """
+    Compares a solution ('selectionIDs') to the whole planning area ('IDs'), with the same metrics as
+    marxanconpy.posthoc.calc_postHoc.
+
+    The number of planning units and, if the planning units 'pu' (in longitude/latitude) are given, the size and
+    spacing of the reserves (see 'calc_postHoc_spatial', with an empty 'Planning Area' and 'Percent') are followed by
+    the connectivity metrics. The connectivity graph is read once (see 'posthoc_graph') and the solution is evaluated
+    by masking it: the number of connections, the graph density (connections / (units * (units - 1))) and the dominant
+    eigenvalue. Files with several matrices (types or habitats) get one set of connectivity metrics per 'Type'.
+    """
+    units = numpy.array([len(IDs), len(selectionIDs)], dtype='float')
+    conmats = {}
+    if os.path.isfile(filepath):
+        graph_ids, conmats = posthoc_graph(filepath, matrixformat)
+    typed = len(conmats) > 1 or (len(conmats) == 1 and list(conmats)[0] is not None)
+
+    metrics = [("Planning Units", 'All', units)]
+    if pu is not None:
+        spatial = calc_postHoc_spatial(*postHoc_projections(pu), IDs=IDs, selectionIDs=selectionIDs)
+        metrics += [(metric, 'All', numpy.array([numpy.nan, value], dtype='float'))
+                    for metric, value in zip(postHoc_spatial_metrics, spatial)]
+
+    if len(conmats) > 0:
+        planning_area = numpy.isin(graph_ids, conmat_id_strings(IDs))
+        solution = numpy.isin(graph_ids, conmat_id_strings(selectionIDs))
+    for type, conmat in conmats.items():
+        coo = conmat.tocoo()
+        connections = numpy.array([(planning_area[coo.row] & planning_area[coo.col]).sum(),
+                                   (solution[coo.row] & solution[coo.col]).sum()], dtype='float')
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            density = connections / (units * (units - 1))
+        eigenvalue = numpy.array([graph_eigenvalue(conmat[planning_area][:, planning_area]),
+                                  graph_eigenvalue(conmat[solution][:, solution])])
+        metrics += [("Connections", type, connections),
+                    ("Graph Density", type, density),
+                    ("Eigenvalue", type, eigenvalue)]
+
+    postHoc = pandas.DataFrame([{'Metric': metric, 'Type': type, 'Planning Area': values[0], 'Solution': values[1]}
+                                for metric, type, values in metrics],
+                               columns=['Metric', 'Type', 'Planning Area', 'Solution'])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        postHoc['Percent'] = postHoc['Solution'].values / postHoc['Planning Area'].values * 100
+    if not typed:
+        postHoc = postHoc.drop(columns='Type')
+    return postHoc
+
+
+@profiled('post-hoc')
+def calc_postHoc_replicates(filepath, matrixformat, IDs, selections, pu=None):
+    """
+    Evaluates the post-hoc metrics (see 'calc_postHoc_sparse') of many solutions in one pass.
+
+    'selections' is a dictionary of {solution name: selected IDs}. The size and spacing metrics are calculated once
+    per solution. The solutions are stacked in a sparse solutions x planning units selection matrix S, so the
+    connections within every solution are the row sums of (S A) * S for the adjacency matrix A. Returns a tidy table
+    (one row per solution, type and metric) and the distribution of each metric across the solutions, both empty if
+    there are no solutions.
+    """
+    graph_ids, conmats = posthoc_graph(filepath, matrixformat)
+    planning_area = numpy.isin(graph_ids, conmat_id_strings(IDs))
+    names = list(selections)
+    typed = len(conmats) > 1 or (len(conmats) == 1 and list(conmats)[0] is not None)
+    by = ['Type', 'Metric'] if typed else ['Metric']
+    if len(names) == 0:
+        return (pandas.DataFrame(columns=['Solution'] + by + ['Value', 'Planning Area', 'Percent']),
+                pandas.DataFrame(columns=by + ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']))
+
+    rows, cols = [], []
+    for r, name in enumerate(names):
+        selected = numpy.flatnonzero(numpy.isin(graph_ids, conmat_id_strings(selections[name])) & planning_area)
+        rows.append(numpy.full(len(selected), r, dtype='int'))
+        cols.append(selected)
+    rows, cols = numpy.concatenate(rows), numpy.concatenate(cols)
+    S = scipy.sparse.csr_matrix((numpy.ones(len(rows)), (rows, cols)), shape=(len(names), len(graph_ids)))
+    units = numpy.array([len(selections[name]) for name in names], dtype='float')
+    area_units = float(len(IDs))
+
+    metrics = [("Planning Units", 'All', units, area_units)]
+    if pu is not None:
+        pu_area, pu_dist = postHoc_projections(pu)
+        spatial = numpy.array([calc_postHoc_spatial(pu_area, pu_dist, IDs, selections[name]) for name in names],
+                              dtype='float').reshape(len(names), len(postHoc_spatial_metrics))
+        metrics += [(metric, 'All', spatial[:, m], numpy.nan) for m, metric in enumerate(postHoc_spatial_metrics)]
+
+    for type, conmat in conmats.items():
+        adjacency = conmat.copy()
+        adjacency.eliminate_zeros()
+        adjacency.data[:] = 1
+        # S A holds the neighbours of every selected unit of every solution: solutions are done in chunks if that
+        # doesn't fit in the memory budget
+        step = len(names)
+        product_nnz = S.nnz * adjacency.nnz / max(adjacency.shape[0], 1)
+        if over_budget(sparse_matrix_mb(len(names), product_nnz), "post-hoc connections of " + str(len(names)) +
+                       " solutions"):
+            step = chunk_rows(sparse_matrix_mb(1, product_nnz / len(names)))
+        connections = numpy.concatenate(
+            [numpy.asarray((S[r:r + step] @ adjacency).multiply(S[r:r + step]).sum(axis=1)).ravel()
+             for r in range(0, len(names), max(step, 1))])
+        area_connections = float(adjacency[planning_area][:, planning_area].nnz)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            density = connections / (units * (units - 1))
+            area_density = area_connections / (area_units * (area_units - 1))
+        eigenvalue = subgraph_eigenvalues(conmat, S)
+        area_eigenvalue = graph_eigenvalue(conmat[planning_area][:, planning_area])
+        metrics += [("Connections", type, connections, area_connections),
+                    ("Graph Density", type, density, area_density),
+                    ("Eigenvalue", type, eigenvalue, area_eigenvalue)]
+
+    tidy = []
+    for metric, type, values, area in metrics:
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            percent = values / numpy.float64(area) * 100
+        tidy.append(pandas.DataFrame({'Solution': names,
+                                      'Type': type,
+                                      'Metric': metric,
+                                      'Value': values,
+                                      'Planning Area': area,
+                                      'Percent': percent}))
+
+    tidy = pandas.concat(tidy, ignore_index=True)
+    if not typed:
+        tidy = tidy.drop(columns='Type')
+    distribution = tidy.groupby(by, sort=False)['Value'].describe().reset_index()
+    return tidy, distribution
+
+
+# ########################## marxan input files ########################################################################
+
+# a parameter line of a Marxan input file: an upper case name, optionally followed by a value
+_marxan_parameter = re.compile(r"^([A-Z][A-Z0-9_]*)(?:[ \t]+(.*?))?\s*$")
+
+
+class MarxanInput(object):
+    """
+    A parsed Marxan input file (input.dat). Parameters are looked up by name and converted to their type (see 'types',
+    other parameters are strings). The other lines (headings, comments) are kept so that the file is written as it was
+    read, with only the parameters that were set replaced.
+    """
+    types = {'VERSION': str, 'BLM': float, 'PROP': float, 'RANDSEED': int, 'BESTSCORE': float, 'NUMREPS': int,
+             'NUMITNS': int, 'STARTTEMP': float, 'COOLFAC': float, 'NUMTEMP': int, 'COSTTHRESH': float,
+             'THRESHPEN1': float, 'THRESHPEN2': float, 'SAVERUN': int, 'SAVEBEST': int, 'SAVESUMMARY': int,
+             'SAVESCEN': int, 'SAVETARGMET': int, 'SAVESUMSOLN': int, 'SAVELOG': int, 'SAVESNAPSTEPS': int,
+             'SAVESNAPCHANGES': int, 'SAVESNAPFREQUENCY': int, 'RUNMODE': int, 'MISSLEVEL': float,
+             'ITIMPTYPE': int, 'HEURTYPE': int, 'CLUMPTYPE': int, 'VERBOSITY': int, 'ASYMMETRICCONNECTIVITY': int}
+
+    # input files, relative to INPUTDIR
+    files = ['SPECNAME', 'PUNAME', 'PUVSPRNAME', 'BOUNDNAME', 'BLOCKDEFNAME']
+
+    # extension of the output files, by the value of their SAVE parameter (e.g. SAVEBEST 3 writes _best.csv)
+    output_extensions = {1: '.dat', 2: '.txt', 3: '.csv'}
+
+    def __init__(self, lines, filepath=None):
+        self.filepath = filepath
+        self.lines = [line if line.endswith('\n') else line + '\n' for line in lines]
+        self.reindex()
+
+    def reindex(self):
+        self.index = {}
+        for i, line in enumerate(self.lines):
+            match = _marxan_parameter.match(line)
+            if match and not match.group(1) in self.index:
+                self.index[match.group(1)] = i
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def raw(self, name, default=None):
+        """
+        Returns the value of a parameter as it is written in the file
+        """
+        if not name in self.index:
+            return default
+        return _marxan_parameter.match(self.lines[self.index[name]]).group(2) or ''
+
+    def get(self, name, default=None):
+        """
+        Returns the value of a parameter converted to its type. Raises ValueError if it can't be converted.
+        """
+        value = self.raw(name)
+        if value is None:
+            return default
+        totype = self.types.get(name, str)
+        if totype == int:
+            return int(float(value))
+        return totype(value)
+
+    def set(self, name, value, after=None):
+        """
+        Sets the value of a parameter. A new parameter is added after the parameter 'after' or at the end of the file.
+        """
+        line = name + ' ' + str(value) + '\n'
+        if name in self.index:
+            self.lines[self.index[name]] = line
+            return
+        if after in self.index:
+            self.lines.insert(self.index[after] + 1, line)
+        else:
+            self.lines.append(line)
+        self.reindex()
+
+    def remove(self, name):
+        if name in self.index:
+            del self.lines[self.index[name]]
+            self.reindex()
+
+    def copy(self):
+        return MarxanInput(list(self.lines), self.filepath)
+
+    def write(self, filepath=None):
+        with open(filepath or self.filepath, 'w', encoding="utf8") as file:
+            file.writelines(self.lines)
+
+    def directory(self, name):
+        """
+        Returns the path of a directory parameter (INPUTDIR or OUTPUTDIR). Relative paths are relative to the
+        directory of the input file, which is where Marxan runs.
+        """
+        path = self.raw(name, '')
+        if self.filepath is None:
+            return path
+        joined = os.path.join(os.path.dirname(self.filepath), path)
+        if os.path.isdir(joined) or not os.path.isdir(path):
+            return joined
+        return path
+
+    @property
+    def inputdir(self):
+        return self.directory('INPUTDIR')
+
+    @property
+    def outputdir(self):
+        return self.directory('OUTPUTDIR')
+
+    def output_file(self, suffix):
+        """
+        Returns the path of a Marxan output file (e.g. '_best.txt')
+        """
+        return os.path.join(self.outputdir, self.get('SCENNAME', 'output') + suffix)
+
+    def output_extension(self, name, default=2):
+        """
+        Returns the extension of the output files saved by a SAVE parameter (e.g. 'SAVERUN'), or None if they aren't
+        saved
+        """
+        return self.output_extensions.get(self.get(name, default))
+
+    def solution_files(self):
+        """
+        Returns the paths of the solution files a run writes: the best solution and the solution of each replicate
+        """
+        files = []
+        if self.output_extension('SAVEBEST') is not None:
+            files.append(self.output_file('_best' + self.output_extension('SAVEBEST')))
+        if self.output_extension('SAVERUN') is not None:
+            files += [self.output_file('_r' + '%05d' % rep + self.output_extension('SAVERUN'))
+                      for rep in range(1, max(1, self.get('NUMREPS', 1)) + 1)]
+        return files
+
+    def validate(self):
+        """
+        Returns a list of the problems found in the input file: values that aren't of the right type, and input or
+        output directories or input files that don't exist
+        """
+        problems = []
+        for name in self.index:
+            try:
+                self.get(name)
+            except ValueError:
+                problems.append("Marxan Input File has an invalid value for " + name + ": " + self.raw(name))
+        for name in ['INPUTDIR', 'OUTPUTDIR']:
+            if name in self and not os.path.isdir(self.directory(name)):
+                problems.append("Marxan Input File has an invalid " + ('input' if name == 'INPUTDIR' else 'output') +
+                                " directory " + name + " " + self.raw(name))
+        if 'INPUTDIR' in self and os.path.isdir(self.inputdir):
+            for name in self.files:
+                if self.raw(name, '') and not os.path.isfile(os.path.join(self.inputdir, self.raw(name))):
+                    problems.append("Marxan Input File refers to a file that doesn't exist " + name + " " +
+                                    self.raw(name))
+        return problems
+
+
+# parsed Marxan input files by path (see read_marxan_input)
+_marxan_input_cache = {}
+
+
+def read_marxan_input(filepath):
+    """
+    Returns the parsed Marxan input file (see MarxanInput). The file is only parsed again when it has changed on disk,
+    so callers which change the parameters should work on a copy.
+    """
+    key = os.path.abspath(filepath)
+    stat = os.stat(key)
+    cached = _marxan_input_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime, stat.st_size):
+        return cached[1]
+    with open(key, 'r', encoding="utf8") as file:
+        inputdat = MarxanInput(file.readlines(), filepath)
+    _marxan_input_cache[key] = ((stat.st_mtime, stat.st_size), inputdat)
+    return inputdat
+
+
+# status of the planning units (pu.dat 'status' column) which are locked in or out
+lock_status_values = {"Locked in": 2, "Locked out": 3}
+
+
+def lock_status(status, rules):
+    """
+    Returns the status of the planning units after the lock rules, a list of (mask, status) pairs. The rules are
+    applied in one pass, later rules taking precedence over earlier ones (e.g. a discrete feature locked out over a
+    focus area locked in).
+    """
+    if len(rules) == 0:
+        return numpy.array(status)
+    masks, values = zip(*reversed(rules))
+    return numpy.select([numpy.asarray(mask, dtype='bool') for mask in masks], values, default=status)
+
+
+_pudat_cache = {}
+
+
+def read_pudat(filepath):
+    """
+    Returns a planning unit (pu.dat) file as a table. The file is only read again when it has changed on disk, so
+    callers which change the table should work on a copy.
+    """
+    key = os.path.abspath(filepath)
+    stat = os.stat(key)
+    cached = _pudat_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime, stat.st_size):
+        return cached[1]
+    pudat = marxanconpy.read_csv_tsv(key)
+    _pudat_cache[key] = ((stat.st_mtime, stat.st_size), pudat)
+    return pudat
+
+
+# ########################## marxan file writers #######################################################################
+
+# digests of the files written or checked by the writers, by path (see file_digest)
+_file_digests = {}
+
+
+def file_digest(filepath):
+    """
+    Returns the blake2b digest of a file. The digest is only computed again when the file has changed on disk.
+    """
+    key = os.path.abspath(filepath)
+    stat = os.stat(key)
+    cached = _file_digests.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    digest = hashlib.blake2b()
+    with open(key, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    _file_digests[key] = ((stat.st_mtime_ns, stat.st_size), digest.hexdigest())
+    return digest.hexdigest()
+
+
+def replace_if_changed(tmp_filepath, filepath, digest):
+    """
+    Moves a freshly written file over 'filepath' unless 'filepath' already has the same content ('digest'), in which
+    case the existing file (and its modification time) is kept and the new one deleted.
+
+    Returns True if the file was replaced
+    """
+    if os.path.isfile(filepath) and file_digest(filepath) == digest:
+        os.remove(tmp_filepath)
+        return False
+    os.replace(tmp_filepath, filepath)
+    stat = os.stat(filepath)
+    _file_digests[os.path.abspath(filepath)] = ((stat.st_mtime_ns, stat.st_size), digest)
+    return True
+
+
+def write_if_changed(filepath, text):
+    """
+    Writes 'text' to 'filepath' unless the file already has that content.
+
+    Returns True if the file was written
+    """
+    data = text.encode('utf8')
+    digest = hashlib.blake2b(data).hexdigest()
+    if os.path.isfile(filepath) and file_digest(filepath) == digest:
+        return False
+    with open(filepath + '.tmp', 'wb') as file:
+        file.write(data)
+    return replace_if_changed(filepath + '.tmp', filepath, digest)
+
+
+def format_csv_column(values):
+    """
+    Formats a column of a table as a list of csv fields. Integers (and floats which are all whole numbers) are written
+    without decimals, other floats in their shortest exact form and missing values as empty fields, as in
+    DataFrame.to_csv.
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind in 'iub':
+        return list(map(str, values.tolist()))
+    if values.dtype.kind == 'f':
+        missing = numpy.isnan(values)
+        finite = values[numpy.isfinite(values)]
+        if (finite == numpy.round(finite)).all() and (numpy.abs(finite) < 2 ** 53).all():
+            fields = list(map(str, numpy.where(numpy.isfinite(values), values, 0).astype('int64').tolist()))
+            for i in numpy.flatnonzero(~numpy.isfinite(values)):
+                fields[i] = repr(float(values[i]))
+        else:
+            fields = list(map(repr, values.tolist()))
+    else:
+        missing = pandas.isnull(values)
+        fields = list(map(str, values.tolist()))
+        joined = "".join(fields)
+        if ',' in joined or '"' in joined or '\n' in joined:
+            for i, field in enumerate(fields):
+                if ',' in field or '"' in field or '\n' in field:
+                    fields[i] = '"' + field.replace('"', '""') + '"'
+    for i in numpy.flatnonzero(missing):
+        fields[i] = ''
+    return fields
+
+
+def format_csv_table(table, header=True):
+    """
+    Formats a table (a DataFrame or a dictionary of columns) as csv text, like DataFrame.to_csv(index=False), but
+    without going through pandas' generic writer which is several times slower on the large numeric tables Marxan reads
+    """
+    columns = [format_csv_column(table[c]) for c in table]
+    lines = list(map(",".join, zip(*columns)))
+    if header:
+        lines.insert(0, ",".join(map(str, table)))
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+# digests of the tables written by write_table_if_changed and of the files they produced, by path
+_table_digests = {}
+
+
+def table_digest(table):
+    """
+    Returns a digest of the column names and values of a table (a DataFrame or a dictionary of columns)
+    """
+    table = pandas.DataFrame(table)
+    digest = hashlib.blake2b(",".join(map(str, table.columns)).encode('utf8'))
+    digest.update(pandas.util.hash_pandas_object(table, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def write_table_if_changed(filepath, table):
+    """
+    Writes a table as a csv file (see format_csv_table) unless the file already has that content. A table which is
+    the same as the one last written to an unchanged file is not even formatted.
+
+    Returns True if the file was written
+    """
+    key = os.path.abspath(filepath)
+    table = pandas.DataFrame(table)
+    digest = table_digest(table)
+    if os.path.isfile(key) and _table_digests.get(key) == (digest, file_digest(key)):
+        return False
+    if over_budget(csv_text_mb(table.shape[0], table.shape[1]), "writing " + os.path.basename(filepath)):
+        written = write_table_chunked(filepath, table, chunk_rows(csv_text_mb(1, table.shape[1])))
+    else:
+        written = write_if_changed(filepath, format_csv_table(table))
+    _table_digests[key] = (digest, file_digest(key))
+    return written
+
+
+def write_table_chunked(filepath, table, rows):
+    """
+    Writes a table as a csv file like write_table_if_changed, formatting 'rows' rows at a time into a temporary file
+    which only replaces 'filepath' if the content changed.
+
+    Returns True if the file was written
+    """
+    digest = hashlib.blake2b()
+    with open(filepath + '.tmp', 'wb') as file:
+        for start in range(0, max(table.shape[0], 1), rows):
+            data = format_csv_table(table.iloc[start:start + rows], header=start == 0).encode('utf8')
+            digest.update(data)
+            file.write(data)
+    return replace_if_changed(filepath + '.tmp', filepath, digest.hexdigest())
+
+
+def boundary_matrix(boundary, method="Kruskal"):
+    """
+    Returns the planning unit IDs and the sparse matrix of a connectivity boundary definition ('boundary' is an entry of
+    connectivityMetrics['boundary'] which refers to the connectivity matrix)
+    """
+    ids, conmat = boundary_conmat(boundary['filepath'], boundary['format'], hab_thresh=boundary.get('hab_thresh', 0))
+    if boundary.get('metric') == 'min_plan_graph':
+        conmat = min_plan_graph(conmat, method=method)
+    return ids, conmat
+
+
+def boundary_table(boundary, threshold=0, method="Kruskal"):
+    """
+    Returns a connectivity boundary definition (see boundary_matrix) as a table (id1, id2, boundary), without the
+    connections weaker than or equal to 'threshold', as written by export_boundary
+    """
+    ids, conmat = boundary_matrix(boundary, method=method)
+    conmat = conmat.tocoo()
+    keep = conmat.data > threshold
+    return pandas.DataFrame({'id1': ids[conmat.row[keep]], 'id2': ids[conmat.col[keep]],
+                             'boundary': conmat.data[keep]})
+
+
+def boundary_json(boundaries, method="Kruskal"):
+    """
+    Returns the connectivity boundary definitions of a project (connectivityMetrics['boundary']) as marxanconpy saves
+    them in .MarCon files: tables as JSON (orient 'split'). The definitions which refer to a connectivity matrix are
+    built from it (see boundary_table), if it is still there.
+    """
+    saved = {}
+    for k, boundary in boundaries.items():
+        if isinstance(boundary, dict) and os.path.isfile(boundary['filepath']):
+            boundary = boundary_table(boundary, method=method).to_json(orient='split')
+        saved[k] = boundary
+    return saved
+
+
+def export_boundary(filepath, boundary, threshold=0, method="Kruskal"):
+    """
+    Writes a connectivity boundary definition (see boundary_matrix) unless the file already has that content.
+
+    Returns True if the file was written
+    """
+    ids, conmat = boundary_matrix(boundary, method=method)
+    written, changed = write_boundary_sparse(filepath, conmat, ids, threshold=threshold)
+    print(str(written) + " of " + str(conmat.nnz) + " connections written to " + filepath)
+    return changed
+
+
+def write_marxan_files(jobs, threads=None):
+    """
+    Writes Marxan input files in parallel. 'jobs' maps file paths to tables (written with 'write_table_if_changed') or
+    to functions which write the file themselves and return whether it changed. Files whose content would not change are
+    left untouched.
+
+    Returns a dictionary of file paths: True if the file was written, False if it was already up to date
+    """
+    if len(jobs) == 0:
+        return {}
+    def write(filepath, job):
+        with profiler.span('write', file=filepath) as args:
+            if callable(job):
+                args['changed'] = job()
+            else:
+                args['rows'] = len(job[list(job)[0]]) if len(job) else 0
+                args['changed'] = write_table_if_changed(filepath, job)
+            return args['changed']
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads or len(jobs)) as pool:
+        futures = {filepath: pool.submit(write, filepath, job) for filepath, job in jobs.items()}
+        return {filepath: future.result() for filepath, future in futures.items()}
+
+
+# ########################## marxan output #############################################################################
+
+# the stage lines ("Init: Value ...") may start with the run ("Run 1 Init: Value ..."), so 'value' is checked before
+# 'run', and 'run' never matches them either ('end' is checked before 'run' too)
+_marxan_output_patterns = {'run': re.compile(r"^\s*Run (\d+)\b(?![^:]*:\s*Value)"),
+                           'annealing': re.compile(r"time (\d+) temp \S+ Complete (\d+)% currval (\S+)"),
+                           'value': re.compile(r"^\s*(?:Run (\d+)\s+)?([A-Za-z][A-Za-z ]*):\s*Value "
+                                               r"(-?\d+\.?\d*(?:[eE][-+]?\d+)?)"),
+                           'end': re.compile(r"end run (\d+)|^\s*Run (\d+) is finished"),
+                           'best': re.compile(r"Best solution is run (\d+)")}
+
+# share of a run completed once Marxan reports the score after each stage
+_marxan_stage_complete = {'Init': 5, 'ThermalAnnealing': 90, 'QuantumAnnealing': 90, 'Heuristic': 95,
+                          'Iterative Improvement': 100}
+
+
+def parse_marxan_line(line, progress):
+    """
+    Updates the 'progress' dictionary (run, runs_done, iteration, complete, score, best_run) from a line of Marxan's
+    output. Returns True if the line changed the progress.
+    """
+    match = _marxan_output_patterns['annealing'].search(line)
+    if match:
+        progress['iteration'] = int(match.group(1))
+        progress['complete'] = int(match.group(2))
+        progress['score'] = float(match.group(3))
+        return True
+    match = _marxan_output_patterns['end'].search(line)
+    if match:
+        progress['runs_done'] = int(match.group(1) or match.group(2))
+        progress['complete'] = 0
+        return True
+    match = _marxan_output_patterns['value'].search(line)
+    if match:
+        if match.group(1) is not None and int(match.group(1)) != progress['run']:
+            start_marxan_run(progress, int(match.group(1)))
+        progress['score'] = float(match.group(3))
+        progress['complete'] = max(progress['complete'], _marxan_stage_complete.get(match.group(2).strip(), 0))
+        return True
+    match = _marxan_output_patterns['run'].search(line)
+    if match:
+        start_marxan_run(progress, int(match.group(1)))
+        return True
+    match = _marxan_output_patterns['best'].search(line)
+    if match:
+        progress['best_run'] = int(match.group(1))
+        progress['runs_done'] = max(progress['runs_done'], progress['run'])
+        progress['complete'] = 0
+        return True
+    return False
+
+
+def start_marxan_run(progress, run):
+    """
+    Updates the 'progress' dictionary (see parse_marxan_line) when Marxan starts run 'run'
+    """
+    progress['run'] = run
+    progress['runs_done'] = max(progress['runs_done'], run - 1)
+    progress['iteration'] = 0
+    progress['complete'] = 0
+
+
+# Marxan's output is a pipe on Windows (it would need a ConPTY pseudo-console, which Python doesn't provide), which the
+# C runtime buffers in blocks of 4 KB, so the progress arrives in bursts rather than line by line
+marxan_output_buffered = os.name != 'posix'
+marxan_buffered_note = ("\nOn Windows, Marxan reports its progress in bursts (its output is buffered), so it may\n"
+                        "seem to pause, in particular with few iterations or a low verbosity.")
+
+
+# ########################## marxan parameter sweep ####################################################################
+
+def parse_sweep_values(text):
+    """
+    Parses sweep values given as a list ("0,0.5,1") or as an evenly spaced range ("start:stop:number of values").
+    Returns [None] if 'text' is empty (i.e. the parameter isn't swept). Raises ValueError if a value isn't a number.
+    """
+    text = str(text).strip()
+    if text == "":
+        return [None]
+    if ":" in text:
+        start, stop, num = text.split(":")
+        return numpy.linspace(float(start), float(stop), int(num)).tolist()
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def sweep_jobs(blms=(None,), numitns=(None,), targets=(None,)):
+    """
+    Returns one job ({'job', 'BLM', 'NUMITNS', 'target'}) for every combination of the values. A value of None keeps
+    the value of the Marxan input file (or of the spec file for the targets).
+    """
+    jobs = []
+    for blm in blms:
+        for itns in numitns:
+            for target in targets:
+                jobs.append({'job': "job" + "%04d" % (len(jobs) + 1), 'BLM': blm,
+                             'NUMITNS': None if itns is None else int(itns), 'target': target})
+    return jobs
+
+
+def write_sweep_job(job, inputdat, inputdir, sweepdir, spec_filepath=None):
+    """
+    Writes the Marxan input file of a sweep job (from the project's input file 'inputdat', see MarxanInput, whose
+    files are relative to 'inputdir') to its own directory with its own output directory. If the targets are swept,
+    the spec file is copied to the job directory with the target (or proportion) of every conservation feature set to
+    the job's target. Returns the job directory.
+    """
+    jobdir = os.path.join(sweepdir, job['job'])
+    os.makedirs(os.path.join(jobdir, 'output'), exist_ok=True)
+
+    jobdat = inputdat.copy()
+    jobdat.set('INPUTDIR', os.path.relpath(inputdir, jobdir))
+    jobdat.set('OUTPUTDIR', 'output')
+    if job['BLM'] is not None:
+        jobdat.set('BLM', job['BLM'])
+    if job['NUMITNS'] is not None:
+        jobdat.set('NUMITNS', job['NUMITNS'])
+    if job['target'] is not None:
+        spec = marxanconpy.read_csv_tsv(spec_filepath)
+        spec['prop' if 'prop' in spec.columns else 'target'] = job['target']
+        spec.to_csv(os.path.join(jobdir, 'spec.dat'), index=False)
+        jobdat.set('SPECNAME', os.path.relpath(os.path.join(jobdir, 'spec.dat'), inputdir))
+
+    jobdat.write(os.path.join(jobdir, 'input.dat'))
+    return jobdir
+
+
+# summary columns of the sweep table and the Marxan summary file (_sum) columns they are calculated from
+_sweep_summary_columns = [('Cost', 'Cost'), ('Planning Units', 'Planning_Units'), ('Boundary', 'Connectivity'),
+                          ('Connectivity In Fraction', 'Connectivity_In_Fraction'), ('Shortfall', 'Shortfall')]
+
+
+def summarize_sweep(jobs, sweepdir, scenname):
+    """
+    Summarizes the Marxan summary file (_sum) of every sweep job: the best run (lowest score) and the mean across runs
+    of the cost, number of planning units, boundary (i.e. connectivity) length, fraction of connectivity within the
+    solution and shortfall. Jobs without a summary file only report their exit code.
+    """
+    rows = []
+    for job in jobs:
+        row = {'Job': job['job'], 'BLM': job['BLM'], 'NUMITNS': job['NUMITNS'], 'Target': job['target'],
+               'Exit Code': job.get('returncode')}
+        fn = os.path.join(sweepdir, job['job'], 'output', scenname + "_sum")
+        fn = fn + '.csv' if os.path.isfile(fn + '.csv') else fn + '.txt'
+        if os.path.isfile(fn):
+            runs = marxanconpy.read_csv_tsv(fn)
+            best = runs.loc[runs['Score'].idxmin()]
+            row.update({'Runs': len(runs), 'Best Run': int(best['Run_Number']), 'Best Score': best['Score']})
+            for name, column in _sweep_summary_columns:
+                if column in runs.columns:
+                    row['Best ' + name] = best[column]
+                    row['Mean ' + name] = runs[column].mean()
+        rows.append(row)
+    return pandas.DataFrame(rows)
+
+
+def trade_off_knee(cost, boundary, extremes):
+    """
+    Scores how close points of the cost versus boundary trade-off curve are to its knee. The curve is rescaled so that
+    the 'extremes' (the (cost, boundary) of the lowest and highest BLM) are at (0, 1) and (1, 0), and the score is the
+    distance from the straight line between them. The knee is the point with the highest score.
+    """
+    (cost_low, boundary_high), (cost_high, boundary_low) = extremes
+    if not cost_high > cost_low or not boundary_high > boundary_low:
+        return numpy.zeros(numpy.shape(cost))
+    return (1 - (numpy.asarray(cost) - cost_low) / (cost_high - cost_low)
+            - (numpy.asarray(boundary) - boundary_low) / (boundary_high - boundary_low)) / numpy.sqrt(2)
+
+
+# ########################## project build graph #######################################################################
+
+class BuildStep(object):
+    """
+    A step of the project build graph (see ProjectBuild). 'build' is called with the project and recomputes what the
+    step makes. 'inputs' and 'outputs' return the files the step reads and writes, 'options' are the keys of the
+    project options it depends on and 'state' returns any other part of the project it depends on (anything json can
+    write). Steps with 'main_thread' set show dialogs or progress bars, so they are run by the thread which calls
+    ProjectBuild.update. Steps which aren't 'enabled' for a project are never stale.
+    """
+    def __init__(self, name, build, depends=(), inputs=None, options=(), state=None, outputs=None, enabled=None,
+                 main_thread=False):
+        self.name = name
+        self.build = build
+        self.depends = tuple(depends)
+        self.inputs = inputs
+        self.options = tuple(options)
+        self.state = state
+        self.outputs = outputs
+        self.enabled = enabled
+        self.main_thread = main_thread
+
+
+# the files which make up a shapefile along with the .shp (see ProjectBuild.hashes)
+shapefile_sidecars = ['.dbf', '.shx', '.prj', '.cpg']
+
+
+class ProjectBuild(object):
+    """
+    The build graph of a project, e.g. inputs (shapefiles, matrices, options) -> rescaled matrices -> metrics ->
+    discrete features -> Marxan files -> runs -> post-hoc. Steps are given in order, after the steps they depend on.
+
+    The hash of a step is a content hash of its input files (see file_digest), its options and state, and the hashes of
+    the steps it depends on. The hash each step was last built with is kept in project['build']: a step is stale when
+    its hash changed, one of its outputs is missing or a step it depends on is stale, and update() rebuilds only the
+    stale steps.
+    """
+    def __init__(self, steps):
+        self.steps = collections.OrderedDict()
+        for step in steps:
+            unknown = [name for name in step.depends if name not in self.steps]
+            if unknown:
+                raise ValueError("Step '" + step.name + "' depends on steps which don't come before it: " +
+                                 ", ".join(unknown))
+            self.steps[step.name] = step
+
+    def upstream(self, names):
+        """
+        Returns the names of the steps in 'names' and of all the steps they depend on, in order
+        """
+        needed = set(names)
+        for name in reversed(self.steps):
+            if name in needed:
+                needed.update(self.steps[name].depends)
+        return [name for name in self.steps if name in needed]
+
+    def hashes(self, project, names=None):
+        """
+        Returns the hash of the steps in 'names' (and of the steps they depend on), or of every step
+        """
+        hashes = {}
+        for name in self.upstream(self.steps if names is None else names):
+            step = self.steps[name]
+            digest = hashlib.blake2b(name.encode('utf8'))
+            state = [project['options'].get(key) for key in step.options]
+            if step.state is not None:
+                state.append(step.state(project))
+            digest.update(json.dumps(state, sort_keys=True, default=str).encode('utf8'))
+            for filepath in step.inputs(project) if step.inputs is not None else []:
+                # only the content counts, so moving the project or renaming a file doesn't make a step stale
+                digest.update((file_digest(filepath) if os.path.isfile(filepath) else 'missing').encode('utf8'))
+                # the attributes and projection of a shapefile are in the files next to it
+                if filepath.lower().endswith('.shp'):
+                    for sidecar in shapefile_sidecars:
+                        sidecar = filepath[:-4] + sidecar
+                        digest.update((file_digest(sidecar) if os.path.isfile(sidecar) else 'missing').encode('utf8'))
+            for depend in step.depends:
+                digest.update(hashes[depend].encode('utf8'))
+            hashes[name] = digest.hexdigest()
+        return hashes
+
+    def stale(self, project, names=None):
+        """
+        Returns the stale steps among 'names' (and the steps they depend on), or among all the steps, in order
+        """
+        names = self.upstream(self.steps if names is None else names)
+        hashes = self.hashes(project, names)
+        built = project.get('build', {})
+        stale = []
+        for name in names:
+            step = self.steps[name]
+            if step.enabled is not None and not step.enabled(project):
+                continue
+            outputs = step.outputs(project) if step.outputs is not None else []
+            if built.get(name) != hashes[name] or not all(os.path.isfile(f) for f in outputs) or \
+                    any(depend in stale for depend in step.depends):
+                stale.append(name)
+        return stale
+
+    def mark_built(self, project, *names):
+        """
+        Records that steps were just built (e.g. from their own buttons) from the current inputs
+        """
+        hashes = self.hashes(project, names)
+        project.setdefault('build', {})
+        for name in names:
+            project['build'][name] = hashes[name]
+
+    def build_step(self, project, name):
+        """
+        Builds a step and records its hash if it succeeds. Returns a report ({'step', 'status', 'seconds'})
+        """
+        start = time.time()
+        report = {'step': name, 'status': 'ok'}
+        try:
+            # the hash is taken before building: the inputs are final once the steps it depends on are built
+            step_hash = self.hashes(project, [name])[name]
+            with profiler.span('update', step=name):
+                self.steps[name].build(project)
+            project.setdefault('build', {})[name] = step_hash
+        except Exception as e:
+            print("Error while building '" + name + "': " + repr(e))
+            report['status'] = repr(e)
+        report['seconds'] = time.time() - start
+        return report
+
+    def update(self, project, names=None, threads=None, call_main=None, cancelled=None, callback=None):
+        """
+        Rebuilds the stale steps (see stale). Each step starts as soon as the steps it depends on are built, in a pool
+        of 'threads' worker threads unless it must run on the main thread. Steps which depend on a step which failed
+        are skipped.
+
+        When update itself runs in a background thread, 'call_main(function, *args)' must call the function on the
+        main thread and return its result: it is used for the main thread steps. No more steps are started once
+        'cancelled()' returns True, and 'callback(name, report)' is called as each step starts (with no report) and
+        finishes.
+
+        Returns a report with one row per stale step: its status ('ok', the error, 'skipped' or 'cancelled') and
+        seconds
+        """
+        call_main = call_main if call_main is not None else lambda function, *args: function(*args)
+        callback = callback if callback is not None else lambda name, report: None
+        pending = self.stale(project, names)
+        running = {}
+        failed = set()
+        reports = {}
+
+        def finished(name, report):
+            reports[name] = report
+            if report['status'] != 'ok':
+                failed.add(name)
+            callback(name, report)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+            while pending or running:
+                if cancelled is not None and cancelled():
+                    for name in pending:
+                        finished(name, {'step': name, 'status': 'cancelled', 'seconds': 0.0})
+                    pending = []
+                ready = []
+                for name in list(pending):
+                    step = self.steps[name]
+                    if any(depend in failed for depend in step.depends):
+                        pending.remove(name)
+                        finished(name, {'step': name, 'status': 'skipped', 'seconds': 0.0})
+                    elif not any(depend in pending or depend in running.values() for depend in step.depends):
+                        ready.append(name)
+                # worker steps are started first, so that they run while the main thread builds its own steps
+                for name in ready:
+                    if not self.steps[name].main_thread:
+                        pending.remove(name)
+                        callback(name, None)
+                        running[pool.submit(self.build_step, project, name)] = name
+                main_thread = [name for name in ready if self.steps[name].main_thread]
+                if main_thread:
+                    pending.remove(main_thread[0])
+                    callback(main_thread[0], None)
+                    finished(main_thread[0], call_main(self.build_step, project, main_thread[0]))
+                    continue
+                if not running:
+                    continue
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    finished(name, future.result())
+        return pandas.DataFrame([reports[name] for name in self.steps if name in reports],
+                                columns=['step', 'status', 'seconds'])
+
+
+# the quantiles of metric_statistics, by their name in the pre-evaluation options and in discrete feature names
+metric_quantiles = collections.OrderedDict([("Minimum", 'minimum'), ("Lower Quartile", 'lower_quartile'),
+                                            ("Median", 'median'), ("Upper Quartile", 'upper_quartile'),
+                                            ("Maximum", 'maximum')])
+
+# the values of the metrics as arrays, and their statistics, by type and metric (e.g. ('spec_demo_pu', 'in_degree')).
+# The cache is cleared, and its version changed, when metrics are calculated again (see clear_metric_statistics).
+_metric_statistics_cache = collections.OrderedDict()
+_metric_statistics_lock = threading.Lock()
+_metric_statistics_version = 0
+
+
+def metric_statistics(values, key=None, max_mb=64):
+    """
+    Returns the values of a metric (a list of connectivityMetrics) as an array, and its sum, mean, standard deviation
+    and quantiles (see metric_quantiles). With a 'key' (type and metric name), both are kept for the next call until
+    the metrics are calculated again or the cached arrays take more than 'max_mb', when the least recently used go.
+    """
+    with _metric_statistics_lock:
+        version = _metric_statistics_version
+        cached = _metric_statistics_cache.get(key) if key is not None else None
+        if cached is not None and cached[0] == version and len(cached[1]) == len(values):
+            _metric_statistics_cache.move_to_end(key)
+            return cached[1], cached[2]
+    array = numpy.asarray(values)
+    if array.dtype.kind not in 'biuf':
+        array = array.astype('float')
+    # the array is shared by everyone asking for the metric
+    array.flags.writeable = False
+    statistics = dict(zip(metric_quantiles.values(), numpy.quantile(array, [0, 0.25, 0.5, 0.75, 1]).tolist()))
+    total = array.sum()
+    deviations = array - total / len(array)
+    statistics.update({'sum': total.item(), 'mean': (total / len(array)).item(),
+                       'std': math.sqrt(deviations.dot(deviations) / len(array))})
+    if key is None:
+        return array, statistics
+    with _metric_statistics_lock:
+        # the metrics may have been calculated again meanwhile
+        if version == _metric_statistics_version:
+            _metric_statistics_cache[key] = (version, array, statistics)
+            _metric_statistics_cache.move_to_end(key)
+            size = sum(cached[1].nbytes for cached in _metric_statistics_cache.values())
+            while size > max_mb * 2 ** 20 and len(_metric_statistics_cache) > 1:
+                size -= _metric_statistics_cache.popitem(last=False)[1][1].nbytes
+    return array, statistics
+
+
+def clear_metric_statistics(key=None):
+    """
+    Forgets the statistics of a metric (by type and metric name), or of all metrics when they are calculated again
+    """
+    global _metric_statistics_version
+    with _metric_statistics_lock:
+        if key is None:
+            _metric_statistics_version += 1
+            _metric_statistics_cache.clear()
+        else:
+            _metric_statistics_cache.pop(key, None)
+
+
+def discrete_bound(array, statistics, bound_type):
+    """
+    Returns the value of a bound of a discrete feature as written in the feature's name (see
+    MarxanConnectGUI.on_preEval_create_new): 'minimum', 'lower_quartile', 'median', 'upper_quartile', 'maximum',
+    '<n>th_percentile' or a number. 'array' and 'statistics' are the metric's (see metric_statistics).
+    """
+    if bound_type in metric_quantiles.values():
+        return statistics[bound_type]
+    if bound_type.endswith('th_percentile'):
+        return numpy.percentile(array, float(bound_type[:-len('th_percentile')]))
+    return float(bound_type)
+
+
+def rediscretize_features(metrics):
+    """
+    Recomputes the discrete features of a set of metrics (e.g. connectivityMetrics['spec_demo_pu']) from the metrics
+    they were made from, whose names and bounds are part of their names. Returns the names of the features recomputed.
+    """
+    recomputed = []
+    for name in list(metrics):
+        if '_discrete_' not in name:
+            continue
+        metric, bounds = name.split('_discrete_', 1)
+        for status in ['_lockout', '_lockin']:
+            if bounds.endswith(status):
+                bounds = bounds[:-len(status)]
+        if metric not in metrics or '_to_' not in bounds:
+            continue
+        values, statistics = metric_statistics(metrics[metric])
+        low, high = bounds.split('_to_', 1)
+        metrics[name] = ((values >= discrete_bound(values, statistics, low)) &
+                         (values <= discrete_bound(values, statistics, high))).astype(int).tolist()
+        recomputed.append(name)
+    return recomputed
+
+
+# ########################## python annealer ###########################################################################
+
+def read_annealing_problem(inputdat, tables=None):
+    """
+    Reads the planning units (cost, status), conservation features (target, spf), their amounts in each planning unit
+    and the boundary of a Marxan input file (see MarxanInput) into the arrays used by 'anneal'. Targets given as
+    proportions ('prop') are converted to amounts, and the shortfall penalty of each feature is the cost of meeting
+    its target greedily with the cheapest planning units (cost and boundary) per unit of amount, as in Marxan.
+
+    'tables' are the in-memory tables of the project (as exported by write_marxan_files, by file path), which are used
+    instead of the files the input file refers to. The other files are read.
+    """
+    tables = dict((os.path.normcase(os.path.abspath(k)), v) for k, v in (tables or {}).items())
+
+    def read(name):
+        filepath = os.path.join(inputdat.inputdir, inputdat.raw(name))
+        table = tables.get(os.path.normcase(os.path.abspath(filepath)))
+        if table is None:
+            return marxanconpy.read_csv_tsv(filepath)
+        return pandas.DataFrame(table)
+
+    pu = read('PUNAME')
+    spec = read('SPECNAME')
+    puvspr = read('PUVSPRNAME')
+
+    # IDs are matched as strings: the in-memory tables and the files don't always have the same types
+    ids = pu['id'].values
+    index = pandas.Series(numpy.arange(len(ids)), index=conmat_id_strings(ids))
+    spec_index = pandas.Series(numpy.arange(len(spec)), index=conmat_id_strings(spec['id']))
+    cost = pu['cost'].values.astype('float') if 'cost' in pu.columns else numpy.ones(len(ids))
+    status = pu['status'].values.astype('int') if 'status' in pu.columns else numpy.zeros(len(ids), dtype='int')
+
+    puvspr = puvspr.assign(pu=conmat_id_strings(puvspr['pu']), species=conmat_id_strings(puvspr['species']))
+    puvspr = puvspr[puvspr['pu'].isin(index.index) & puvspr['species'].isin(spec_index.index)]
+    amount = scipy.sparse.csr_matrix((puvspr['amount'].values.astype('float'),
+                                      (index[puvspr['pu'].values].values,
+                                       spec_index[puvspr['species'].values].values)),
+                                     shape=(len(ids), len(spec)))
+    if 'target' in spec.columns:
+        target = spec['target'].values.astype('float')
+    else:
+        target = spec['prop'].values.astype('float') * numpy.asarray(amount.sum(axis=0)).ravel()
+    spf = spec['spf'].values.astype('float') if 'spf' in spec.columns else numpy.ones(len(spec))
+
+    n = len(ids)
+    boundary = scipy.sparse.csr_matrix((n, n))
+    if inputdat.raw('BOUNDNAME', ''):
+        bound = read('BOUNDNAME')
+        bound = bound.assign(id1=conmat_id_strings(bound['id1']), id2=conmat_id_strings(bound['id2']))
+        bound = bound[bound['id1'].isin(index.index) & bound['id2'].isin(index.index)]
+        boundary = scipy.sparse.csr_matrix((bound['boundary'].values.astype('float'),
+                                            (index[bound['id1'].values].values, index[bound['id2'].values].values)),
+                                           shape=(n, n))
+    fixed = boundary.diagonal()
+    boundary = (boundary - scipy.sparse.diags(fixed)).tocsr()
+    boundary.eliminate_zeros()
+    asymmetric = inputdat.get('ASYMMETRICCONNECTIVITY', 0) == 1
+    if not asymmetric:
+        # a pair of planning units counts once, even if it is listed in both directions
+        boundary = boundary.maximum(boundary.T).tocsr()
+
+    # planning units are costed with their whole boundary for the penalties, as if each was selected on its own
+    isolated = cost + inputdat.get('BLM', 0.0) * (fixed + numpy.asarray(boundary.sum(axis=1)).ravel())
+    return {'ids': ids, 'cost': cost, 'status': status, 'amount': amount, 'target': target, 'spf': spf,
+            'penalty': feature_penalties(isolated, status, amount, target), 'out': boundary,
+            'in': boundary.T.tocsr(), 'fixed': fixed, 'asymmetric': asymmetric}
+
+
+def feature_penalties(cost, status, amount, target):
+    """
+    Returns the cost of meeting the target of each conservation feature by adding the planning units with the lowest
+    cost per unit of amount first (the last planning unit is counted for the fraction of it that is needed)
+    """
+    amount = amount.tocsc()
+    penalty = numpy.zeros(amount.shape[1])
+    for s in range(amount.shape[1]):
+        rows = amount.indices[amount.indptr[s]:amount.indptr[s + 1]]
+        values = amount.data[amount.indptr[s]:amount.indptr[s + 1]]
+        keep = (status[rows] < 3) & (values > 0)
+        rows, values = rows[keep], values[keep]
+        order = numpy.argsort(cost[rows] / values)
+        held = numpy.cumsum(values[order])
+        needed = numpy.searchsorted(held, target[s])
+        if needed >= len(order):
+            penalty[s] = cost[rows].sum()
+        else:
+            before = held[needed - 1] if needed > 0 else 0
+            penalty[s] = cost[rows[order[:needed]]].sum() + \
+                         cost[rows[order[needed]]] * (target[s] - before) / values[order[needed]]
+    return penalty
+
+
+def solution_summary(problem, solution, blm, misslevel=1.0):
+    """
+    Returns the score, cost, number of planning units, boundary (i.e. connectivity), shortfall penalty, shortfall and
+    number of features missing their target of a solution, as reported in Marxan's summary file (_sum)
+    """
+    x = solution.astype('float')
+    held = problem['amount'].T.dot(x)
+    shortfall = numpy.maximum(problem['target'] - held, 0)
+    weight = numpy.divide(problem['spf'] * problem['penalty'], problem['target'],
+                          out=numpy.zeros(len(held)), where=problem['target'] > 0)
+    boundary = problem['fixed'].dot(x) + x.dot(problem['out'].dot(1 - x))
+    penalty = weight.dot(shortfall)
+    cost = problem['cost'].dot(x)
+    return {'Score': cost + blm * boundary + penalty, 'Cost': cost, 'Planning_Units': int(x.sum()),
+            'Connectivity': boundary, 'Penalty': penalty, 'Shortfall': shortfall.sum(),
+            'Missing_Values': int((held < problem['target'] * misslevel).sum())}
+
+
+def anneal(problem, settings, rng):
+    """
+    Runs one replicate of simulated annealing followed by iterative improvement, as Marxan does (RUNMODE 1), and
+    returns the solution (1 for selected planning units). The objective is the cost, plus BLM times the boundary,
+    plus the shortfall penalty of each feature (spf * penalty * shortfall / target). Each step changes a single
+    planning unit, so the change in the objective is computed incrementally from the boundary of that planning unit
+    and the amounts it holds. The steps depend on each other and are not vectorised: each touches only a few entries,
+    for which numpy's overhead per call would be larger than the work.
+
+    'settings' are the Marxan parameters BLM, PROP, NUMITNS, NUMTEMP, STARTTEMP and COOLFAC. A negative STARTTEMP sets
+    the initial and final temperatures to the largest and smallest changes seen during NUMITNS / 100 random changes,
+    otherwise the temperature goes from STARTTEMP down to STARTTEMP / COOLFAC in NUMTEMP steps. At a temperature of 0
+    (STARTTEMP 0), only the changes which improve the objective are accepted.
+    """
+    status = problem['status']
+    free = numpy.flatnonzero(status < 2)
+    x = (status == 1) | (status == 2)
+    x[free] = x[free] | (rng.random(len(free)) < settings['PROP'])
+    if len(free) == 0:
+        return x.astype('int8')
+
+    # plain lists are much faster than numpy arrays for the element by element updates below
+    xl = x.tolist()
+    cost = problem['cost'].tolist()
+    fixed = problem['fixed'].tolist()
+    target = problem['target'].tolist()
+    weight = numpy.divide(problem['spf'] * problem['penalty'], problem['target'],
+                          out=numpy.zeros(len(target)), where=problem['target'] > 0).tolist()
+    held = problem['amount'].T.dot(x.astype('float')).tolist()
+    ap, aj, aw = [m.tolist() for m in (problem['amount'].indptr, problem['amount'].indices, problem['amount'].data)]
+    op, oj, ow = [m.tolist() for m in (problem['out'].indptr, problem['out'].indices, problem['out'].data)]
+    ip, ij, iw = [m.tolist() for m in (problem['in'].indptr, problem['in'].indices, problem['in'].data)]
+    blm = settings['BLM']
+
+    def change(i):
+        s = -1.0 if xl[i] else 1.0
+        delta = cost[i]
+        if blm:
+            b = fixed[i]
+            for k in range(op[i], op[i + 1]):
+                if not xl[oj[k]]:
+                    b += ow[k]
+            for k in range(ip[i], ip[i + 1]):
+                if xl[ij[k]]:
+                    b -= iw[k]
+            delta += blm * b
+        delta *= s
+        for k in range(ap[i], ap[i + 1]):
+            f = aj[k]
+            before = held[f]
+            after = before + s * aw[k]
+            delta += weight[f] * ((target[f] - after if after < target[f] else 0) -
+                                  (target[f] - before if before < target[f] else 0))
+        return delta
+
+    def apply(i):
+        s = -1.0 if xl[i] else 1.0
+        xl[i] = not xl[i]
+        for k in range(ap[i], ap[i + 1]):
+            held[aj[k]] += s * aw[k]
+
+    numitns = int(settings['NUMITNS'])
+    numtemp = max(1, min(int(settings['NUMTEMP']), numitns))
+    if settings['STARTTEMP'] < 0:
+        deltas = []
+        for i in free[rng.integers(len(free), size=max(1, numitns // 100))].tolist():
+            deltas.append(abs(change(i)))
+            apply(i)
+        positive = [d for d in deltas if d > 0]
+        tinit = max(positive) if positive else 1.0
+        tfinal = min(positive) if positive else 1.0
+    else:
+        tinit = settings['STARTTEMP']
+        tfinal = tinit / max(settings['COOLFAC'], 1.0)
+    temperature = tinit
+    tcool = (tfinal / tinit) ** (1.0 / numtemp) if tinit > 0 else 1.0
+
+    # annealing
+    step = max(1, numitns // numtemp)
+    picks = free[rng.integers(len(free), size=numitns)].tolist()
+    chances = rng.random(numitns).tolist()
+    for it in range(numitns):
+        if it % step == 0 and it > 0:
+            temperature *= tcool
+        i = picks[it]
+        delta = change(i)
+        if delta < 0 or (temperature > 0 and chances[it] < math.exp(-delta / temperature)):
+            apply(i)
+
+    # iterative improvement
+    improved = True
+    while improved:
+        improved = False
+        for i in rng.permutation(free).tolist():
+            if change(i) < 0:
+                apply(i)
+                improved = True
+
+    return numpy.array(xl, dtype='int8')
+
+
+# state shared by the annealer worker processes (set once per process by '_init_annealer_worker')
+_annealer_worker_state = {}
+
+
+def _init_annealer_worker(problem, settings):
+    _annealer_worker_state['problem'] = problem
+    _annealer_worker_state['settings'] = settings
+
+
+def _annealer_worker(rep):
+    problem = _annealer_worker_state['problem']
+    settings = _annealer_worker_state['settings']
+    seed = settings['RANDSEED']
+    rng = numpy.random.default_rng(None if seed < 0 else seed + rep)
+    solution = anneal(problem, settings, rng)
+    return rep, solution, solution_summary(problem, solution, settings['BLM'], settings['MISSLEVEL'])
+
+
+def annealer_settings(inputdat):
+    """
+    Returns the annealing parameters of a Marxan input file (see MarxanInput), with Marxan's defaults
+    """
+    defaults = {'BLM': 0.0, 'PROP': 0.5, 'RANDSEED': -1, 'NUMREPS': 1, 'NUMITNS': 1000000, 'NUMTEMP': 10000,
+                'STARTTEMP': -1.0, 'COOLFAC': 6.0, 'MISSLEVEL': 1.0}
+    return dict((name, inputdat.get(name, value)) for name, value in defaults.items())
+
+
+@profiled('annealer')
+def run_annealer(inputdat, processes=None, callback=None, cancelled=None, tables=None):
+    """
+    Solves the problem of a Marxan input file (see MarxanInput, and read_annealing_problem for 'tables') with the
+    Python annealer, running the NUMREPS replicates in parallel processes. 'callback(done, reps, best_score)' is
+    called as replicates finish. 'cancelled()' is checked every 0.25 seconds: once it returns True, the replicates which
+    haven't started are cancelled and the pool is shut down without waiting for those running. Returns the planning
+    unit IDs, the solutions (one row per replicate) and the summary of each finished replicate (as in Marxan's _sum
+    file).
+    """
+    problem = read_annealing_problem(inputdat, tables)
+    settings = annealer_settings(inputdat)
+    reps = max(1, settings['NUMREPS'])
+    solutions = numpy.zeros((reps, len(problem['ids'])), dtype='int8')
+    summary = [None] * reps
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_annealer_worker,
+                                                  initargs=(problem, settings))
+    pending = set()
+    try:
+        pending = set(pool.submit(_annealer_worker, rep) for rep in range(reps))
+        done = 0
+        while pending:
+            finished, pending = concurrent.futures.wait(pending, timeout=0.25,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                rep, solutions[rep], summary[rep] = future.result()
+                done += 1
+                if callback is not None:
+                    callback(done, reps, min(s['Score'] for s in summary if s is not None))
+            if pending and cancelled is not None and cancelled():
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=not (cancelled is not None and cancelled()))
+    summary = pandas.DataFrame([dict(Run_Number=rep + 1, **s) for rep, s in enumerate(summary) if s is not None])
+    return problem['ids'], solutions, summary
+
+
+def write_annealer_output(inputdat, ids, solutions, summary):
+    """
+    Writes the results of the Python annealer as Marxan output files (the solution of each replicate, the best
+    solution, the selection frequency and the summary), so that they are read like Marxan's. As Marxan does, each file
+    is only written if its SAVE parameter asks for it, with the extension it sets (see MarxanInput.output_extension).
+    """
+    os.makedirs(inputdat.outputdir, exist_ok=True)
+    runs = summary['Run_Number'].values - 1
+    if inputdat.output_extension('SAVERUN') is not None:
+        for rep in runs:
+            pandas.DataFrame({'planning_unit': ids, 'solution': solutions[rep]}).to_csv(
+                inputdat.output_file("_r" + "%05d" % (rep + 1) + inputdat.output_extension('SAVERUN')), index=False,
+                quoting=csv.QUOTE_NONNUMERIC)
+    best = int(runs[summary['Score'].values.argmin()])
+    if inputdat.output_extension('SAVEBEST') is not None:
+        pandas.DataFrame({'planning_unit': ids, 'solution': solutions[best]}).to_csv(
+            inputdat.output_file("_best" + inputdat.output_extension('SAVEBEST')), index=False,
+            quoting=csv.QUOTE_NONNUMERIC)
+    if inputdat.output_extension('SAVESUMSOLN') is not None:
+        pandas.DataFrame({'planning_unit': ids, 'number': solutions[runs].sum(axis=0)}).to_csv(
+            inputdat.output_file("_ssoln" + inputdat.output_extension('SAVESUMSOLN')), index=False,
+            quoting=csv.QUOTE_NONNUMERIC)
+    if inputdat.output_extension('SAVESUMMARY') is not None:
+        summary.to_csv(inputdat.output_file("_sum" + inputdat.output_extension('SAVESUMMARY')), index=False,
+                       quoting=csv.QUOTE_NONNUMERIC)
+    return best
+
+
+# ########################## landscape connectivity engines ############################################################
+
+def strtree_indices(tree, geometry, index_by_id):
+    """
+    Queries an STRtree and returns the indices of the candidate geometries. Shapely < 2.0 returns the geometries
+    themselves rather than their indices, these are looked up in 'index_by_id' ({id(geometry): index}).
+    """
+    return [b if isinstance(b, (int, numpy.integer)) else index_by_id[id(b)] for b in tree.query(geometry)]
+
+
+def neighbour_pairs(geometries, buff):
+    """
+    Finds all pairs of geometries which are within 'buff' of each other. Candidates come from an STRtree query on the
+    geometries buffered by half of 'buff' and are then checked exactly.
+
+    Returns the index arrays (i, j) of the neighbouring pairs (i < j) and the number of candidate pairs tested.
+    """
+    geometries = list(geometries)
+    buffered = [g.buffer(buff / 2.0) for g in geometries]
+    tree = shapely.strtree.STRtree(buffered)
+    index_by_id = {id(g): k for k, g in enumerate(buffered)}
+
+    i, j = [], []
+    candidates = 0
+    for a, g in enumerate(buffered):
+        for b in strtree_indices(tree, g, index_by_id):
+            if b <= a:
+                continue
+            candidates += 1
+            if geometries[a].distance(geometries[b]) <= buff:
+                i.append(a)
+                j.append(b)
+    return numpy.array(i, dtype='int'), numpy.array(j, dtype='int'), candidates
+
+
+def distance2conmat(rows, cols, distance, n):
+    """
+    Converts distances (or least-costs) between units into row normalized connectivity probabilities (1/distance^2)
+    """
+    keep = distance > 0
+    conmat = scipy.sparse.csr_matrix((1.0 / distance[keep] ** 2, (rows[keep], cols[keep])), shape=(n, n))
+    rowsum = numpy.asarray(conmat.sum(axis=1)).ravel()
+    rowsum[rowsum == 0] = 1
+    return (scipy.sparse.diags(1.0 / rowsum) @ conmat).tocsr()
+
+
+def habitat_shares(pu_filepath, pu_id, hab_filepath, hab_id):
+    """
+    Overlays the habitats (dissolved by 'hab_id') on the planning units as marxanconpy.spatial.habitatresistance2conmats
+    does: the planning units are sorted by ID, and areas are measured in an equal-area projection and lengths in an
+    equal-distance projection (see marxanconpy.spatial.get_appropriate_projection).
+
+    Returns the planning units and the habitats in the equal-distance projection, the planning unit IDs (as strings),
+    the habitat names (as strings, sorted) and the share of the habitat area of each planning unit taken by each
+    habitat (planning units x habitats, shares under 0.00001 are 0).
+    """
+    with profiler.span('read', file=pu_filepath) as args:
+        pu = gpd.GeoDataFrame.from_file(pu_filepath)
+        args['rows'] = pu.shape[0]
+    with profiler.span('read', file=hab_filepath) as args:
+        hab = gpd.GeoDataFrame.from_file(hab_filepath)
+        args['rows'] = hab.shape[0]
+    with profiler.span('reproject', rows=pu.shape[0] + hab.shape[0]):
+        pu = pu.to_crs('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs').sort_values(pu_id).reset_index(drop=True)
+        area_proj = marxanconpy.spatial.get_appropriate_projection(pu, 'area')
+        dist_proj = marxanconpy.spatial.get_appropriate_projection(pu, 'distance')
+        hab = hab.to_crs('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
+        hab['habitat'] = hab[hab_id].astype('str')
+        hab = hab[['habitat', 'geometry']].dissolve(by='habitat').reset_index().sort_values('habitat')
+        hab = hab.reset_index(drop=True)
+        pu_area, hab_area = pu.to_crs(area_proj), hab.to_crs(area_proj)
+        pu_dist, hab_dist = pu.to_crs(dist_proj), hab.to_crs(dist_proj)
+    pu_ids = conmat_id_strings(pu[pu_id])
+    habitats = hab['habitat'].values
+
+    with profiler.span('overlay') as args:
+        pu_area['pu_index'] = numpy.arange(pu.shape[0])
+        overlay = gpd.overlay(pu_area[['pu_index', 'geometry']], hab_area[['habitat', 'geometry']],
+                              how='intersection')
+        args['rows'] = overlay.shape[0]
+    overlay['area'] = overlay.geometry.area
+    area = overlay.pivot_table(index='pu_index', columns='habitat', values='area', aggfunc='sum')
+    area = area.reindex(index=numpy.arange(pu.shape[0]), columns=habitats).fillna(0).values
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        shares = numpy.nan_to_num(area / area.sum(axis=1)[:, None])
+    shares[shares < 0.00001] = 0
+    return pu_dist, hab_dist, pu_ids, habitats, shares
+
+
+def habitat_lines(pu, hab, buff):
+    """
+    Finds the neighbouring planning units of marxanconpy.spatial.habitatresistance2conmats: those whose buffers (of
+    'buff') intersect, if more than half of the straight line between their centroids crosses habitat. Candidates come
+    from a spatial index (see 'neighbour_pairs'), so the work grows with the number of neighbouring pairs rather than
+    with the square of the number of planning units.
+
+    Returns the index arrays (i, j) of the neighbours (i < j), the length of each line within each habitat of 'hab'
+    (neighbours x habitats, scaled to add up to the length of the line) and the number of candidate pairs tested.
+    """
+    i, j, candidates = neighbour_pairs(pu.geometry, 2 * buff)
+    centroids = pu.geometry.centroid
+    lines = gpd.GeoSeries([shapely.geometry.LineString([centroids.iloc[a].coords[0], centroids.iloc[b].coords[0]])
+                           for a, b in zip(i, j)], crs=pu.crs)
+    crossed = numpy.column_stack([lines.intersection(geometry).length.values for geometry in hab.geometry]) \
+        if len(lines) > 0 else numpy.zeros((0, hab.shape[0]))
+    length = lines.length.values
+    habitat_line = crossed.sum(axis=1) > length * 0.5
+    i, j, crossed, length = i[habitat_line], j[habitat_line], crossed[habitat_line], length[habitat_line]
+    crossed = crossed / crossed.sum(axis=1)[:, None] * length[:, None]
+    return i, j, crossed, candidates
+
+
+# state shared by the least-cost path worker processes (set once per process by '_init_lcp_worker')
+_lcp_worker_state = {}
+
+
+def _init_lcp_worker(graphs, cutoff):
+    _lcp_worker_state['graphs'] = graphs
+    _lcp_worker_state['cutoff'] = cutoff
+
+
+def _lcp_worker(key, sources):
+    graph, targets = _lcp_worker_state['graphs'][key]
+    costs = scipy.sparse.csgraph.dijkstra(graph, directed=False, indices=sources, limit=_lcp_worker_state['cutoff'])
+    with numpy.errstate(divide='ignore'):
+        inverse = 1 / costs ** 2
+    inverse[~numpy.isfinite(inverse)] = 0
+    # the connectivity is normalized by the largest row sum over all planning units, including those without habitat
+    rowsums = inverse.sum(axis=1)
+    inverse[~targets[sources]] = 0
+    inverse[:, ~targets] = 0
+    rows, cols = numpy.nonzero(inverse)
+    return key, sources[rows], cols, inverse[rows, cols], rowsums
+
+
+def least_cost_connectivity(graphs, home_graphs, pu_ids, habitats, shares, cutoff=numpy.inf, processes=None):
+    """
+    Generates landscape connectivity ("Edge List with Habitat") from the least-cost paths between planning units, with
+    the model of marxanconpy.spatial.habitatresistance2conmats. 'graphs' are graphs of the cost of moving between
+    neighbouring planning units (by key) and 'home_graphs' the key of the graph of each home habitat: habitats which
+    share a graph share its searches.
+
+    The least-cost paths from every planning unit are independent single-source searches; they are partitioned across
+    a process pool and stop at 'cutoff'. Connectivity is 1/cost^2, divided by the largest row sum and multiplied by the
+    share of the home habitat in both planning units ('shares', planning units x habitats). Only the connections above
+    0 are returned.
+    """
+    n = len(pu_ids)
+    searched = {}
+    for h, habitat in enumerate(habitats):
+        if habitat not in home_graphs:
+            continue
+        key = home_graphs[habitat]
+        if graphs[key].nnz == 0 or not (shares[:, h] > 0).any():
+            print("Warning: Habitat '" + habitat + "' has no connectivity between planning units, excluding from "
+                                                   "further analyses")
+            continue
+        graph, targets = searched.get(key, (graphs[key], numpy.zeros(n, dtype='bool')))
+        searched[key] = (graph, targets | (shares[:, h] > 0))
+
+    # every planning unit is searched from (for the largest row sum), keeping each dense block of costs ~64MB
+    chunk = max(1, int(8e6 // max(n, 1)))
+    tasks = [(key, numpy.arange(k, min(k + chunk, n))) for key in searched for k in range(0, n, chunk)]
+    found = {key: ([], [], [], []) for key in searched}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes,
+                                                initializer=_init_lcp_worker,
+                                                initargs=(searched, cutoff)) as pool:
+        for key, rows, cols, values, rowsums in pool.map(_lcp_worker, [t[0] for t in tasks], [t[1] for t in tasks]):
+            for part, result in zip(found[key], [rows, cols, values, rowsums]):
+                part.append(result)
+
+    edges = []
+    for h, habitat in enumerate(habitats):
+        if home_graphs.get(habitat) not in searched:
+            continue
+        rows, cols, values, rowsums = [numpy.concatenate(part) for part in found[home_graphs[habitat]]]
+        largest = rowsums.max()
+        share = shares[:, h]
+        values = values / largest * share[rows] * share[cols] if largest > 0 else numpy.zeros(len(values))
+        keep = values > 0
+        if not keep.any():
+            continue
+        edges.append(pandas.DataFrame({'habitat': habitat,
+                                       'id1': pu_ids[rows[keep]],
+                                       'id2': pu_ids[cols[keep]],
+                                       'value': values[keep]}))
+    if len(edges) == 0:
+        return pandas.DataFrame(columns=['habitat', 'id1', 'id2', 'value'])
+    return pandas.concat(edges, ignore_index=True)
+
+
+@profiled('landscape connectivity')
+def habitatresistance2conmats_lcp(buff, hab_filepath, hab_id, res_mat_filepath, pu_filepath, pu_id, cutoff=None,
+                                  processes=None):
+    """
+    Generates landscape connectivity ("Edge List with Habitat") from the least-cost paths between planning units, with
+    the model of marxanconpy.spatial.habitatresistance2conmats (see habitat_lines and least_cost_connectivity).
+
+    For each home habitat, moving between neighbours costs the length of the line in each habitat multiplied by the
+    resistance (from the resistance matrix) from the home habitat to that habitat. The searches stop at 'cutoff', and
+    as in marxanconpy they are not bounded by default.
+    """
+    start = time.time()
+    pu, hab, pu_ids, habitats, shares = habitat_shares(pu_filepath, pu_id, hab_filepath, hab_id)
+    n = pu.shape[0]
+
+    resistance = pandas.read_csv(res_mat_filepath, index_col=0)
+    resistance.index = resistance.index.astype('str')
+    resistance.columns = resistance.columns.astype('str')
+
+    i, j, crossed, candidates = habitat_lines(pu, hab, buff)
+    print(str(candidates) + " candidate pairs tested, " + str(len(i)) + " neighbouring planning units found in " +
+          str(round(time.time() - start, 2)) + " seconds")
+
+    if cutoff is None:
+        cutoff = numpy.inf
+
+    graphs = {}
+    for habitat in habitats:
+        if habitat not in resistance.index:
+            print("Warning: habitat '" + habitat + "' is missing from the resistance matrix, skipping")
+            continue
+        through = resistance.loc[habitat].reindex(habitats).values.astype('float')
+        # lines crossing a habitat missing from the resistance matrix are impassable
+        known = ~numpy.isnan(through)
+        cost = crossed[:, known] @ through[known]
+        cost[(crossed[:, ~known] > 0).any(axis=1)] = numpy.inf
+        passable = numpy.isfinite(cost)
+        graphs[habitat] = scipy.sparse.csr_matrix((cost[passable], (i[passable], j[passable])), shape=(n, n))
+
+    edges = least_cost_connectivity(graphs, dict((habitat, habitat) for habitat in graphs), pu_ids, habitats, shares,
+                                    cutoff, processes)
+    print("Least-cost path connectivity generated in " + str(round(time.time() - start, 2)) + " seconds")
+    return edges
+
+
+@profiled('landscape connectivity')
+def habitatresistance2conmats_euclidean(buff, hab_filepath, hab_id, pu_filepath, pu_id, processes=None):
+    """
+    Generates landscape connectivity ("Edge List with Habitat") from the distance between planning units, with the
+    model of marxanconpy.spatial.habitatresistance2conmats (see habitat_lines and least_cost_connectivity).
+
+    Every habitat has a resistance of 1, so moving between neighbours costs the length of the line between their
+    centroids whatever the home habitat, and the shortest paths are found once for all habitats. As in marxanconpy,
+    they are not bounded.
+    """
+    start = time.time()
+    pu, hab, pu_ids, habitats, shares = habitat_shares(pu_filepath, pu_id, hab_filepath, hab_id)
+    n = pu.shape[0]
+
+    i, j, crossed, candidates = habitat_lines(pu, hab, buff)
+    print(str(candidates) + " candidate pairs tested, " + str(len(i)) + " neighbouring planning units found in " +
+          str(round(time.time() - start, 2)) + " seconds")
+
+    graphs = {'distance': scipy.sparse.csr_matrix((crossed.sum(axis=1), (i, j)), shape=(n, n))}
+    edges = least_cost_connectivity(graphs, dict((habitat, 'distance') for habitat in habitats), pu_ids, habitats,
+                                    shares, numpy.inf, processes)
+    print("Euclidean distance connectivity generated in " + str(round(time.time() - start, 2)) + " seconds")
+    return edges
+
+
+def import_rasterio():
+    """
+    Imports rasterio, which is only needed for resistance surfaces
+    """
+    try:
+        import rasterio
+        import rasterio.features
+        import rasterio.windows
+    except ImportError:
+        raise Exception("Resistance surfaces require the 'rasterio' package, please install it to use this feature")
+    return rasterio
+
+
+def raster_band_names(filepath):
+    """
+    Lists the bands of a raster ("1", "2", ...)
+    """
+    rasterio = import_rasterio()
+    with rasterio.open(filepath) as src:
+        return [str(b) for b in src.indexes]
+
+
+def read_resistance_window(src, band, window):
+    """
+    Reads a window of a resistance surface as floats. Nodata and non-positive cells are impassable (NaN).
+    """
+    resistance = src.read(band, window=window, masked=True).astype('float').filled(numpy.nan)
+    resistance[~(resistance > 0)] = numpy.nan
+    return resistance
+
+
+def raster_min_resistance(src, band):
+    """
+    Finds the smallest passable resistance of a raster band, reading it one block at a time
+    """
+    minimum = numpy.inf
+    for _, window in src.block_windows(band):
+        resistance = read_resistance_window(src, band, window)
+        if numpy.isfinite(resistance).any():
+            minimum = min(minimum, numpy.nanmin(resistance))
+    return minimum
+
+
+def raster_graph(resistance, xres, yres):
+    """
+    Builds the 8-neighbour graph of a resistance grid. Moving between two cells costs the step length multiplied by
+    the mean resistance of the cells; impassable (NaN) cells have no edges.
+    """
+    rows, cols = resistance.shape
+    index = numpy.arange(rows * cols).reshape(rows, cols)
+    diagonal = numpy.hypot(xres, yres)
+    i, j, c = [], [], []
+    for (dr, dc), step in [((0, 1), xres), ((1, 0), yres), ((1, 1), diagonal), ((1, -1), diagonal)]:
+        c0, c1 = max(0, -dc), cols - max(0, dc)
+        a = (slice(0, rows - dr), slice(c0, c1))
+        b = (slice(dr, rows), slice(c0 + dc, c1 + dc))
+        cost = step * (resistance[a] + resistance[b]) / 2
+        passable = numpy.isfinite(cost)
+        i.append(index[a][passable])
+        j.append(index[b][passable])
+        c.append(cost[passable])
+    return scipy.sparse.csr_matrix((numpy.concatenate(c), (numpy.concatenate(i), numpy.concatenate(j))),
+                                   shape=(rows * cols, rows * cols))
+
+
+def rasterize_units(shapes, out_shape, transform):
+    """
+    Labels the cells of a grid with the planning units ('shapes' are (geometry, label) pairs) whose geometry covers the
+    cell centre. Planning units too small to cover a cell centre take the unlabelled cells they touch instead.
+    """
+    rasterio = import_rasterio()
+    labels = rasterio.features.rasterize(shapes, out_shape=out_shape, transform=transform, fill=0,
+                                         all_touched=False, dtype='int32')
+    present = set(numpy.unique(labels))
+    missing = [s for s in shapes if s[1] not in present]
+    if len(missing) > 0:
+        touched = rasterio.features.rasterize(missing, out_shape=out_shape, transform=transform, fill=0,
+                                              all_touched=True, dtype='int32')
+        labels = numpy.where(labels == 0, touched, labels)
+    return labels
+
+
+# state shared by the resistance surface worker processes (set once per process by '_init_raster_worker')
+_raster_worker_state = {}
+
+
+def _init_raster_worker(res_filepath, band, geometries, cutoff, reach):
+    rasterio = import_rasterio()
+    _raster_worker_state['src'] = rasterio.open(res_filepath)
+    _raster_worker_state['band'] = band
+    _raster_worker_state['geometries'] = geometries
+    _raster_worker_state['tree'] = shapely.strtree.STRtree(geometries)
+    _raster_worker_state['index_by_id'] = {id(g): k for k, g in enumerate(geometries)}
+    _raster_worker_state['cutoff'] = cutoff
+    _raster_worker_state['reach'] = reach
+
+
+def _raster_worker(home):
+    rasterio = import_rasterio()
+    src = _raster_worker_state['src']
+    reach = _raster_worker_state['reach']
+    none = (home, numpy.array([], dtype='int'), numpy.array([]))
+
+    # only the cells reachable within the cutoff are read
+    if numpy.isinf(reach):
+        window = rasterio.windows.Window(0, 0, src.width, src.height)
+    else:
+        minx, miny, maxx, maxy = _raster_worker_state['geometries'][home].bounds
+        corners = [src.index(x, y) for x in (minx - reach, maxx + reach) for y in (miny - reach, maxy + reach)]
+        row0 = max(min(r for r, c in corners), 0)
+        row1 = min(max(r for r, c in corners) + 1, src.height)
+        col0 = max(min(c for r, c in corners), 0)
+        col1 = min(max(c for r, c in corners) + 1, src.width)
+        if row1 <= row0 or col1 <= col0:
+            return none
+        window = rasterio.windows.Window(col0, row0, col1 - col0, row1 - row0)
+
+    resistance = read_resistance_window(src, _raster_worker_state['band'], window)
+    bounds = shapely.geometry.box(*rasterio.windows.bounds(window, src.transform))
+    nearby = strtree_indices(_raster_worker_state['tree'], bounds, _raster_worker_state['index_by_id'])
+    labels = rasterize_units([(_raster_worker_state['geometries'][k], k + 1) for k in nearby],
+                             resistance.shape, src.window_transform(window)).ravel()
+
+    sources = numpy.flatnonzero((labels == home + 1) & numpy.isfinite(resistance.ravel()))
+    if len(sources) == 0:
+        return none
+    graph = raster_graph(resistance, abs(src.transform.a), abs(src.transform.e))
+    costs = scipy.sparse.csgraph.dijkstra(graph, directed=False, indices=sources, min_only=True,
+                                          limit=_raster_worker_state['cutoff'])
+    reached = (labels > 0) & (labels != home + 1) & numpy.isfinite(costs)
+    best = pandas.Series(costs[reached]).groupby(labels[reached] - 1).min()
+    return home, best.index.values.astype('int'), best.values
+
+
+# the default maximum cost distance of the least-cost paths is the cost of crossing this many planning units
+default_cutoff_units = 10
+
+
+def default_resistance_cutoff(pu, min_resistance, units=default_cutoff_units):
+    """
+    Returns the default maximum cost distance of the least-cost paths: the cost of crossing 'units' planning units (of
+    the median area, in the projection of 'pu') at the least resistance of the surface's cells
+    """
+    return units * numpy.sqrt(numpy.median(pu.area)) * min_resistance
+
+
+def resistance_surface_options(project):
+    """
+    Returns the band and the maximum cost distance (None for the default) of the project's resistance surface. Raises
+    ValueError with a message for the user if they are missing or invalid.
+    """
+    if not os.path.isfile(project['filepaths']['land_res_filepath']):
+        raise ValueError("Please select a resistance surface raster.")
+    band = str(project['filepaths'].get('land_res_file_hab_id', ''))
+    if not band.isdigit():
+        raise ValueError("Please select the band of the resistance surface.")
+    return int(band), cost_distance_cutoff(project['options'].get('land_res_cutoff', ''))
+
+
+def least_cost_path_options(project):
+    """
+    Returns the maximum cost distance (None for no bound) of the least-cost paths between the project's habitats.
+    Raises ValueError with a message for the user if the resistance matrix is missing or the distance is invalid.
+    """
+    if not os.path.isfile(project['filepaths']['land_res_mat_filepath']):
+        raise ValueError("Please select a resistance matrix.")
+    return cost_distance_cutoff(project['options'].get('land_lcp_cutoff', ''))
+
+
+def cost_distance_cutoff(cutoff):
+    """
+    Parses a maximum cost distance entered by the user: None if it is empty (the default of the engine), otherwise a
+    number above 0. Raises ValueError with a message for the user if it is invalid.
+    """
+    cutoff = str(cutoff).strip()
+    if cutoff == '':
+        return None
+    try:
+        cutoff = float(cutoff)
+    except ValueError:
+        raise ValueError("The maximum cost distance must be a number (or empty), not '" + cutoff + "'.")
+    if not 0 < cutoff < numpy.inf:
+        raise ValueError("The maximum cost distance must be above 0.")
+    return cutoff
+
+
+@profiled('landscape connectivity')
+def resistancesurface2conmat(res_filepath, pu_filepath, pu_id, band=1, cutoff=None, processes=None):
+    """
+    Generates landscape connectivity ("Edge List with Habitat") from the least-cost paths across a resistance surface
+    raster between the cells of each planning unit.
+
+    Moving between neighbouring cells (8 directions) costs the step length multiplied by the mean resistance of the
+    cells; nodata and non-positive cells are impassable. The cost-distance search from each planning unit stops at
+    'cutoff' (by default, see default_resistance_cutoff) and only reads the window of the raster reachable within it,
+    so large surfaces are never loaded whole. The searches are partitioned across a process pool. Connectivity is
+    1/cost^2 to every reached planning unit, row normalized, and the raster's name is used as the habitat.
+    """
+    rasterio = import_rasterio()
+    start = time.time()
+    with rasterio.open(res_filepath) as src:
+        if src.crs is None:
+            raise Exception("The resistance surface " + res_filepath + " has no coordinate reference system")
+        if src.crs.is_geographic:
+            print("Warning: the resistance surface is not projected, costs will be in degrees")
+        pu = gpd.GeoDataFrame.from_file(pu_filepath).to_crs(src.crs.to_wkt())
+        min_resistance = raster_min_resistance(src, band)
+        if not numpy.isfinite(min_resistance):
+            raise Exception("The resistance surface " + res_filepath + " has no passable cells (above 0) in band " +
+                            str(band))
+        if cutoff is None:
+            cutoff = default_resistance_cutoff(pu, min_resistance)
+        reach = cutoff / min_resistance
+        print("Resistance surface of " + str(src.width) + " x " + str(src.height) + " cells, maximum cost distance " +
+              str(cutoff) + ", reach of each search: " + str(reach) + " map units")
+    pu_ids = conmat_id_strings(pu[pu_id])
+    n = pu.shape[0]
+
+    rows, cols, costs = [], [], []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes,
+                                                initializer=_init_raster_worker,
+                                                initargs=(res_filepath, band, list(pu.geometry), cutoff,
+                                                          reach)) as pool:
+        for home, targets, cost in pool.map(_raster_worker, range(n), chunksize=16):
+            rows.append(numpy.full(len(targets), home, dtype='int'))
+            cols.append(targets)
+            costs.append(cost)
+
+    print("Resistance surface connectivity generated in " + str(round(time.time() - start, 2)) + " seconds")
+    if n == 0 or sum(len(r) for r in rows) == 0:
+        return pandas.DataFrame(columns=['habitat', 'id1', 'id2', 'value'])
+    conmat = distance2conmat(numpy.concatenate(rows), numpy.concatenate(cols), numpy.concatenate(costs), n).tocoo()
+    return pandas.DataFrame({'habitat': os.path.splitext(os.path.basename(res_filepath))[0],
+                             'id1': pu_ids[conmat.row],
+                             'id2': pu_ids[conmat.col],
+                             'value': conmat.data})
@@ -1,23 +1,11 @@
 # importing wx files
+import time
+startup = time.time()
 import wx
 import wx.lib.agw.aui as aui
 import wx.adv
 import wx.html2
-
-
-# import matplotlib
-import matplotlib
-
-matplotlib.use('WXAgg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
-from matplotlib.collections import PatchCollection
-
-# import spatial modules
-import geopandas as gpd
-from descartes import PolygonPatch
-import shapely
-import cartopy
+import wx.lib.newevent
 
 # import system helper modules
 import os
@@ -25,8 +13,27 @@ import sys
 import pandas
 import numpy
 import json
+import re
 import platform
 import subprocess
+import glob
+import functools
+import multiprocessing
+import concurrent.futures
+import threading
+import logging
+import logging.handlers
+
+# import the engines of Marxan Connect which don't need the GUI, along with the lazily imported modules they share with
+# it (marxanconpy, matplotlib, geopandas and shapely, see LazyModule)
+import MarxanConnectEngine
+from MarxanConnectEngine import *
+
+# matplotlib (with the wx backend) and cartopy are imported when something is first plotted
+MarxanConnectEngine.matplotlib_backend = 'WXAgg'
+plt = LazyModule('matplotlib.pyplot', requires=[matplotlib])
+backend_wxagg = LazyModule('matplotlib.backends.backend_wxagg', requires=[matplotlib])
+cartopy = LazyModule('cartopy', submodules=['cartopy.crs', 'cartopy.feature'])
 
 # import gui template made by wxformbuilder
 import gui
@@ -35,12 +42,13 @@ import gui
 
 os.environ["UBUNTU_MENUPROXY"]="0"
 if platform.system() == 'Darwin':
-    import pexpect
     wx.SystemOptions.SetOption(u"osx.openfiledialog.always-show-types","1")
 
 # define wildcards
 wc_MarCon = "Marxan Connect Project (*.MarCon)|*.MarCon|" \
             "All files (*.*)|*.*"
+wc_csv = "Comma Separated Values (*.csv)|*.csv|" \
+         "All files (*.*)|*.*"
 
 
 if getattr(sys, 'frozen', False):
@@ -50,12 +58,12 @@ else:
 
 sys.path.append(MCPATH)
 
-# import MarxanConnect python module
-import marxanconpy
-
 with open(os.path.join(MCPATH, 'VERSION')) as version_file:
     MarxanConnectVersion = version_file.read().strip()
 
+# seconds spent importing modules before the GUI is built (see startup_report)
+import_time = time.time() - startup
+
 class MarxanConnectGUI(gui.MarxanConnectGUI):
     def __init__(self, parent):
         """
@@ -66,6 +74,25 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         # set the icon
         self.set_icon(frame=self, rootpath=MCPATH)
 
+        # wxFormBuilder does not set the hints of text fields
+        self.land_HAB_cutoff.SetHint("No limit")
+        self.land_RES_cutoff.SetHint("Default")
+        self.BD_threshold.SetHint("0")
+
+        # Marxan runs in the background (see MarxanRunner and MarxanSweep)
+        self.Bind(EVT_MARXAN_PROGRESS, self.on_marxan_progress)
+        self.Bind(EVT_MARXAN_DONE, self.on_marxan_done)
+        self.Bind(EVT_SWEEP_PROGRESS, self.on_sweep_progress)
+        self.Bind(EVT_SWEEP_DONE, self.on_sweep_done)
+        self.Bind(EVT_UPDATE_PROGRESS, self.on_update_progress)
+        self.Bind(EVT_UPDATE_DONE, self.on_update_done)
+        self.Bind(EVT_POSTHOC_DONE, self.on_postHoc_done)
+        self.Bind(EVT_RESCALE_PROGRESS, self.on_rescale_progress)
+        self.Bind(EVT_RESCALE_DONE, self.on_rescale_done)
+
+        # post-hoc results are sorted by clicking a column label
+        self.postHoc_grid.Bind(wx.grid.EVT_GRID_LABEL_LEFT_CLICK, self.on_postHoc_grid_label)
+
         # start up log
         self.log = LogForm(parent=self)
         print(MCPATH)
@@ -104,7 +131,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             self.spatial = {}
             self.project = {}
             self.project['version'] = {}
-            self.project['version']['marxanconpy'] = marxanconpy.__version__
+            self.project['version']['marxanconpy'] = marxanconpy_version()
             self.project['version']['MarxanConnect'] = MarxanConnectVersion
             self.project['filepaths'] = {}
             self.project['filepaths']['projfile'] = str(sys.argv[1])
@@ -181,7 +208,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         """
         # create project list to store project specific data
         self.spatial = {}
-        self.project = marxanconpy.marcon.new_project(rootpath)
+        clear_metric_statistics()
+        self.project = new_project(rootpath)
         self.project['version']['MarxanConnect'] = MarxanConnectVersion
         self.workingdirectory = MCPATH
 
@@ -199,7 +227,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
         # set default file paths in GUI
         os.chdir(self.workingdirectory)
-        self.project = marxanconpy.marcon.edit_working_directory(self.project,self.workingdirectory,'absolute')
+        self.project = edit_working_directory(self.project,self.workingdirectory,'absolute')
         self.set_GUI_options()
         self.set_GUI_filepaths()
 
@@ -230,7 +258,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         if dlg.ShowModal() == wx.ID_OK:
             self.project = {}
             self.project['version'] = {}
-            self.project['version']['marxanconpy'] = marxanconpy.__version__
+            self.project['version']['marxanconpy'] = marxanconpy_version()
             self.project['version']['MarxanConnect'] = MarxanConnectVersion
             self.project['filepaths'] = {}
             self.project['filepaths']['projfile'] = dlg.GetPath()
@@ -241,6 +269,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
     def load_project_function(self,launch=False):
         self.spatial = {}
+        clear_metric_statistics()
         self.project = marxanconpy.marcon.load_project(self.project['filepaths']['projfile'])
         marxanconpy.marcon.validate_project(self.project)
         if not launch:
@@ -257,7 +286,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             print("Warning: This project file was created with a different version of Marxan Connect. Attempting to "
                   "update for compatibility")
             self.project['version'] = {}
-            self.project['version']['marxanconpy'] = marxanconpy.__version__
+            self.project['version']['marxanconpy'] = marxanconpy_version()
             self.project['version']['MarxanConnect'] = MarxanConnectVersion
 
         self.project = marxanconpy.marcon.edit_working_directory(self.project,
@@ -295,6 +324,11 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
     def set_GUI_options(self):
         # set default options
+        try:
+            set_memory_budget(self.project['options'].get('memory_budget'))
+        except ValueError as e:
+            print("Warning: " + str(e) + ", using the default memory budget")
+            set_memory_budget()
         self.fa_status_radioBox.SetStringSelection(self.project['options']['fa_status'])
         self.aa_status_radioBox.SetStringSelection(self.project['options']['aa_status'])
 
@@ -311,6 +345,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             if self.land_type_choice.GetPageText(i) == self.project['options']['land_conmat_type']:
                 self.land_type_choice.SetSelection(i)
         self.land_res_matrixTypeRadioBox.SetStringSelection(self.project['options']['land_res_matrixType'])
+        self.land_RES_cutoff.ChangeValue(str(self.project['options'].get('land_res_cutoff', '')))
+        self.land_HAB_cutoff.ChangeValue(str(self.project['options'].get('land_lcp_cutoff', '')))
 
         self.cf_demo_in_degree.SetValue(self.project['options']['demo_metrics']['in_degree'])
         self.cf_demo_out_degree.SetValue(self.project['options']['demo_metrics']['out_degree'])
@@ -348,6 +384,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.spec_radio.SetStringSelection(self.project['options']['spec_set'])
         self.targets.SetValue(self.project['options']['targets'])
         self.BD_filecheck.SetValue(self.project['options']['bd_filecheck'])
+        self.BD_threshold.ChangeValue(str(self.project['options'].get('bd_threshold', '')))
+        self.BD_method.SetStringSelection(self.project['options'].get('min_plan_graph_method', "Kruskal"))
         self.PUDAT_filecheck.SetValue(self.project['options']['pudat_filecheck'])
 
         self.NUMREPS.SetValue(self.project['options']['NUMREPS'])
@@ -361,6 +399,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.marxan_PU.SetStringSelection(self.project['options']['marxan_PU'])
         self.marxanBit_Radio.SetStringSelection(self.project['options']['marxan_bit'])
         self.marxan_Radio.SetStringSelection(self.project['options']['marxan'])
+        self.python_annealer.Check(self.project['options'].get('solver', 'Marxan') == 'Python')
 
 
         self.PUSHP_filecheck.SetValue(self.project['options']['pushp_filecheck'])
@@ -388,8 +427,12 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                                   self.project['filepaths']['land_cu_file_hab_id'])
         self.land_RES_mat_file.SetPath(self.project['filepaths']['land_res_mat_filepath'])
         self.land_RES_file.SetPath(self.project['filepaths']['land_res_filepath'])
-        self.set_GUI_id_selection(self.land_RES_file_res_id, self.project['filepaths']['land_res_filepath'],
-                                  self.project['filepaths']['land_res_file_hab_id'])
+        if os.path.isfile(self.project['filepaths']['land_res_filepath']):
+            try:
+                self.land_RES_file_res_id.SetItems(raster_band_names(self.project['filepaths']['land_res_filepath']))
+                self.land_RES_file_res_id.SetStringSelection(self.project['filepaths']['land_res_file_hab_id'])
+            except Exception as e:
+                print("Warning: the resistance surface could not be read: " + str(e))
         self.land_PU_CM_file.SetPath(self.project['filepaths']['land_pu_cm_filepath'])
 
         self.LP_file.SetPath(self.project['filepaths']['lp_filepath'])
@@ -489,7 +532,14 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.project = marxanconpy.marcon.edit_working_directory(self.project,
                                                                               self.workingdirectory,
                                                                               "relative")
-        marxanconpy.marcon.save_project(project=self.project,projfile=projfile)
+        # the boundary definitions are saved as marxanconpy's tables, so that marxanconpy can read the project file
+        saved = self.project
+        if 'boundary' in self.project.get('connectivityMetrics', {}):
+            boundaries = boundary_json(self.project['connectivityMetrics']['boundary'],
+                                       method=self.project['options'].get('min_plan_graph_method', "Kruskal"))
+            saved = dict(self.project,
+                         connectivityMetrics=dict(self.project['connectivityMetrics'], boundary=boundaries))
+        marxanconpy.marcon.save_project(project=saved,projfile=projfile)
         self.project = marxanconpy.marcon.edit_working_directory(self.project,
                                                                               self.workingdirectory,
                                                                               "absolute")
@@ -646,7 +696,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         crs = cartopy.crs.PlateCarree(central_longitude=(lonmin+lonmax)/2)
         self.plot.axes = self.plot.figure.gca(projection=crs)
         self.plot.axes.set_extent([lonmin, lonmax, latmin, latmax])
-        self.plot.canvas = FigureCanvas(self.plot, -1, self.plot.figure)
+        self.plot.canvas = backend_wxagg.FigureCanvasWxAgg(self.plot, -1, self.plot.figure)
         self.plot.sizer = wx.BoxSizer(wx.VERTICAL)
         self.plot.sizer.Add(self.plot.canvas, 1, wx.LEFT | wx.TOP | wx.GROW)
         self.plot.SetSizer(self.plot.sizer)
@@ -958,9 +1008,13 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.temp = {}
         self.project['filepaths']['pu_filepath'] = self.PU_file.GetPath()
         if os.path.isfile(self.project['filepaths']['pu_filepath']):
-            self.spatial['pu_shp'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['pu_filepath']).to_crs('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
-            self.spatial['pu_proj'] = marxanconpy.spatial.get_appropriate_projection(self.spatial['pu_shp'], 'area')
-            self.spatial['pu_shp'] = self.spatial['pu_shp'].to_crs(self.spatial['pu_proj'])
+            with profiler.span('read', file=self.project['filepaths']['pu_filepath']) as args:
+                self.spatial['pu_shp'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['pu_filepath'])
+                args['rows'] = self.spatial['pu_shp'].shape[0]
+            with profiler.span('reproject', rows=self.spatial['pu_shp'].shape[0]):
+                self.spatial['pu_shp'] = self.spatial['pu_shp'].to_crs('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
+                self.spatial['pu_proj'] = marxanconpy.spatial.get_appropriate_projection(self.spatial['pu_shp'], 'area')
+                self.spatial['pu_shp'] = self.spatial['pu_shp'].to_crs(self.spatial['pu_proj'])
             self.temp['items'] = list(gpd.GeoDataFrame.from_file(self.project['filepaths']['pu_filepath']))
             self.PU_file_pu_id.SetItems(self.temp['items'])
             if self.project['filepaths']['pu_file_pu_id'] in self.temp['items']:
@@ -986,13 +1040,18 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.project['filepaths']['fa_filepath'] = self.FA_file.GetPath()
         if os.path.isfile(self.project['filepaths']['fa_filepath']):
             if 'pu_shp' in self.spatial:
-                self.spatial['fa_shp'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['fa_filepath']).to_crs(self.spatial['pu_proj'])
-                self.spatial['fa_shp']['diss'] = 1
-                self.spatial['fa_shp'] = self.spatial['fa_shp'].dissolve(by='diss')
-                self.spatial['pu_shp']['fa_included'] = 0
-                for index, purow in self.spatial['pu_shp'].iterrows():
-                    self.spatial['pu_shp'].loc[index,'fa_included'] = self.spatial[
-                        'fa_shp'].geometry.intersects(purow.geometry).bool()
+                with profiler.span('read', file=self.project['filepaths']['fa_filepath']) as args:
+                    self.spatial['fa_shp'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['fa_filepath'])
+                    args['rows'] = self.spatial['fa_shp'].shape[0]
+                with profiler.span('reproject', rows=self.spatial['fa_shp'].shape[0]):
+                    self.spatial['fa_shp'] = self.spatial['fa_shp'].to_crs(self.spatial['pu_proj'])
+                with profiler.span('overlay', rows=self.spatial['pu_shp'].shape[0]):
+                    self.spatial['fa_shp']['diss'] = 1
+                    self.spatial['fa_shp'] = self.spatial['fa_shp'].dissolve(by='diss')
+                    self.spatial['pu_shp']['fa_included'] = 0
+                    for index, purow in self.spatial['pu_shp'].iterrows():
+                        self.spatial['pu_shp'].loc[index,'fa_included'] = self.spatial[
+                            'fa_shp'].geometry.intersects(purow.geometry).bool()
         # enable metrics
         self.lock_pudat(self.project['filepaths']['orig_pudat_filepath'])
         self.enable_metrics()
@@ -1004,12 +1063,17 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.project['filepaths']['aa_filepath'] = self.AA_file.GetPath()
         if os.path.isfile(self.project['filepaths']['aa_filepath']):
             if 'pu_shp' in self.spatial:
-                self.spatial['aa_shp'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['aa_filepath']).to_crs(self.spatial['pu_proj'])
-                self.spatial['aa_shp']['diss'] = 1
-                self.spatial['aa_shp'] = self.spatial['aa_shp'].dissolve(by='diss')
-                self.spatial['pu_shp']['aa_included'] = 0
-                for index, purow in self.spatial['pu_shp'].iterrows():
-                    self.spatial['pu_shp'].loc[index,'aa_included'] = self.spatial['aa_shp'].geometry.intersects(purow.geometry).bool()
+                with profiler.span('read', file=self.project['filepaths']['aa_filepath']) as args:
+                    self.spatial['aa_shp'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['aa_filepath'])
+                    args['rows'] = self.spatial['aa_shp'].shape[0]
+                with profiler.span('reproject', rows=self.spatial['aa_shp'].shape[0]):
+                    self.spatial['aa_shp'] = self.spatial['aa_shp'].to_crs(self.spatial['pu_proj'])
+                with profiler.span('overlay', rows=self.spatial['pu_shp'].shape[0]):
+                    self.spatial['aa_shp']['diss'] = 1
+                    self.spatial['aa_shp'] = self.spatial['aa_shp'].dissolve(by='diss')
+                    self.spatial['pu_shp']['aa_included'] = 0
+                    for index, purow in self.spatial['pu_shp'].iterrows():
+                        self.spatial['pu_shp'].loc[index,'aa_included'] = self.spatial['aa_shp'].geometry.intersects(purow.geometry).bool()
         # enable metrics
         self.lock_pudat(self.project['filepaths']['orig_pudat_filepath'])
         self.enable_metrics()
@@ -1093,23 +1157,22 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         """
         self.temp = {}
         self.project['filepaths']['land_res_filepath'] = self.land_RES_file.GetPath()
-        self.temp['items'] = list(gpd.GeoDataFrame.from_file(self.project['filepaths']['land_res_file_hab_id']))
+        try:
+            self.temp['items'] = raster_band_names(self.project['filepaths']['land_res_filepath'])
+        except Exception as e:
+            marxanconpy.warn_dialog(message="The resistance surface could not be read as a raster (e.g. GeoTIFF): " +
+                                            str(e))
+            return
         self.land_RES_file_res_id.SetItems(self.temp['items'])
         if self.project['filepaths']['land_res_file_hab_id'] in self.temp['items']:
             self.land_RES_file_res_id.SetStringSelection(self.project['filepaths']['land_res_file_hab_id'])
         else:
             self.land_RES_file_res_id.SetSelection(0)
-
-        self.land_RES_file_res_id.SetItems(
-            list(gpd.GeoDataFrame.from_file(self.project['filepaths']['land_res_filepath'])))
-        self.land_RES_file_res_id.SetSelection(0)
         self.on_land_RES_file_hab_id(event=None)
-        self.outline_shapefile_choices()
-        self.colormap_shapefile_choices()
 
     def on_land_RES_file_hab_id(self, event):
         """
-        Defines landscape Connectivity Unit file path
+        Defines landscape resistance surface band
         """
         self.project['filepaths']['land_res_file_hab_id'] = self.land_RES_file_res_id.GetStringSelection()
 
@@ -1290,7 +1353,6 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         if self.project['options']['land_conmat_type'] == "Resistance Surface":
             enable_hab = False
             enable_surface = True
-            marxanconpy.warn_dialog(message="This feature is not yet operational, please check back in the next version!")
         elif self.project['options']['land_conmat_type'] == "Connectivity Edge List with Habitat":
             enable_hab = False
             enable_surface = False
@@ -1302,20 +1364,20 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.land_HAB_file.Enable(enable_hab)
         self.land_HAB_file_hab_id_txt.Enable(enable_hab)
         self.land_HAB_file_hab_id.Enable(enable_hab)
-        self.land_RES_mat_filetext.Enable(enable_hab)
-        self.land_RES_mat_file.Enable(enable_hab)
-        self.resistance_mat_customize.Enable(enable_hab)
         self.land_HAB_buff.Enable(enable_hab)
         self.land_HAB_buff_txt.Enable(enable_hab)
         self.land_HAB_thresh.Enable(enable_hab)
         self.land_HAB_thresh_txt.Enable(enable_hab)
         self.land_res_matrixTypeRadioBox.Enable(enable_hab)
+        self.enable_least_cost_path(enable_hab)
 
         self.land_RES_filetext.Enable(enable_surface)
         self.land_RES_file.Enable(enable_surface)
         self.land_RES_def.Enable(enable_surface)
         self.land_res_file_res_id_txt.Enable(enable_surface)
         self.land_RES_file_res_id.Enable(enable_surface)
+        self.land_RES_cutoff_txt.Enable(enable_surface)
+        self.land_RES_cutoff.Enable(enable_surface)
         self.land_generate_button.Enable(enable_surface or enable_hab)
         self.land_PU_CM_progress.Enable(enable_surface or enable_hab)
 
@@ -1324,13 +1386,18 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
     def on_land_res_matrixTypeRadioBox(self, event):
         self.project['options']['land_res_matrixType'] = self.land_res_matrixTypeRadioBox.GetStringSelection()
-        if self.project['options']['land_res_matrixType'] == "Least-Cost Path":
-            enable_hab = False
-        elif self.project['options']['land_res_matrixType'] == "Euclidean Distance":
-            enable_hab = False
-        self.land_RES_mat_filetext.Enable(enable_hab)
-        self.land_RES_mat_file.Enable(enable_hab)
-        self.resistance_mat_customize.Enable(enable_hab)
+        self.enable_least_cost_path(self.land_res_matrixTypeRadioBox.IsEnabled())
+
+    def enable_least_cost_path(self, enable_hab):
+        """
+        Enables the resistance matrix and the maximum cost distance, which are only used by the least-cost paths
+        """
+        enable_lcp = enable_hab and self.project['options']['land_res_matrixType'] == "Least-Cost Path"
+        self.land_RES_mat_filetext.Enable(enable_lcp)
+        self.land_RES_mat_file.Enable(enable_lcp)
+        self.resistance_mat_customize.Enable(enable_lcp)
+        self.land_HAB_cutoff_txt.Enable(enable_lcp)
+        self.land_HAB_cutoff.Enable(enable_lcp)
 
     def on_land_HAB_buff(self, event):
         """
@@ -1339,6 +1406,18 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         """
         self.project['options']['land_hab_buff'] = self.land_HAB_buff.GetValue()
 
+    def on_land_RES_cutoff(self, event):
+        """
+        Maximum cost distance of the least-cost paths across the resistance surface (empty for the default)
+        """
+        self.project['options']['land_res_cutoff'] = self.land_RES_cutoff.GetValue().strip()
+
+    def on_land_HAB_cutoff(self, event):
+        """
+        Maximum cost distance of the least-cost paths between habitats (empty for no limit)
+        """
+        self.project['options']['land_lcp_cutoff'] = self.land_HAB_cutoff.GetValue().strip()
+
     def on_land_HAB_thresh(self, event):
         """
         Threshold under which habitat connectivity values is considered null. Ranges from 0 to 1. Without a threshold,
@@ -1358,6 +1437,18 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         """
         self.project['options']['bd_filecheck'] = self.BD_filecheck.GetValue()
 
+    def on_BD_threshold(self, event):
+        """
+        Connectivity at or below which connections are left out of connectivity boundary files (empty for 0)
+        """
+        self.project['options']['bd_threshold'] = self.BD_threshold.GetValue().strip()
+
+    def on_BD_method(self, event):
+        """
+        Algorithm of the minimum planning graph boundary ("Kruskal" or "Boruvka", see min_plan_graph)
+        """
+        self.project['options']['min_plan_graph_method'] = self.BD_method.GetStringSelection()
+
     def on_PUDAT_filecheck(self, event):
         """
         Option to export pu.dat
@@ -1374,6 +1465,58 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             self.log.Show()
         return
 
+    def on_debug_logfile(self, event):
+        """
+        Starts/Stops copying the debug log to a (rotating) log file
+        """
+        if self.debug_logfile.IsChecked():
+            dlg = wx.FileDialog(self, "Save the debug log to", defaultFile="MarxanConnect.log",
+                                wildcard="Log files (*.log)|*.log|All files (*.*)|*.*",
+                                style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+            if dlg.ShowModal() == wx.ID_OK:
+                self.log.redir.set_logfile(dlg.GetPath())
+                print("Saving the debug log to " + dlg.GetPath())
+            else:
+                self.debug_logfile.Check(False)
+            dlg.Destroy()
+        else:
+            self.log.redir.set_logfile(None)
+
+    def on_startup_report(self, event):
+        self.log.Show()
+        self.startup_report()
+
+    def startup_report(self):
+        """
+        Prints how long the GUI took to start and which modules were deferred until first used (see LazyModule)
+        """
+        if not hasattr(self, 'window_time'):
+            self.window_time = time.time() - startup
+        print("Startup: " + str(round(import_time, 2)) + " seconds importing modules, first window after " +
+              str(round(self.window_time, 2)) + " seconds")
+        for name, module in sorted(globals().items()):
+            if isinstance(module, LazyModule):
+                if module._name in LazyModule.import_times:
+                    print("  " + module._name + ": imported when first used, in " +
+                          str(round(LazyModule.import_times[module._name], 2)) + " seconds")
+                else:
+                    print("  " + module._name + ": not imported yet")
+        if hasattr(self, 'loaded_before_show'):
+            print("  imported before the window was shown: " + (", ".join(self.loaded_before_show) or "none of " +
+                                                               ", ".join(startup_heavy_modules)))
+
+        # benchmarks/startup.py asks for the timings in a file and for the GUI to close once the window is up
+        if os.environ.get('MARXANCONNECT_STARTUP_REPORT') and not hasattr(self, 'startup_reported'):
+            self.startup_reported = True
+            with open(os.environ['MARXANCONNECT_STARTUP_REPORT'], 'w') as file:
+                json.dump({'startup': startup,
+                           'window': startup + self.window_time,
+                           'imports': import_time,
+                           'frozen': bool(getattr(sys, 'frozen', False)),
+                           'deferred': LazyModule.import_times,
+                           'loaded_before_show': getattr(self, 'loaded_before_show', None)}, file)
+            wx.GetApp().ExitMainLoop()
+
     def enable_metrics(self):
         if self.project['filepaths']['demo_pu_cm_filepath'] != "":
             demo_enable = True
@@ -1482,6 +1625,30 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         if self.bd_land_conn_boundary.GetValue():
             self.bd_demo_conn_boundary.SetValue(False)
 
+    def on_memory_budget(self, event):
+        """
+        Sets the memory the connectivity engines can use before they read, rescale, evaluate and export a chunk at a
+        time (see set_memory_budget)
+        """
+        dlg = wx.TextEntryDialog(self, "Memory (in MB) that reading, rescaling, evaluating and exporting connectivity "
+                                       "can use before switching to slower processing in chunks. Leave empty for the "
+                                       "default, half of this computer's memory.\n\nThe connectivity metrics are "
+                                       "calculated by marxanconpy on dense matrices and are not covered: they are only "
+                                       "checked against the budget.", "Memory Budget",
+                                 str(self.project['options'].get('memory_budget', '')))
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        value = dlg.GetValue()
+        dlg.Destroy()
+        try:
+            set_memory_budget(value)
+            self.project['options']['memory_budget'] = value.strip()
+            print("Memory budget: " + str(int(MarxanConnectEngine.memory_budget_mb)) + " MB")
+        except ValueError:
+            marxanconpy.warn_dialog(message="'" + value + "' is not a number above 0, the memory budget was not "
+                                                          "changed.")
+
     def on_bd_demo_conn_boundary(self, event):
         self.enable_calc_metrics()
         if self.bd_demo_conn_boundary.GetValue():
@@ -1558,6 +1725,12 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         """
         self.project['options']['marxan_bit'] = self.marxanBit_Radio.GetStringSelection()
 
+    def on_python_annealer(self, event):
+        """
+        Option to solve the Marxan problem with the Python annealer (see anneal) instead of Marxan
+        """
+        self.project['options']['solver'] = 'Python' if self.python_annealer.IsChecked() else 'Marxan'
+
     def on_marxan_Radio( self, event ):
         """
         Option for Marxan version
@@ -1616,69 +1789,154 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
             self.check_matrix_list_format(format=self.demo_matrixFormatRadioBox.GetStringSelection(),
                                           filepath=self.project['filepaths']['demo_cu_cm_filepath'])
-            self.temp = {}
-            # create dict entry for connectivityMetrics
-
-            if 'connectivityMetrics' not in self.project:
-
-                self.project['connectivityMetrics'] = {}
-
-            self.temp['demo_pu_conmat'] = marxanconpy.spatial.rescale_matrix(
-                self.project['filepaths']['pu_filepath'],
-                self.project['filepaths']['pu_file_pu_id'],
-                self.project['filepaths']['demo_cu_filepath'],
-                self.project['filepaths']['demo_cu_file_pu_id'],
-                self.project['filepaths']['demo_cu_cm_filepath'],
-                matrixformat=self.project['options']['demo_conmat_format'],
-                edge=self.project['options']['demo_conmat_rescale_edge'],
-                progressbar=self.project['options']['demo_pu_cm_progress'])
-
-            if self.demo_matrixFormatRadioBox.GetStringSelection() == "Edge List with Time":
-                self.temp['demo_pu_conmat_time'] = self.temp['demo_pu_conmat'][
-                    self.temp['demo_pu_conmat']['time'] != 'mean'].copy().melt(id_vars=['time', 'id1'],
-                                                                               var_name='id2',
-                                                                               value_name='value').to_json(
-                    orient='split')
-                self.temp['demo_pu_conmat'] = self.temp['demo_pu_conmat'][
-                    self.temp['demo_pu_conmat']['time'] == 'mean'].drop(['id1', 'time'], axis=1).to_json(
-                    orient='split')
-                pandas.read_json(self.temp['demo_pu_conmat_time'],
-                                 orient='split').to_csv(
-                    self.project['filepaths']['demo_pu_cm_filepath'],
-                    index=False, header=True, sep=",")
-                pandas.read_json(self.temp['demo_pu_conmat'], orient='split').to_csv(
-                    str.replace(self.project['filepaths']['demo_pu_cm_filepath'], '.csv',
-                                '_mean_of_times.csv'),
-                    index=True, header=True, sep=",")
-
-            else:
-                self.temp['demo_pu_conmat'] = self.temp['demo_pu_conmat'].to_json(orient='split')
-                pandas.read_json(self.temp['demo_pu_conmat'],
-                                 orient='split').to_csv(
-                    self.project['filepaths']['demo_pu_cm_filepath'], index=True, header=True, sep=",")
+            self.rescale_demo_matrix()
+            self.project_build().mark_built(self.project, 'rescale')
         except:
             self.log.Show()
             raise
 
+    def rescale_demo_matrix(self, project=None):
+        """
+        Rescales the connectivity matrix to the planning units and writes it to the planning unit connectivity file (see
+        rescale_matrix_sparse). It doesn't use the GUI, so it can run in a worker thread (see project_build).
+        """
+        project = project or self.project
+        if 'connectivityMetrics' not in project:
+            project['connectivityMetrics'] = {}
+
+        rescale_matrix_sparse(project['filepaths']['pu_filepath'],
+                              project['filepaths']['pu_file_pu_id'],
+                              project['filepaths']['demo_cu_filepath'],
+                              project['filepaths']['demo_cu_file_pu_id'],
+                              project['filepaths']['demo_cu_cm_filepath'],
+                              project['filepaths']['demo_pu_cm_filepath'],
+                              matrixformat=project['options']['demo_conmat_format'],
+                              edge=project['options']['demo_conmat_rescale_edge'])
+
+    def on_demo_batch_rescale(self, event):
+        """
+        Rescales several connectivity matrices (e.g. seasons, years, species) to the planning units in one batch. The
+        overlay between the planning units and the connectivity units is computed once and shared by all matrices.
+        """
+        dlg = wx.FileDialog(self, message="Choose the connectivity matrices to rescale",
+                            defaultDir=self.workingdirectory,
+                            wildcard=wc_csv,
+                            style=wx.FD_OPEN | wx.FD_MULTIPLE)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        filepaths = dlg.GetPaths()
+        dlg.Destroy()
+
+        dlg = wx.DirDialog(self, message="Choose the output folder for the rescaled matrices",
+                           defaultPath=self.workingdirectory)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        outdir = dlg.GetPath()
+        dlg.Destroy()
+
+        marxanconpy.warn_dialog(message="Rescaling of matrices is offered as a convenience function. It it up to the user to determine"
+                         " if the rescaling is ecologically valid. We recommend acquiring connectivity data at the same"
+                         " scale as the planning unit")
+        self.log.Show()
+        # the matrices are rescaled in a background thread, which posts EVT_RESCALE_PROGRESS and EVT_RESCALE_DONE
+        self.rescale_progress = wx.ProgressDialog("Batch Rescaling", "Computing the overlay..." + " " * 40,
+                                                  maximum=len(filepaths), parent=self,
+                                                  style=wx.PD_APP_MODAL | wx.PD_ELAPSED_TIME)
+        threading.Thread(target=self.batch_rescale_thread, args=(filepaths, outdir), daemon=True).start()
+
+    def batch_rescale_thread(self, filepaths, outdir):
+        """
+        Rescales the matrices 'filepaths' in the background and saves the timing report (see on_demo_batch_rescale)
+        """
+        report = None
+        try:
+            report = batch_rescale_matrices(filepaths,
+                                            outdir,
+                                            self.project['filepaths']['pu_filepath'],
+                                            self.project['filepaths']['pu_file_pu_id'],
+                                            self.project['filepaths']['demo_cu_filepath'],
+                                            self.project['filepaths']['demo_cu_file_pu_id'],
+                                            matrixformat=self.project['options']['demo_conmat_format'],
+                                            edge=self.project['options']['demo_conmat_rescale_edge'],
+                                            callback=lambda done, files: wx.PostEvent(
+                                                self, RescaleProgressEvent(done=done, files=files)))
+            report.to_csv(os.path.join(outdir, 'batch_rescale_report.csv'), index=False)
+        except Exception as e:
+            print("Error while rescaling the connectivity matrices: " + repr(e))
+        wx.PostEvent(self, RescaleDoneEvent(report=report))
+
+    def on_rescale_progress(self, event):
+        if hasattr(self, 'rescale_progress'):
+            self.rescale_progress.Update(min(event.done, event.files - 1), str(event.done) + " of " +
+                                         str(event.files) + " connectivity matrices rescaled")
+
+    def on_rescale_done(self, event):
+        """
+        Reports the outcome of the batch rescaling, whose timings are in the debugging console and the report file
+        """
+        if hasattr(self, 'rescale_progress'):
+            self.rescale_progress.Destroy()
+            del self.rescale_progress
+        report = event.report
+        if report is not None and (report['status'] == 'ok').all():
+            marxanconpy.warn_dialog(str(len(report)) + " connectivity matrices rescaled successfully. See "
+                                    "'batch_rescale_report.csv' in the output folder for timings.",
+                                    "Rescaling Successful")
+        else:
+            marxanconpy.warn_dialog("Some connectivity matrices could not be rescaled. See the debugging console or "
+                                    "'batch_rescale_report.csv' in the output folder for details.")
+
     def on_land_generate_button(self, event):
         try:
-            self.temp = {}
-            self.temp['land_pu_conmat'] = marxanconpy.spatial.habitatresistance2conmats(
-                buff=float(self.project['options']['land_hab_buff']),
-                hab_filepath=self.project['filepaths']['land_cu_filepath'],
-                hab_id=self.project['filepaths']['land_cu_file_hab_id'],
-                res_mat_filepath=self.project['filepaths']['land_res_mat_filepath'],
-                pu_filepath=self.project['filepaths']['pu_filepath'],
-                pu_id=self.project['filepaths']['pu_file_pu_id'],
-                res_type=self.project['options']['land_res_matrixType'],
-                progressbar=self.land_PU_CM_progress.GetValue())
-
-            pandas.read_json(self.temp['land_pu_conmat'], orient='split').to_csv(
-                self.project['filepaths']['land_pu_cm_filepath'], index=0, header=True, sep=",")
+            if self.project['options']['land_conmat_type'] == "Resistance Surface":
+                resistance_surface_options(self.project)
+            elif self.project['options']['land_res_matrixType'] == "Least-Cost Path":
+                least_cost_path_options(self.project)
+        except ValueError as e:
+            marxanconpy.warn_dialog(message=str(e))
+            return
+        try:
+            self.generate_land_matrix(self.project)
+            self.project_build().mark_built(self.project, 'landscape')
         except:
             self.log.Show()
             raise
 
+    def generate_land_matrix(self, project):
+        """
+        Generates the planning unit landscape connectivity matrix from the habitat and resistance data. It doesn't use
+        the GUI, so it can run in a worker thread (see project_build).
+        """
+        if project['options']['land_conmat_type'] == "Resistance Surface":
+            band, cutoff = resistance_surface_options(project)
+            land_pu_conmat = resistancesurface2conmat(
+                res_filepath=project['filepaths']['land_res_filepath'],
+                pu_filepath=project['filepaths']['pu_filepath'],
+                pu_id=project['filepaths']['pu_file_pu_id'],
+                band=band,
+                cutoff=cutoff)
+        elif project['options']['land_res_matrixType'] == "Least-Cost Path":
+            land_pu_conmat = habitatresistance2conmats_lcp(
+                buff=float(project['options']['land_hab_buff']),
+                hab_filepath=project['filepaths']['land_cu_filepath'],
+                hab_id=project['filepaths']['land_cu_file_hab_id'],
+                res_mat_filepath=project['filepaths']['land_res_mat_filepath'],
+                pu_filepath=project['filepaths']['pu_filepath'],
+                pu_id=project['filepaths']['pu_file_pu_id'],
+                cutoff=least_cost_path_options(project))
+        elif project['options']['land_res_matrixType'] == "Euclidean Distance":
+            land_pu_conmat = habitatresistance2conmats_euclidean(
+                buff=float(project['options']['land_hab_buff']),
+                hab_filepath=project['filepaths']['land_cu_filepath'],
+                hab_id=project['filepaths']['land_cu_file_hab_id'],
+                pu_filepath=project['filepaths']['pu_filepath'],
+                pu_id=project['filepaths']['pu_file_pu_id'])
+        else:
+            return
+        land_pu_conmat.to_csv(project['filepaths']['land_pu_cm_filepath'], index=0, header=True, sep=",")
+
     def on_resistance_mat_customize(self, event):
         file_viewer(parent=self, file=self.project['filepaths']['land_res_mat_filepath'],
                     title='Resistance Matrix - WARNING CHANGES WILL NOT BE SAVED, check back in the next version!')
@@ -1721,6 +1979,15 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         """
         calculates the selected metrics
         """
+        self.calc_metrics()
+        self.project_build().mark_built(self.project, 'metrics')
+        marxanconpy.warn_dialog("All calculations completed successfully.",
+                                "Calculations Successful")
+
+    def calc_metrics(self):
+        """
+        calculates the selected metrics and updates the metric choices
+        """
         try:
             print("Calculating Metrics")
 
@@ -1735,17 +2002,53 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                 marxanconpy.warn_dialog(message="No 'Units' selected for metric calculations.")
                 raise Exception("No 'Units' selected for metric calculations.")
 
-            marxanconpy.manipulation.calc_metrics(project=self.project,
-                                                  progressbar=True,
-                                                  calc_metrics_pu=self.calc_metrics_pu.GetValue(),
-                                                  calc_metrics_cu=self.calc_metrics_cu.GetValue())
-
-
-
-
-
-
-
+            # marxanconpy calculates the metrics on dense matrices, which can't be split into chunks
+            units = [shapefile_records(self.project['filepaths'][k]) for k, calc in
+                     [('pu_filepath', self.calc_metrics_pu.GetValue()),
+                      ('demo_cu_filepath', self.calc_metrics_cu.GetValue()),
+                      ('land_cu_filepath', self.calc_metrics_cu.GetValue())] if calc]
+            units = max([n for n in units if n] or [0])
+            if over_budget(dense_matrix_mb(units, units), "the metrics of " + str(units) + " units",
+                           fallback="The metrics may run out of memory."):
+                marxanconpy.warn_dialog(message="The connectivity matrices of " + str(units) + " units need more "
+                                                "memory than the memory budget (Tools > Memory Budget...) and the "
+                                                "metrics may run out of memory. Consider fewer or larger units.")
+
+            # boundary definitions are built from the sparse matrices when exported (see export_boundary_file)
+            self.temp = {}
+            self.temp['boundary'] = {}
+            for type in ['demo', 'land']:
+                for metric in ['conn_boundary', 'min_plan_graph']:
+                    self.temp['boundary'][(type, metric)] = self.project['options'][type + '_metrics'][metric]
+                    self.project['options'][type + '_metrics'][metric] = False
+            try:
+                # each metric has its own span if the marxanconpy functions are timed (see PerformancePanel)
+                with profiler.span('metrics', metrics=" ".join(
+                        type + ":" + metric for type in ['demo', 'land']
+                        for metric, selected in self.project['options'][type + '_metrics'].items() if selected)):
+                    marxanconpy.manipulation.calc_metrics(project=self.project,
+                                                          progressbar=True,
+                                                          calc_metrics_pu=self.calc_metrics_pu.GetValue(),
+                                                          calc_metrics_cu=self.calc_metrics_cu.GetValue())
+            finally:
+                # the metrics were replaced
+                clear_metric_statistics()
+                for (type, metric), selected in self.temp['boundary'].items():
+                    self.project['options'][type + '_metrics'][metric] = selected
+
+            if self.calc_metrics_pu.GetValue():
+                for (type, metric), selected in self.temp['boundary'].items():
+                    if not selected:
+                        continue
+                    # marxanconpy's keys (e.g. 'conn_boundary_demo_pu'), which name the exported boundary files
+                    boundary = {'metric': metric,
+                                'filepath': self.project['filepaths'][type + '_pu_cm_filepath'],
+                                'format': self.project['options']['demo_conmat_format'] if type == 'demo'
+                                else "Edge List with Habitat"}
+                    if type == 'land':
+                        boundary['hab_thresh'] = float(self.project['options']['land_hab_thresh'])
+                    self.project['connectivityMetrics'].setdefault('boundary', {})[
+                        metric + '_' + type + '_pu'] = boundary
 
             # create initial spec
             self.project['options']['metricsCalculated'] = True
@@ -1766,17 +2069,51 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             print("Warning: Error in metrics calculation")
             self.log.Show()
             raise
-        marxanconpy.warn_dialog("All calculations completed successfully.",
-                                "Calculations Successful")
 
     def on_export_metrics(self, event):
-        self.on_export_CF_files(event=None, mute=True)
-        self.on_export_BD_file(event=None, mute=True)
-        self.on_export_PUDAT(event=None, mute=True)
+        try:
+            jobs = self.export_jobs()
+        except ValueError as e:
+            marxanconpy.warn_dialog(message=str(e))
+            return
+        self.write_export_files(jobs)
+        self.project_build().mark_built(self.project, 'marxan files')
         marxanconpy.warn_dialog("All files exported successfully.",
                                 "Export Successful")
 
+    def export_jobs(self, in_memory=False):
+        """
+        Returns all the Marxan input files to export (see write_export_files), by file path. With 'in_memory', they are
+        all tables (see boundary_export_jobs).
+        """
+        jobs = self.CF_export_tables()
+        if self.BD_filecheck.GetValue():
+            jobs.update(self.boundary_export_jobs(BD_filepath=self.project['filepaths']['bd_filepath'],
+                                                  in_memory=in_memory))
+        if self.PUDAT_filecheck.GetValue():
+            jobs.update(self.PUDAT_export_tables())
+        return jobs
+
+    def annealer_tables(self):
+        """
+        Returns the project's Marxan input tables, by file path, for the Python annealer to solve the project in memory
+        (see read_annealing_problem). Files which aren't exported by the project (e.g. the original pu.dat) are read.
+        """
+        if not self.project['options'].get('metricsCalculated', False):
+            return {}
+        return self.export_jobs(in_memory=True)
+
     def on_export_CF_files( self, event, mute=False ):
+        self.write_export_files(self.CF_export_tables())
+        if not mute:
+            marxanconpy.warn_dialog("Planning Unit versus Conservation Feature (i.e. puvspr.dat) and Conservation Feature (i.e. spec.dat) files exported successfully.",
+                                    "Export Successful")
+
+    def CF_export_tables(self):
+        """
+        Returns the spec.dat and puvspr.dat tables to export, by file path
+        """
+        tables = {}
         cf = {}
         spec = {}
         for type in ['spec_demo_pu', 'spec_land_pu']:
@@ -1794,8 +2131,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             # Export or append feature files
             if self.cf_export_radioBox.GetStringSelection() == "Export":
                 # export spec
-
-                spec.to_csv(self.project['filepaths']['spec_filepath'], index=0)
+                tables[self.project['filepaths']['spec_filepath']] = spec
                 # export conservation features
                 cf['pu'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['pu_filepath'])[self.project['filepaths']['pu_file_pu_id']]
                 try:
@@ -1807,7 +2143,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                 cf = cf.rename(columns={'id': 'species'}).sort_values(['pu', 'species'])
                 cf = cf[cf['amount'] > 0]
                 cf = cf.sort_values(by=['pu'])
-                cf[['species', 'pu', 'amount']].to_csv(self.project['filepaths']['cf_filepath'], index=0)
+                tables[self.project['filepaths']['cf_filepath']] = cf[['species', 'pu', 'amount']]
 
             elif self.cf_export_radioBox.GetStringSelection() == "Append":
                 # append
@@ -1834,9 +2170,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                 # append spec
                 new_spec = spec.copy()
                 new_spec['id'] = new_spec['id'] + max(old_spec['id'])
-                pandas.concat([old_spec, new_spec],sort=False).fillna(0.0).to_csv(
-                    self.project['filepaths']['spec_filepath']
-                    , index=0)
+                tables[self.project['filepaths']['spec_filepath']] = pandas.concat([old_spec, new_spec],
+                                                                                   sort=False).fillna(0.0)
                 # append conservation features
                 new_cf = cf.copy()
                 new_cf['pu'] = gpd.GeoDataFrame.from_file(self.project['filepaths']['pu_filepath'])[self.project['filepaths']['pu_file_pu_id']]
@@ -1849,95 +2184,133 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                 new_cf = pandas.merge(new_cf, new_spec, how='outer', on='name')
                 new_cf = new_cf.rename(columns={'id': 'species'})
                 new_cf = new_cf[new_cf['amount']>0]
-                pandas.concat([old_cf, new_cf[['species', 'pu', 'amount']]],sort=False).sort_values(['pu','species']).to_csv(
-                    self.project['filepaths']['cf_filepath'], index=0)
-
-        if not mute:
-            marxanconpy.warn_dialog("Planning Unit versus Conservation Feature (i.e. puvspr.dat) and Conservation Feature (i.e. spec.dat) files exported successfully.",
-                                    "Export Successful")
+                tables[self.project['filepaths']['cf_filepath']] = pandas.concat(
+                    [old_cf, new_cf[['species', 'pu', 'amount']]], sort=False).sort_values(['pu','species'])
+        return tables
 
     def on_export_BD_file( self, event, mute=False):
         if self.BD_filecheck.GetValue():
-            self.export_boundary_file(BD_filepath=self.project['filepaths']['bd_filepath'])
+            try:
+                self.export_boundary_file(BD_filepath=self.project['filepaths']['bd_filepath'])
+            except ValueError as e:
+                marxanconpy.warn_dialog(message=str(e))
+                return
         if not mute:
             marxanconpy.warn_dialog("Spatial Dependencies (i.e. boundary.dat) file exported successfully.",
                                     "Export Successful")
 
     def on_export_PUDAT( self, event, mute=False):
         if self.PUDAT_filecheck.GetValue():
-            if os.path.isfile(self.project['filepaths']['orig_pudat_filepath']):
-                self.temp = {}
-                self.lock_pudat(self.project['filepaths']['orig_pudat_filepath'])
-                self.temp['pudat'] = marxanconpy.read_csv_tsv(self.project['filepaths']['orig_pudat_filepath'])
-                self.temp['pudat']['status'] = self.project['connectivityMetrics']['status']
-                self.temp['pudat'].to_csv(self.project['filepaths']['pudat_filepath'], index=0)
-            else:
-                marxanconpy.warn_dialog("Warning! File: " +
-                                        self.project['filepaths']['orig_pudat_filepath'] +
-                                        " does not exist.")
+            self.write_export_files(self.PUDAT_export_tables())
 
         if not mute:
             marxanconpy.warn_dialog("Planning Unit (i.e. pu.dat) file exported successfully.",
                                     "Export Successful")
 
+    def PUDAT_export_tables(self):
+        """
+        Returns the pu.dat table to export, by file path
+        """
+        if os.path.isfile(self.project['filepaths']['orig_pudat_filepath']):
+            self.temp = {}
+            self.lock_pudat(self.project['filepaths']['orig_pudat_filepath'])
+            self.temp['pudat'] = read_pudat(self.project['filepaths']['orig_pudat_filepath']).copy()
+            self.temp['pudat']['status'] = self.project['connectivityMetrics']['status']
+            return {self.project['filepaths']['pudat_filepath']: self.temp['pudat']}
+        else:
+            marxanconpy.warn_dialog("Warning! File: " +
+                                    self.project['filepaths']['orig_pudat_filepath'] +
+                                    " does not exist.")
+            return {}
+
     def export_boundary_file(self, BD_filepath):
+        self.write_export_files(self.boundary_export_jobs(BD_filepath))
+
+    def boundary_export_jobs(self, BD_filepath, in_memory=False):
+        """
+        Returns the boundary definitions to export, by file path: functions streaming them from the connectivity
+        matrices (see export_boundary) or, for projects loaded from a .MarCon file (see boundary_json), tables. With
+        'in_memory', the boundaries built from the connectivity matrices are tables too (see boundary_table).
+        """
+        jobs = {}
         multiple = len(self.project['connectivityMetrics']['boundary'].keys()) > 1
 
         for k in self.project['connectivityMetrics']['boundary']:
             # Export each selected boundary definition
             if multiple:
-                pandas.read_json(self.project['connectivityMetrics']['boundary'][k],
-                                 orient='split').to_csv(str.replace(BD_filepath,
-                                                                    ".dat",
-                                                                    "_" + k + ".dat"),
-                                                        index=False)
+                filepath = str.replace(BD_filepath, ".dat", "_" + k + ".dat")
+            else:
+                filepath = BD_filepath
+
+            boundary = self.project['connectivityMetrics']['boundary'][k]
+            if isinstance(boundary, dict) and in_memory:
+                jobs[filepath] = boundary_table(boundary, threshold=boundary_threshold(self.project),
+                                                method=self.project['options'].get('min_plan_graph_method', "Kruskal"))
+            elif isinstance(boundary, dict):
+                # boundaries are streamed straight from the sparse connectivity matrix
+                jobs[filepath] = functools.partial(export_boundary, filepath, boundary,
+                                                   threshold=boundary_threshold(self.project),
+                                                   method=self.project['options'].get('min_plan_graph_method',
+                                                                                      "Kruskal"))
             else:
-                pandas.read_json(self.project['connectivityMetrics']['boundary'][k],
-                                 orient='split').to_csv(BD_filepath, index=False)
+                table = pandas.read_json(boundary, orient='split')
+                jobs[filepath] = table[table['boundary'] > boundary_threshold(self.project)]
 
         # warn when multiple boundary definitions
-        if multiple:
+        if multiple and not in_memory:
             marxanconpy.warn_dialog(message="Multiple Boundary Definitions were selected. Boundary file names have been"
                                      " edited to include type.", caption="Warning!")
+        return jobs
+
+    def write_export_files(self, jobs):
+        """
+        Writes the exported Marxan input files in parallel, skipping those whose content did not change (see
+        write_marxan_files)
+        """
+        try:
+            start = time.time()
+            with profiler.span('export', files=len(jobs)) as args:
+                written = write_marxan_files(jobs)
+                args['written'] = sum(written.values())
+            for filepath in written:
+                if written[filepath]:
+                    print("Exported " + filepath)
+                else:
+                    print("Skipped " + filepath + " (unchanged)")
+            print("Export took " + str(round(time.time() - start, 2)) + " seconds")
+        except:
+            self.log.Show()
+            raise
 
     def lock_pudat(self, pudat_filepath):
-        if os.path.isfile(pudat_filepath):
-            self.temp = {}
-            self.temp['pudat'] = marxanconpy.read_csv_tsv(pudat_filepath)
-            if os.path.isfile(self.project['filepaths']['fa_filepath']):
-                if self.fa_status_radioBox.GetStringSelection() == "Locked out":
-                    self.temp['pudat'].loc[numpy.array(self.spatial['pu_shp']['fa_included']), 'status'] = 3
-                if self.fa_status_radioBox.GetStringSelection() == "Locked in":
-                    self.temp['pudat'].loc[numpy.array(self.spatial['pu_shp']['fa_included']), 'status'] = 2
-
-            if os.path.isfile(self.project['filepaths']['aa_filepath']):
-                if self.aa_status_radioBox.GetStringSelection() == "Locked out":
-                    self.temp['pudat'].loc[numpy.array(self.spatial['pu_shp']['aa_included']), 'status'] = 3
-                if self.aa_status_radioBox.GetStringSelection() == "Locked in":
-                    self.temp['pudat'].loc[numpy.array(self.spatial['pu_shp']['aa_included']), 'status'] = 2
-
-            self.temp['all_metrics'] = []
-            if 'connectivityMetrics' in self.project:
-                if 'spec_demo_pu' in self.project['connectivityMetrics']:
-                    self.temp['all_metrics'] += self.project['connectivityMetrics']['spec_demo_pu']
-                if 'spec_land_pu' in self.project['connectivityMetrics']:
-                    self.temp['all_metrics'] += self.project['connectivityMetrics']['spec_land_pu']
-
-            for self.temp['metric'] in self.temp['all_metrics']:
-                if 'demo_pu' in self.temp['metric']:
-                    self.temp['metric_values'] = self.project['connectivityMetrics']['spec_demo_pu'][self.temp['metric']]
-                if 'land_pu' in self.temp['metric']:
-                    self.temp['metric_values'] = self.project['connectivityMetrics']['spec_land_pu'][self.temp['metric']]
-
-                if self.temp['metric'].endswith('lockout'):
-                    self.temp['pudat'].loc[numpy.array(self.temp['metric_values']) != 0, 'status'] = 3
-                if self.temp['metric'].endswith('lockin'):
-                    self.temp['pudat'].loc[numpy.array(self.temp['metric_values']) != 0, 'status'] = 2
-
-                self.project['connectivityMetrics']['status'] = self.temp['pudat']['status'].tolist()
-                self.colormap_shapefile_choices()
-                self.colormap_metric_choices(1)
-                self.colormap_metric_choices(2)
+        """
+        Sets the status of the planning units (connectivityMetrics['status']) from the original pu.dat, then the focus
+        and avoidance areas and the discrete features which are locked in or out (see lock_status), and updates the
+        plotting choices once
+        """
+        if not os.path.isfile(pudat_filepath):
+            return
+        rules = []
+        for type, radioBox in [('fa', self.fa_status_radioBox), ('aa', self.aa_status_radioBox)]:
+            if os.path.isfile(self.project['filepaths'][type + '_filepath']) and \
+                    radioBox.GetStringSelection() in lock_status_values and \
+                    type + '_included' in self.spatial.get('pu_shp', {}):
+                rules.append((self.spatial['pu_shp'][type + '_included'].values,
+                              lock_status_values[radioBox.GetStringSelection()]))
+        if 'connectivityMetrics' not in self.project:
+            self.project['connectivityMetrics'] = {}
+        for type in ['spec_demo_pu', 'spec_land_pu']:
+            for metric, values in self.project['connectivityMetrics'].get(type, {}).items():
+                if metric.endswith('lockout'):
+                    rules.append((numpy.asarray(values) != 0, lock_status_values["Locked out"]))
+                if metric.endswith('lockin'):
+                    rules.append((numpy.asarray(values) != 0, lock_status_values["Locked in"]))
+
+        self.project['connectivityMetrics']['status'] = lock_status(read_pudat(pudat_filepath)['status'].values,
+                                                                    rules).tolist()
+        self.colormap_shapefile_choices()
+        self.colormap_metric_choices(1)
+        self.colormap_metric_choices(2)
 
 # ########################## pre-evaluation functions ##################################################################
     def on_preEval_metric_shp_choice(self,event):
@@ -1952,28 +2325,20 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                                                          selection=self.preEval_metric_shp_choice.GetStringSelection()))
         if not metric_type == None:
             if 'spec_' + type in self.project['connectivityMetrics']:
-                self.temp['metric'] = self.project['connectivityMetrics']['spec_' + type][metric_type]
-
-                self.preEval_grid.SetCellValue(0, 0, str(sum(self.temp['metric'])))
-                self.preEval_grid.SetCellValue(1, 0, str(numpy.mean(self.temp['metric'])))
-                self.preEval_grid.SetCellValue(2, 0, str(numpy.std(self.temp['metric'])))
-                self.preEval_grid.SetCellValue(3, 0, str(min(self.temp['metric'])))
-                self.preEval_grid.SetCellValue(4, 0, str(numpy.percentile(self.temp['metric'], 25)))
-                self.preEval_grid.SetCellValue(5, 0, str(numpy.percentile(self.temp['metric'], 50)))
-                self.preEval_grid.SetCellValue(6, 0, str(numpy.percentile(self.temp['metric'], 75)))
-                self.preEval_grid.SetCellValue(7, 0, str(max(self.temp['metric'])))
-                if 'aa_included' in self.spatial:
-                    self.preEval_grid.SetCellValue(8, 0, str((sum(
-                        self.spatial['pu_shp']['aa_included'].multiply(self.temp['metric'])) / sum(
-                        self.temp['metric']) * 100)))
-                else:
-                    self.preEval_grid.SetCellValue(8, 0, 'NA')
-                if 'fa_included' in self.spatial:
-                    self.preEval_grid.SetCellValue(9, 0, str((sum(
-                        self.spatial['pu_shp']['fa_included'].multiply(self.temp['metric'])) / sum(
-                        self.temp['metric']) * 100)))
-                else:
-                    self.preEval_grid.SetCellValue(9, 0, 'NA')
+                # the statistics are only computed again when the metric changes (see metric_statistics)
+                self.temp['metric'], self.temp['stats'] = metric_statistics(
+                    self.project['connectivityMetrics']['spec_' + type][metric_type], key=('spec_' + type, metric_type))
+
+                for row, statistic in enumerate(['sum', 'mean', 'std'] + list(metric_quantiles.values())):
+                    self.preEval_grid.SetCellValue(row, 0, str(self.temp['stats'][statistic]))
+                # share of the metric in the avoidance (row 8) and focus (row 9) areas
+                for row, included in [(8, 'aa_included'), (9, 'fa_included')]:
+                    if included in self.spatial.get('pu_shp', {}):
+                        self.preEval_grid.SetCellValue(row, 0, str(numpy.dot(
+                            numpy.asarray(self.spatial['pu_shp'][included], dtype='float'), self.temp['metric']) /
+                            self.temp['stats']['sum'] * 100))
+                    else:
+                        self.preEval_grid.SetCellValue(row, 0, 'NA')
 
     def on_plot_freq_metric( self, event ):
         self.temp = {}
@@ -1984,7 +2349,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
         # get the 'from' for discretization
         if 'spec_' + type in self.project['connectivityMetrics']:
-            self.temp['metric'] = numpy.array(self.project['connectivityMetrics']['spec_' + type][metric_type])
+            self.temp['metric'], self.temp['stats'] = metric_statistics(
+                self.project['connectivityMetrics']['spec_' + type][metric_type], key=('spec_' + type, metric_type))
 
         # prepare plotting window
         if not hasattr(self, 'plot'):
@@ -1996,7 +2362,7 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                     self.auinotebook.AddPage(self.plot, u"9) Plot", False, wx.NullBitmap)
         self.plot.figure = plt.figure(figsize=self.plot.GetClientSize() / wx.ScreenDC().GetPPI()[0])
         self.plot.axes = self.plot.figure.gca()
-        self.plot.canvas = FigureCanvas(self.plot, -1, self.plot.figure)
+        self.plot.canvas = backend_wxagg.FigureCanvasWxAgg(self.plot, -1, self.plot.figure)
         self.plot.sizer = wx.BoxSizer(wx.VERTICAL)
         self.plot.sizer.Add(self.plot.canvas, 1, wx.LEFT | wx.TOP | wx.GROW)
         self.plot.SetSizer(self.plot.sizer)
@@ -2010,12 +2376,14 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.plot.hist = plt.hist(self.temp['metric'],bins=b)
         self.plot.xlabel = plt.xlabel(metric_type)
         self.plot.ylabel = plt.ylabel("Frequency")
-        self.plot.axvline = plt.axvline(numpy.percentile(self.temp['metric'], 25), label='test',color='k',linestyle='--')
-        self.plot.text = plt.text(numpy.percentile(self.temp['metric'], 20),sum(self.plot.axes.get_ylim())/2,'Lower Quartile',rotation=90,verticalalignment='center')
-        self.plot.axvline = plt.axvline(numpy.percentile(self.temp['metric'], 50), label='test',color='k',linestyle='--')
-        self.plot.text = plt.text(numpy.percentile(self.temp['metric'], 45), sum(self.plot.axes.get_ylim()) / 2, 'Median', rotation=90,verticalalignment='center')
-        self.plot.axvline = plt.axvline(numpy.percentile(self.temp['metric'], 75), label='test',color='k',linestyle='--')
-        self.plot.text = plt.text(numpy.percentile(self.temp['metric'], 70), sum(self.plot.axes.get_ylim()) / 2, 'Upper Quartile', rotation=90,verticalalignment='center')
+        # the labels are just left of the quartiles
+        self.temp['labels'] = numpy.quantile(self.temp['metric'], [0.2, 0.45, 0.7])
+        self.plot.axvline = plt.axvline(self.temp['stats']['lower_quartile'], label='test',color='k',linestyle='--')
+        self.plot.text = plt.text(self.temp['labels'][0],sum(self.plot.axes.get_ylim())/2,'Lower Quartile',rotation=90,verticalalignment='center')
+        self.plot.axvline = plt.axvline(self.temp['stats']['median'], label='test',color='k',linestyle='--')
+        self.plot.text = plt.text(self.temp['labels'][1], sum(self.plot.axes.get_ylim()) / 2, 'Median', rotation=90,verticalalignment='center')
+        self.plot.axvline = plt.axvline(self.temp['stats']['upper_quartile'], label='test',color='k',linestyle='--')
+        self.plot.text = plt.text(self.temp['labels'][2], sum(self.plot.axes.get_ylim()) / 2, 'Upper Quartile', rotation=90,verticalalignment='center')
         # change selection to plot tab
         for i in range(self.auinotebook.GetPageCount()):
             if self.auinotebook.GetPageText(i) == "8) Plot" or self.auinotebook.GetPageText(i) == "9) Plot":
@@ -2028,8 +2396,10 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
                                                selection=self.preEval_metric_shp_choice.GetStringSelection()))
         if 'spec_' + type in self.project['connectivityMetrics']:
             del self.project['connectivityMetrics']['spec_' + type][metric_type]
+            clear_metric_statistics(('spec_' + type, metric_type))
             if len(self.project['connectivityMetrics']['spec_' + type])==0:
                 del self.project['connectivityMetrics']['spec_' + type]
+        self.project_build().mark_built(self.project, 'discrete features')
         self.colormap_shapefile_choices()
         self.colormap_metric_choices("pre-eval")
         self.on_preEval_metric_choice(event=None)
@@ -2045,24 +2415,12 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
         # get the 'from' for discretization
         if 'spec_' + type in self.project['connectivityMetrics']:
-            self.temp['metric'] = numpy.array(self.project['connectivityMetrics']['spec_' + type][metric_type])
+            self.temp['metric'], self.temp['stats'] = metric_statistics(
+                self.project['connectivityMetrics']['spec_' + type][metric_type], key=('spec_' + type, metric_type))
 
         if self.preEval_discrete_from_quartile.GetValue():
-            if self.preEval_discrete_from_quartile_radio.GetStringSelection()== "Minimum":
-                self.temp['from_type'] = 'minimum'
-                self.temp['from'] = min(self.temp['metric'])
-            if self.preEval_discrete_from_quartile_radio.GetStringSelection()== "Lower Quartile":
-                self.temp['from_type'] = 'lower_quartile'
-                self.temp['from'] = numpy.percentile(self.temp['metric'], 25)
-            if self.preEval_discrete_from_quartile_radio.GetStringSelection()== "Median":
-                self.temp['from_type'] = 'median'
-                self.temp['from'] = numpy.percentile(self.temp['metric'], 50)
-            if self.preEval_discrete_from_quartile_radio.GetStringSelection()== "Upper Quartile":
-                self.temp['from_type'] = 'upper_quartile'
-                self.temp['from'] = numpy.percentile(self.temp['metric'], 75)
-            if self.preEval_discrete_from_quartile_radio.GetStringSelection()== "Maximum":
-                self.temp['from_type'] = 'maximum'
-                self.temp['from'] = max(self.temp['metric'])
+            self.temp['from_type'] = metric_quantiles[self.preEval_discrete_from_quartile_radio.GetStringSelection()]
+            self.temp['from'] = self.temp['stats'][self.temp['from_type']]
 
         if self.preEval_discrete_from_percentile.GetValue():
             self.temp['from'] = numpy.percentile(self.temp['metric'],
@@ -2075,21 +2433,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
         # get the 'to' for discretization
         if self.preEval_discrete_to_quartile.GetValue():
-            if self.preEval_discrete_to_quartile_radio.GetStringSelection() == "Minimum":
-                self.temp['to_type'] = 'minimum'
-                self.temp['to'] = min(self.temp['metric'])
-            if self.preEval_discrete_to_quartile_radio.GetStringSelection() == "Lower Quartile":
-                self.temp['to_type'] = 'lower_quartile'
-                self.temp['to'] = numpy.percentile(self.temp['metric'], 25)
-            if self.preEval_discrete_to_quartile_radio.GetStringSelection() == "Median":
-                self.temp['to_type'] = 'median'
-                self.temp['to'] = numpy.percentile(self.temp['metric'], 50)
-            if self.preEval_discrete_to_quartile_radio.GetStringSelection() == "Upper Quartile":
-                self.temp['to_type'] = 'upper_quartile'
-                self.temp['to'] = numpy.percentile(self.temp['metric'], 75)
-            if self.preEval_discrete_to_quartile_radio.GetStringSelection() == "Maximum":
-                self.temp['to_type'] = 'maximum'
-                self.temp['to'] = max(self.temp['metric'])
+            self.temp['to_type'] = metric_quantiles[self.preEval_discrete_to_quartile_radio.GetStringSelection()]
+            self.temp['to'] = self.temp['stats'][self.temp['to_type']]
 
         if self.preEval_discrete_to_percentile.GetValue():
             self.temp['to'] = numpy.percentile(self.temp['metric'],
@@ -2116,6 +2461,8 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
             metric_type + '_discrete_' + self.temp['from_type'] + '_to_' + self.temp['to_type'] + '_lockin'] = self.temp[
             'new_metric'].tolist()
 
+        self.project_build().mark_built(self.project, 'discrete features')
+
         # reset choices
         self.lock_pudat(self.project['filepaths']['orig_pudat_filepath'])
         self.colormap_shapefile_choices()
@@ -2221,75 +2568,56 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         :param event:
         :return:
         """
+        inputdat, inputdir = self.get_inputdat()
+        inputdat.write(self.project['filepaths']['marxan_input'])
+
+        marxanconpy.warn_dialog("The Marxan input file (i.e. input.dat) has been generated successfully.",
+                                "Operation Successful")
+
+    def get_inputdat(self):
+        """
+        Fills in the Marxan input file template with the project options. Returns the Marxan input file (see
+        MarxanInput) and the input directory (INPUTDIR) its files are relative to
+        """
         if self.project['filepaths']['marxan_template_input'] == 'Default':
-            with open(os.path.join(MCPATH, 'Marxan243','input_template.dat'), 'r', encoding="utf8") as file:
-                filedata = file.readlines()
+            template = os.path.join(MCPATH, 'Marxan243', 'input_template.dat')
         else:
-            with open(self.project['filepaths']['marxan_template_input'], 'r', encoding="utf8") as file:
-                filedata = file.readlines()
+            template = self.project['filepaths']['marxan_template_input']
+        inputdat = read_marxan_input(template).copy()
+        inputdat.filepath = self.project['filepaths']['marxan_input']
 
         if self.project['options']['inputdat_boundary'] == 'Asymmetric':
-            if not 'ASYMMETRICCONNECTIVITY  1\n' in filedata:
-                filedata.insert([index for index, line in enumerate(filedata) if line.startswith('NUMREPS')][0] + 1,
-                            'ASYMMETRICCONNECTIVITY  1\n')
+            inputdat.set('ASYMMETRICCONNECTIVITY', 1, after='NUMREPS')
         else:
-            if 'ASYMMETRICCONNECTIVITY  1\n' in filedata:
-                filedata.remove('ASYMMETRICCONNECTIVITY  1\n')
+            inputdat.remove('ASYMMETRICCONNECTIVITY')
 
         # Replace the target string
-        pudat = []
-        for index, line in enumerate(filedata):
-            if line.startswith("INPUTDIR"):
-                inputdir = os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']),
-                                        line.replace('INPUTDIR ', '').replace('\n', ''))
-
-            if line.startswith("NUMREPS"):
-                line = 'NUMREPS ' + self.project['options']['NUMREPS'] + '\n'
-
-
-            if line.startswith("SCENNAME"):
-                line = 'SCENNAME ' + self.project['options']['SCENNAME'] + '\n'
-
-            if line.startswith("NUMITNS"):
-                line = 'NUMITNS ' + self.project['options']['NUMITNS'] + '\n'
-
-            if line.startswith("BLM"):
-                line = 'BLM ' + self.project['options']['CSM'] + '\n'
-
-            if line.startswith("PUVSPRNAME"):
-                if self.project['options']['marxan_CF'] == 'New':
-                    line = 'PUVSPRNAME ' + os.path.relpath(self.project['filepaths']['cf_filepath'],inputdir) + '\n'
-                else:
-                    line = 'PUVSPRNAME ' + os.path.relpath(self.project['filepaths']['orig_cf_filepath'],inputdir) + '\n'
-
-            if line.startswith("SPECNAME"):
-                if self.project['options']['marxan_CF'] == 'New':
-                    line = 'SPECNAME ' + os.path.relpath(self.project['filepaths']['spec_filepath'],inputdir) + '\n'
-                else:
-                    line = 'SPECNAME ' + os.path.relpath(self.project['filepaths']['orig_spec_filepath'],inputdir) + '\n'
-
-            if line.startswith("PUNAME"):
-                if self.project['options']['marxan_PU'] == 'New':
-                    line = 'PUNAME ' + os.path.relpath(self.project['filepaths']['pudat_filepath'],inputdir) + '\n'
-                else:
-                    line = 'PUNAME ' + os.path.relpath(self.project['filepaths']['orig_pudat_filepath'],inputdir) + '\n'
-
-            if line.startswith("BOUNDNAME"):
-                if self.project['options']['marxan_bound'] == 'New':
-                    line = 'BOUNDNAME ' + os.path.relpath(self.project['filepaths']['bd_filepath'],inputdir) + '\n'
-                elif self.project['options']['marxan_bound'] == 'Original':
-                    line = 'BOUNDNAME ' + os.path.relpath(self.project['filepaths']['orig_bd_filepath'],inputdir) + '\n'
-                else:
-                    line = '\n'
-
+        inputdir = os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']), inputdat.raw('INPUTDIR', ''))
+        inputdat.set('NUMREPS', self.project['options']['NUMREPS'])
+        inputdat.set('SCENNAME', self.project['options']['SCENNAME'])
+        inputdat.set('NUMITNS', self.project['options']['NUMITNS'])
+        inputdat.set('BLM', self.project['options']['CSM'])
+
+        if self.project['options']['marxan_CF'] == 'New':
+            inputdat.set('PUVSPRNAME', os.path.relpath(self.project['filepaths']['cf_filepath'], inputdir))
+            inputdat.set('SPECNAME', os.path.relpath(self.project['filepaths']['spec_filepath'], inputdir))
+        else:
+            inputdat.set('PUVSPRNAME', os.path.relpath(self.project['filepaths']['orig_cf_filepath'], inputdir))
+            inputdat.set('SPECNAME', os.path.relpath(self.project['filepaths']['orig_spec_filepath'], inputdir))
 
-            pudat.append(line)
+        if self.project['options']['marxan_PU'] == 'New':
+            inputdat.set('PUNAME', os.path.relpath(self.project['filepaths']['pudat_filepath'], inputdir))
+        else:
+            inputdat.set('PUNAME', os.path.relpath(self.project['filepaths']['orig_pudat_filepath'], inputdir))
 
-        with open(self.project['filepaths']['marxan_input'], 'w', encoding="utf8") as file:
-            file.writelines(pudat)
+        if self.project['options']['marxan_bound'] == 'New':
+            inputdat.set('BOUNDNAME', os.path.relpath(self.project['filepaths']['bd_filepath'], inputdir))
+        elif self.project['options']['marxan_bound'] == 'Original':
+            inputdat.set('BOUNDNAME', os.path.relpath(self.project['filepaths']['orig_bd_filepath'], inputdir))
+        else:
+            inputdat.remove('BOUNDNAME')
 
-        marxanconpy.warn_dialog("The Marxan input file (i.e. input.dat) has been generated successfully.",
-                                "Operation Successful")
+        return inputdat, inputdir
 
     def on_default_input_template(self, event):
         self.project['filepaths']['marxan_template_input'] = 'Default'
@@ -2312,120 +2640,146 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
 
     def on_run_marxan(self, event):
         """
-        Starts Marxan
+        Starts Marxan (or the Python annealer) in the background and shows its progress
         """
-        if self.project['options']['marxan'] == "Marxan":
-            if not os.path.isfile(os.path.join(MCPATH, 'Marxan243',"Marxan.exe")) or\
-                    not os.path.isfile(os.path.join(MCPATH, 'Marxan243',"Marxan_x64.exe")):
-                marxanconpy.warn_dialog(message="Marxan executables (Marxan.exe or Marxan_x64.exe) not found in Marxan Directory")
-        else:
-            if not os.path.isfile(os.path.join(MCPATH, 'Marxan243', "MarZone.exe")) or \
-                    not os.path.isfile(os.path.join(MCPATH, 'Marxan243', "MarZone_x64.exe")):
-                marxanconpy.warn_dialog(message="Marxan executables (MarZone.exe or MarZone_x64.exe) not found in Marxan Directory")
+        python_annealer = self.project['options'].get('solver', 'Marxan') == 'Python'
+        if not python_annealer:
+            marxan_exec = self.check_marxan_executable()
+            if marxan_exec is None:
+                return
 
         if not 'connectivityMetrics' in self.project:
             self.project['connectivityMetrics'] = {}
         self.temp = {}
 
-        # edit input file
-        # Read in the file
-        with open(self.project['filepaths']['marxan_input'], 'r', encoding="utf8") as file:
-            filedata = file.readlines()
-
-        for index, line in enumerate(filedata):
-            if line.startswith("INPUTDIR"):
-                inputdir = line.replace("INPUTDIR ", "").strip('\n')
-                inputdatdir = os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']), inputdir)
-                if not os.path.isdir(inputdir) and not os.path.isdir(inputdatdir):
-                    marxanconpy.warn_dialog(message="Warning: Marxan Input File has an invalid input directory " + line)
-            if line.startswith("OUTPUTDIR"):
-                inputdir = line.replace("OUTPUTDIR ", "").strip('\n')
-                inputdatdir = os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']), inputdir)
-                if not os.path.isdir(inputdir) and not os.path.isdir(inputdatdir):
-                    marxanconpy.warn_dialog(message="Warning: Marxan Input File has an invalid input directory " + line)
+        # check the input file
+        try:
+            inputdat = read_marxan_input(self.project['filepaths']['marxan_input'])
+        except OSError:
+            marxanconpy.warn_dialog(message="Marxan Input File not found: " + self.project['filepaths']['marxan_input'])
+            return
+        for problem in inputdat.validate():
+            marxanconpy.warn_dialog(message="Warning: " + problem)
+        try:
+            numreps = inputdat.get('NUMREPS', 1)
+        except ValueError:
+            numreps = 1
 
         inputpath = os.path.dirname(self.project['filepaths']['marxan_input'])
-        marxanpath = MCPATH
         if os.path.dirname(self.project['filepaths']['marxan_input']).startswith("\\"):
             inputpath = inputpath.replace(inputpath[0:2], "C:\\")
-            marxanpath = marxanpath.replace(marxanpath[0:2], "C:\\")
-
 
+        if python_annealer:
+            self.marxan_runner = AnnealerRunner(self, inputdat, tables=self.annealer_tables())
+        else:
+            self.marxan_runner = MarxanRunner(self, marxan_exec,
+                                              os.path.relpath(self.project['filepaths']['marxan_input'], inputpath),
+                                              cwd=inputpath, numreps=numreps)
+        self.marxan_progress_note = marxan_buffered_note if marxan_output_buffered and not python_annealer else ""
+        self.marxan_progress = wx.ProgressDialog("Running Marxan", "Starting Marxan..." + " " * 40 + "\n" +
+                                                 self.marxan_progress_note, maximum=1000,
+                                                 parent=self,
+                                                 style=wx.PD_CAN_ABORT | wx.PD_APP_MODAL | wx.PD_ELAPSED_TIME)
+        self.marxan_runner.start()
+
+    def check_marxan_executable(self):
+        """
+        Returns the path of the Marxan executable for the project options, or None (after warning the user) if it
+        isn't available
+        """
+        try:
+            marxan_exec = get_marxan_executable(self.project['options']['marxan'], self.project['options']['marxan_bit'])
+        except Exception as e:
+            marxanconpy.warn_dialog(message=str(e))
+            return None
+        if not os.path.isfile(marxan_exec):
+            marxanconpy.warn_dialog(message="Marxan executable (" + os.path.basename(marxan_exec) +
+                                            ") not found in Marxan Directory")
+            return None
+        if not platform.system() == 'Windows' and not os.access(marxan_exec, os.X_OK):
+            try:
+                os.chmod(marxan_exec, os.stat(marxan_exec).st_mode | 0o111)
+            except OSError:
+                print("Warning: " + marxan_exec + " is not executable")
+        return marxan_exec
 
-        if platform.system() == 'Windows':
-            marxanconpy.warn_dialog(
-                "Please note: Marxan Connect will be unresponsive until the Marxan pop-up window has finished and has been closed.")
-            if self.project['options']['marxan'] == "Marxan":
-                if self.project['options']['marxan_bit']=="64-bit":
-                    marxan_exec = 'Marxan_x64.exe'
-                else:
-                    marxan_exec = 'Marxan.exe'
-            else:
-                if self.project['options']['marxan_bit']=="64-bit":
-                    marxan_exec = 'MarZone_x64.exe'
-                else:
-                    marxan_exec = 'MarZone.exe'
+    def on_marxan_progress(self, event):
+        """
+        Shows Marxan's progress, and stops it if 'Cancel' was pressed
+        """
+        if not hasattr(self, 'marxan_progress'):
+            return
+        message = "Run " + str(max(event.run, 1)) + " of " + str(event.runs)
+        if event.iteration > 0:
+            message = message + ", iteration " + str(event.iteration)
+        if event.score is not None:
+            message = message + ", score " + str(round(event.score, 2))
+        if event.eta is not None:
+            message = message + "\nAbout " + time.strftime('%H:%M:%S', time.gmtime(event.eta)) + " remaining"
+        message = message + self.marxan_progress_note
+        if not self.marxan_progress.Update(min(999, int(event.fraction * 1000)), message)[0]:
+            self.marxan_runner.cancel()
+
+    def on_marxan_done(self, event):
+        """
+        Loads Marxan's results once it has finished
+        """
+        if hasattr(self, 'marxan_progress'):
+            self.marxan_progress.Destroy()
+            del self.marxan_progress
 
-            if " " in self.project['filepaths']['marxan_input']:
-                marxanconpy.warn_dialog("Marxan will likely fail to find the input file because the filepath contains "
-                                        "spaces. Please move your project folder or rename the offending directory")
+        if event.cancelled:
+            marxanconpy.warn_dialog(message="Marxan was cancelled.")
+            return
+        print("Marxan finished in " + str(round(event.seconds, 1)) + " seconds with exit code " + str(event.returncode))
+        if not event.returncode == 0:
+            self.log.Show()
+            marxanconpy.warn_dialog(message="Marxan did not finish successfully, see the debugging console.")
+            return
+        try:
+            self.load_marxan_results(getattr(event, 'results', None))
+            self.project_build().mark_built(self.project, 'marxan')
+        except:
+            self.log.Show()
+            raise
 
-            subprocess.call(os.path.join(marxanpath, 'Marxan243', marxan_exec) + ' ' +
-                            self.project['filepaths']['marxan_input'],
-                            creationflags=subprocess.CREATE_NEW_CONSOLE,
-                            cwd=inputpath)
+    def load_marxan_results(self, results=None):
+        """
+        Loads the selection frequency and the best solution from Marxan's output, or from 'results' (the Python
+        annealer's 'select_freq' and 'best_solution')
+        """
+        if not 'connectivityMetrics' in self.project:
+            self.project['connectivityMetrics'] = {}
+        self.temp = {}
 
-        elif platform.system() == 'Darwin':
-            self.log.Show()
-            marxanconpy.warn_dialog(
-                "Please note: Marxan Connect will be unresponsive until the Marxan pop-up window has finished. On macOS,"
-                "Marxan Connect does not provide 'live' updates on Marxan's progress. See the 'macOS Marxan feedback' "
-                "issue on our github page")
-            if self.project['options']['marxan'] == "Marxan":
-                if self.project['options']['marxan_bit']=="64-bit":
-                    marxan_exec = 'MarOpt_v243_Mac64'
+        if results is not None:
+            self.project['connectivityMetrics']['select_freq'] = results['select_freq']
+            self.project['connectivityMetrics']['best_solution'] = results['best_solution']
+        else:
+            # the output files have the extensions set by their SAVE parameters
+            inputdat = read_marxan_input(self.project['filepaths']['marxan_input'])
+            if inputdat.output_extension('SAVERUN') is None or inputdat.output_extension('SAVEBEST') is None:
+                marxanconpy.warn_dialog(message="Marxan's input file doesn't save the solutions of the replicates "
+                                                "(SAVERUN) or the best solution (SAVEBEST), so the results can't be "
+                                                "loaded.")
+                return
+
+            # calculate selection frequency
+            for self.temp['file'] in range(inputdat.get('NUMREPS', 1)):
+                self.temp['fn'] = inputdat.output_file("_r" + "%05d" % (self.temp['file'] + 1) +
+                                                       inputdat.output_extension('SAVERUN'))
+                if self.temp['file'] == 0:
+                    self.temp['select_freq'] = marxanconpy.read_csv_tsv(self.temp['fn'])
                 else:
-                    marxan_exec = 'MarOpt_v243_Mac32'
-            else:
-                marxanconpy.warn_dialog('Sorry, this experimental feature is only available for Windows at the monment')
+                    self.temp['select_freq'].iloc[:,1] = self.temp['select_freq'].iloc[:,1] + \
+                                                           marxanconpy.read_csv_tsv(self.temp['fn']).iloc[:,1]
 
-            if " " in self.project['filepaths']['marxan_input']:
-                marxanconpy.warn_dialog("Marxan will likely fail to find the input file because the filepath contains "
-                                        "spaces. Please move your project folder or rename the offending directory")
-                
-            proc = pexpect.spawnu(os.path.join(marxanpath, 'Marxan243', marxan_exec)+' '+os.path.relpath(self.project['filepaths']['marxan_input'],inputpath),cwd=inputpath)
-            proc.logfile = sys.stdout
-            proc.expect('.*Press return to exit.*')
-            proc.close()
-
-
-        # calculate selection frequency
-        for line in open(self.project['filepaths']['marxan_input']):
-            if line.startswith('SCENNAME'):
-                self.temp['SCENNAME'] = line.replace('SCENNAME ', '').replace('\n', '')
-            elif line.startswith('NUMREPS'):
-                self.temp['NUMREPS'] = int(line.replace('NUMREPS ', '').replace('\n', ''))
-            elif line.startswith('OUTPUTDIR'):
-                self.temp['OUTPUTDIR'] = line.replace('OUTPUTDIR ', '').replace('\n', '')
-
-        if not os.path.isdir(self.temp['OUTPUTDIR']):
-            self.temp['OUTPUTDIR'] = os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']),
-                                                  self.temp['OUTPUTDIR'])
-
-        for self.temp['file'] in range(self.temp['NUMREPS']):
-            self.temp['fn'] = os.path.join(self.temp['OUTPUTDIR'],
-                                           self.temp['SCENNAME'] + "_r" + "%05d" % (self.temp['file'] + 1) + ".txt")
-            if self.temp['file'] == 0:
-                self.temp['select_freq'] = marxanconpy.read_csv_tsv(self.temp['fn'])
-            else:
-                self.temp['select_freq'].iloc[:,1] = self.temp['select_freq'].iloc[:,1] + \
-                                                       marxanconpy.read_csv_tsv(self.temp['fn']).iloc[:,1]
+            self.project['connectivityMetrics']['select_freq'] = self.temp['select_freq'].iloc[:,1].tolist()
 
-        self.project['connectivityMetrics']['select_freq'] = self.temp['select_freq'].iloc[:,1].tolist()
-
-        # load best solution
-        self.temp['fn'] = os.path.join(self.temp['OUTPUTDIR'], self.temp['SCENNAME'] + "_best.txt")
-        self.project['connectivityMetrics']['best_solution'] = marxanconpy.read_csv_tsv(self.temp['fn']).iloc[:,1].tolist()
+            # load best solution
+            self.temp['fn'] = inputdat.output_file("_best" + inputdat.output_extension('SAVEBEST'))
+            self.project['connectivityMetrics']['best_solution'] = \
+                marxanconpy.read_csv_tsv(self.temp['fn']).iloc[:,1].tolist()
 
         # update plotting options
         self.colormap_shapefile_choices()
@@ -2434,34 +2788,164 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.enable_postHoc()
 
     def on_view_mvbest(self,event):
-        self.temp = {}
-        for line in open(self.project['filepaths']['marxan_input']):
-            if line.startswith('SCENNAME'):
-                self.temp['SCENNAME'] = line.replace('SCENNAME ', '').replace('\n', '')
-            elif line.startswith('OUTPUTDIR'):
-                self.temp['OUTPUTDIR'] = line.replace('OUTPUTDIR ', '').replace('\n', '')
-        mvbest = os.path.join(self.temp['OUTPUTDIR'],self.temp['SCENNAME']+'_mvbest.txt')
-        if os.path.isfile(mvbest):
-            file_viewer(parent=self, file=mvbest,title='mvbest')
-        else:
-            file_viewer(parent=self,
-                        file=os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']),mvbest),
-                        title='mvbest')
+        self.view_marxan_output('_mvbest', 'SAVETARGMET', 'mvbest')
 
     def on_view_sum(self,event):
-        self.temp = {}
-        for line in open(self.project['filepaths']['marxan_input']):
-            if line.startswith('SCENNAME'):
-                self.temp['SCENNAME'] = line.replace('SCENNAME ', '').replace('\n', '')
-            elif line.startswith('OUTPUTDIR'):
-                self.temp['OUTPUTDIR'] = line.replace('OUTPUTDIR ', '').replace('\n', '')
-        sumtxt = os.path.join(self.temp['OUTPUTDIR'], self.temp['SCENNAME'] + '_sum.txt')
-        if os.path.isfile(sumtxt):
-            file_viewer(parent=self, file=sumtxt, title='sum')
+        self.view_marxan_output('_sum', 'SAVESUMMARY', 'sum')
+
+    def view_marxan_output(self, suffix, save, title):
+        """
+        Shows a Marxan output file, with the extension set by its SAVE parameter (e.g. SAVESUMMARY for '_sum')
+        """
+        inputdat = read_marxan_input(self.project['filepaths']['marxan_input'])
+        if inputdat.output_extension(save) is None:
+            marxanconpy.warn_dialog(message="Marxan's input file doesn't save this file (" + save + ").")
+            return
+        file_viewer(parent=self, file=inputdat.output_file(suffix + inputdat.output_extension(save)), title=title)
+
+    def on_marxan_sweep(self, event):
+        """
+        Runs Marxan once for every combination of the BLM, NUMITNS and target values given, each in its own directory,
+        and summarizes the results in a table (e.g. for a cost versus boundary trade-off curve)
+        """
+        marxan_exec = self.check_marxan_executable()
+        if marxan_exec is None:
+            return
+
+        dlg = SweepDialog(self, self.project['options'],
+                          os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']), 'sweep'))
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        values = dlg.get_values()
+        dlg.Destroy()
+
+        try:
+            jobs = sweep_jobs(blms=parse_sweep_values(values['sweep_BLM']),
+                              numitns=parse_sweep_values(values['sweep_NUMITNS']),
+                              targets=parse_sweep_values(values['sweep_targets']))
+        except ValueError:
+            marxanconpy.warn_dialog(message="The sweep values must be numbers separated by commas (e.g. 0,0.5,1) or "
+                                            "a range given as start:stop:number of values (e.g. 0:1:5).")
+            return
+        self.project['options'].update(values)
+        sweepdir = values['sweep_dir']
+
+        if self.project['options']['marxan_CF'] == 'New':
+            spec_filepath = self.project['filepaths']['spec_filepath']
         else:
-            file_viewer(parent=self,
-                        file=os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']), sumtxt),
-                        title='sum')
+            spec_filepath = self.project['filepaths']['orig_spec_filepath']
+
+        try:
+            inputdat, inputdir = self.get_inputdat()
+            for job in jobs:
+                write_sweep_job(job, inputdat, inputdir, sweepdir, spec_filepath)
+        except:
+            self.log.Show()
+            raise
+
+        print("Parameter sweep: " + str(len(jobs)) + " Marxan jobs in " + sweepdir)
+        self.marxan_sweep = MarxanSweep(self, marxan_exec, jobs, sweepdir, self.project['options']['SCENNAME'],
+                                        processes=int(values['sweep_processes']))
+        self.sweep_progress = wx.ProgressDialog("Parameter Sweep", "Running " + str(len(jobs)) + " Marxan jobs..." +
+                                                " " * 40, maximum=len(jobs), parent=self,
+                                                style=wx.PD_CAN_ABORT | wx.PD_APP_MODAL | wx.PD_ELAPSED_TIME)
+        self.marxan_sweep.start()
+
+    def on_blm_calibration(self, event):
+        """
+        Searches for the BLM at the knee of the cost versus boundary trade-off curve, running only as many Marxan jobs
+        as the search needs (see BLMCalibration)
+        """
+        marxan_exec = self.check_marxan_executable()
+        if marxan_exec is None:
+            return
+
+        value = wx.GetTextFromUser("Range of BLM values to search (minimum:maximum, both above 0)",
+                                   "Marxan BLM Calibration",
+                                   default_value=self.project['options'].get('calibration_BLM', "0.001:100"),
+                                   parent=self)
+        if value == "":
+            return
+        try:
+            blm_min, blm_max = [float(v) for v in value.split(":")]
+        except ValueError:
+            blm_min, blm_max = 0, 0
+        if not 0 < blm_min < blm_max:
+            marxanconpy.warn_dialog(message="The BLM range must be given as minimum:maximum, with 0 < minimum < "
+                                            "maximum (e.g. 0.001:100).")
+            return
+        max_jobs = wx.GetNumberFromUser("The search stops once this many Marxan jobs have been run.",
+                                        "Maximum Marxan jobs", "Marxan BLM Calibration",
+                                        int(self.project['options'].get('calibration_jobs', 10)), 4, 100, self)
+        if max_jobs == -1:
+            return
+        self.project['options']['calibration_BLM'] = value
+        self.project['options']['calibration_jobs'] = max_jobs
+        sweepdir = os.path.join(self.project['options'].get('sweep_dir', os.path.join(
+            os.path.dirname(self.project['filepaths']['marxan_input']), 'sweep')), 'calibration')
+
+        try:
+            inputdat, inputdir = self.get_inputdat()
+        except:
+            self.log.Show()
+            raise
+
+        self.marxan_sweep = BLMCalibration(self, marxan_exec, inputdat, inputdir, sweepdir,
+                                           self.project['options']['SCENNAME'], blm_min, blm_max, max_jobs=max_jobs,
+                                           processes=int(self.project['options'].get('sweep_processes', 0)))
+        self.sweep_progress = wx.ProgressDialog("BLM Calibration", "Running Marxan..." + " " * 40, maximum=max_jobs,
+                                                parent=self,
+                                                style=wx.PD_CAN_ABORT | wx.PD_APP_MODAL | wx.PD_ELAPSED_TIME)
+        self.marxan_sweep.start()
+
+    def on_sweep_progress(self, event):
+        """
+        Shows the progress of the parameter sweep (or BLM calibration), and stops it if 'Cancel' was pressed
+        """
+        if not hasattr(self, 'sweep_progress'):
+            return
+        message = str(event.done) + " of " + str(event.jobs) + " Marxan jobs finished"
+        if event.eta is not None:
+            message = message + "\nAbout " + time.strftime('%H:%M:%S', time.gmtime(event.eta)) + " remaining"
+        if not self.sweep_progress.Update(min(event.jobs - 1, event.done), message)[0]:
+            self.marxan_sweep.cancel()
+
+    def on_sweep_done(self, event):
+        """
+        Saves and shows the summary of the parameter sweep (or BLM calibration)
+        """
+        if hasattr(self, 'sweep_progress'):
+            self.sweep_progress.Destroy()
+            del self.sweep_progress
+
+        title = self.marxan_sweep.title
+        if event.cancelled:
+            marxanconpy.warn_dialog(message="The " + title + " was cancelled.")
+            return
+        if event.summary is None:
+            self.log.Show()
+            marxanconpy.warn_dialog(message="The " + title + " could not be summarized, see the debugging console.")
+            return
+        print(title + " finished in " + str(round(event.seconds, 1)) + " seconds")
+        failed = event.summary[~(event.summary['Exit Code'] == 0)]
+        if len(failed) > 0:
+            marxanconpy.warn_dialog(message=str(len(failed)) + " Marxan jobs did not finish successfully (" +
+                                            ", ".join(failed['Job']) + "), see marxan.log in their directories.")
+
+        filepath = os.path.join(self.marxan_sweep.sweepdir,
+                                self.project['options']['SCENNAME'] + '_' + self.marxan_sweep.name + '.csv')
+        event.summary.to_csv(filepath, index=False)
+        file_viewer(parent=self, file=filepath, title=title + ' - ' + str(len(event.summary)) + ' Marxan jobs')
+
+        if event.knee is not None:
+            dlg = wx.MessageDialog(self, "The knee of the cost versus boundary trade-off curve is at BLM " +
+                                   str(round(event.knee, 6)) + ". Use it as the Connectivity Strength Modifier?",
+                                   title, wx.YES_NO | wx.ICON_QUESTION)
+            if dlg.ShowModal() == wx.ID_YES:
+                self.project['options']['CSM'] = str(round(event.knee, 6))
+                self.CSM.SetValue(self.project['options']['CSM'])
+            dlg.Destroy()
 
 # ########################## postHoc functions ##########################################################################
 
@@ -2492,67 +2976,70 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.postHoc_category_choice.SetSelection(0)
         self.set_postHoc_output_choice()
 
+    def format_postHoc_cell(self, value, position, col):
+        if isinstance(value, str) or value is None:
+            return str(value)
+        if self.postHoc_table.row_labels[position] in postHoc_spatial_metrics and \
+                self.postHoc_table.data.columns[col] in ("Planning Area", "Percent"):
+            return ""
+        if self.postHoc_table.row_labels[position] in ("Planning Units", "Connections") and \
+                not self.postHoc_table.data.columns[col] == "Percent":
+            return str(int(value))
+        return str(round(value, 2))
+
+    def clear_postHoc_grid(self):
+        self.postHoc_table = DataFrameTable(pandas.DataFrame())
+        self.postHoc_grid.SetTable(self.postHoc_table, False)
+        self.postHoc_grid.ForceRefresh()
+
+    def on_postHoc_grid_label(self, event):
+        """
+        Sorts the post-hoc table by the clicked column
+        """
+        if event.GetRow() == -1 and event.GetCol() >= 0 and hasattr(self, 'postHoc_table'):
+            self.postHoc_table.sort(event.GetCol())
+            self.postHoc_table.refresh(self.postHoc_grid, self.postHoc_table.GetNumberRows())
+        else:
+            event.Skip()
+
     def on_postHoc_category_choice(self, event):
-        Cols = self.postHoc_grid.GetNumberCols()
-        Rows = self.postHoc_grid.GetNumberRows()
-        if Cols > 0 or Rows > 0:
-            self.postHoc_grid.DeleteCols(0, Cols, True)
-            self.postHoc_grid.DeleteRows(0, Rows, True)
+        self.clear_postHoc_grid()
 
     def on_postHoc_output_choice(self, event):
-        Cols = self.postHoc_grid.GetNumberCols()
-        Rows = self.postHoc_grid.GetNumberRows()
-        if Cols > 0 or Rows > 0:
-            self.postHoc_grid.DeleteCols(0, Cols, True)
-            self.postHoc_grid.DeleteRows(0, Rows, True)
+        self.clear_postHoc_grid()
 
-    def on_calc_postHoc(self, event):
+    def get_postHoc_conmat(self):
+        """
+        Returns the format and file path of the connectivity data selected for post-hoc evaluation
+        """
         if self.postHoc_category_choice.GetStringSelection() == "Landscape Data":
-            format = "Edge List with Habitat"
-            filename = self.project['filepaths']['land_pu_cm_filepath']
+            return "Edge List with Habitat", self.project['filepaths']['land_pu_cm_filepath']
         elif self.postHoc_category_choice.GetStringSelection() == "Demographic Data":
-            format = self.demo_matrixFormatRadioBox.GetStringSelection()
-            filename = self.project['filepaths']['demo_pu_cm_filepath']
+            return self.demo_matrixFormatRadioBox.GetStringSelection(), self.project['filepaths']['demo_pu_cm_filepath']
         else:
-            format = None
-            filename = "notarealfilename"
+            return None, "notarealfilename"
+
+    def get_postHoc_pu(self, project):
+        """
+        Returns the planning units (in longitude/latitude) for the size and spacing post-hoc metrics
+        """
+        return gpd.GeoDataFrame.from_file(project['filepaths']['pu_filepath']).to_crs(
+            '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
+
+    def on_calc_postHoc(self, event):
+        format, filename = self.get_postHoc_conmat()
 
         solution = marxanconpy.manipulation.get_marxan_output(self.project['filepaths']['marxan_input'],
                                                               self.postHoc_output_choice.GetStringSelection())
-        
-        pu = gpd.GeoDataFrame.from_file(self.project['filepaths']['pu_filepath']).to_crs('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
-        postHoc = marxanconpy.posthoc.calc_postHoc(pu,
-                                                   filename,
-                                                   format,
-                                                   IDs=solution.iloc[:,0].values,
-                                                   selectionIDs=solution[(solution.iloc[:,1].astype("str")=="1").values].iloc[:,0].values)
-        Cols = self.postHoc_grid.GetNumberCols()
-        Rows = self.postHoc_grid.GetNumberRows()
-        if Cols > 0 or Rows > 0:
-            self.postHoc_grid.DeleteCols(0, Cols, True)
-            self.postHoc_grid.DeleteRows(0, Rows, True)
-        for col, label in enumerate(postHoc.columns):
-            if not col == 0:
-                self.postHoc_grid.AppendCols()
-                self.postHoc_grid.SetColLabelValue(col-1, label)
-            for index in postHoc.index:
-                if col == 0:
-                    self.postHoc_grid.AppendRows()
-                    self.postHoc_grid.SetRowLabelValue(index, str(postHoc.iloc[index, col]))
-                elif label == "Type":
-                    self.postHoc_grid.SetCellValue(index, col - 1, str(postHoc.iloc[index, col]))
-                elif label == "Percent":
-                    if index > 0 and index < 6:
-                        self.postHoc_grid.SetCellValue(index, col-1, "")
-                    else:
-                        self.postHoc_grid.SetCellValue(index, col - 1, str(round(postHoc.iloc[index, col], 2)))
-                elif label == "Planning Area" and index > 0 and index < 6:
-                            self.postHoc_grid.SetCellValue(index, col-1, "")
-                else:
-                    if postHoc["Metric"][index] in ("Planning Units","Connections"):
-                        self.postHoc_grid.SetCellValue(index, col-1, str(int(postHoc.iloc[index, col])))
-                    else:
-                        self.postHoc_grid.SetCellValue(index, col-1, str(round(postHoc.iloc[index, col], 2)))
+
+        postHoc = calc_postHoc_sparse(filename,
+                                      format,
+                                      IDs=solution.iloc[:, 0].values,
+                                      selectionIDs=solution[(solution.iloc[:, 1].astype("str") == "1").values].iloc[:, 0].values,
+                                      pu=self.get_postHoc_pu(self.project))
+        self.postHoc_table = DataFrameTable(postHoc.iloc[:, 1:], row_labels=postHoc['Metric'].values,
+                                            formatter=self.format_postHoc_cell)
+        self.postHoc_grid.SetTable(self.postHoc_table, False)
 
         self.postHoc_grid.SetRowLabelSize(145)
         self.postHoc_grid.SetColLabelAlignment(wx.ALIGN_CENTRE, wx.ALIGN_CENTRE)
@@ -2565,38 +3052,442 @@ class MarxanConnectGUI(gui.MarxanConnectGUI):
         self.project["postHoc"] = postHoc.to_json(orient='split')
         self.enable_postHoc()
 
+    def on_batch_postHoc(self, event):
+        """
+        Evaluates post-hoc connectivity for the best solution and every replicate at once, and saves a tidy table
+        and the distribution of each metric across the solutions
+        """
+        choices = [c for c in self.postHoc_output_choice.GetItems() if not c == 'No Output Available']
+        format, filename = self.get_postHoc_conmat()
+        if len(choices) == 0 or not os.path.isfile(filename):
+            marxanconpy.warn_dialog(message="Post-hoc evaluation requires Marxan output and planning unit "
+                                            "connectivity data.")
+            return
+
+        dlg = wx.FileDialog(self, "Save the post-hoc evaluation of all solutions", defaultFile="postHoc_solutions.csv",
+                            wildcard=wc_csv, style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        filepath = dlg.GetPath()
+        dlg.Destroy()
+
+        # the solutions are evaluated in a background thread, which posts EVT_POSTHOC_DONE when it is over
+        self.postHoc_progress = wx.ProgressDialog("Post-Hoc Evaluation", "Evaluating " + str(len(choices)) +
+                                                  " solutions..." + " " * 40, parent=self,
+                                                  style=wx.PD_APP_MODAL | wx.PD_ELAPSED_TIME)
+        self.postHoc_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_postHoc_timer, self.postHoc_timer)
+        self.postHoc_timer.Start(250)
+        threading.Thread(target=self.batch_postHoc_thread, args=(format, filename, filepath, choices),
+                         daemon=True).start()
+
+    def batch_postHoc_thread(self, format, filename, filepath, choices):
+        """
+        Evaluates the solutions 'choices' in the background and saves the tables (see on_batch_postHoc)
+        """
+        error = None
+        try:
+            IDs, selections = self.postHoc_selections(self.project['filepaths']['marxan_input'], choices)
+            tidy, distribution = calc_postHoc_replicates(filename, format, IDs=IDs, selections=selections,
+                                                         pu=self.get_postHoc_pu(self.project))
+            tidy.to_csv(filepath, index=False)
+            distribution.to_csv(str.replace(filepath, ".csv", "_distribution.csv"), index=False)
+        except Exception as e:
+            print("Error while evaluating the solutions: " + repr(e))
+            error = e
+        wx.PostEvent(self, PostHocDoneEvent(filepath=filepath, solutions=len(choices), error=error))
+
+    def on_postHoc_timer(self, event):
+        if hasattr(self, 'postHoc_progress'):
+            self.postHoc_progress.Pulse()
+
+    def on_postHoc_done(self, event):
+        """
+        Shows the distribution of the metrics across the solutions once they have been evaluated
+        """
+        self.postHoc_timer.Stop()
+        self.Unbind(wx.EVT_TIMER, handler=self.on_postHoc_timer, source=self.postHoc_timer)
+        if hasattr(self, 'postHoc_progress'):
+            self.postHoc_progress.Destroy()
+            del self.postHoc_progress
+        if event.error is not None:
+            self.log.Show()
+            marxanconpy.warn_dialog("The solutions could not be evaluated. See the debugging console for details.")
+            return
+
+        file_viewer(parent=self, file=str.replace(event.filepath, ".csv", "_distribution.csv"),
+                    title='Post-Hoc Evaluation - Distribution Across ' + str(event.solutions) + ' Solutions')
+
     def on_export_postHoc( self, event ):
         pandas.read_json(self.project["postHoc"], orient='split').to_csv(self.postHoc_file.GetPath(), index=0)
 
     def set_postHoc_output_choice(self):
         if os.path.isfile(self.project['filepaths']['marxan_input']):
-            for line in open(self.project['filepaths']['marxan_input']):
-                if line.startswith('SCENNAME'):
-                    SCENNAME = line.replace('SCENNAME ', '').replace('\n', '')
-                if line.startswith('NUMREPS'):
-                    NUMREPS = int(line.replace('NUMREPS ', '').replace('\n', ''))
-                elif line.startswith('OUTPUTDIR'):
-                    OUTPUTDIR = line.replace('OUTPUTDIR ', '').replace('\n', '')
-                    
-            if not os.path.isdir(OUTPUTDIR):
-                OUTPUTDIR = os.path.join(os.path.dirname(self.project['filepaths']['marxan_input']),OUTPUTDIR)
-
-            fn = os.path.join(OUTPUTDIR, SCENNAME + "_best")
-            
-            if os.path.isfile(fn + '.csv') or os.path.isfile(fn + '.txt'):
-                self.postHoc_output_choice.SetItems(['Best Solution'] +
-                                                      ["r" + "%05d" % t for t in range(1, NUMREPS)])
-            else:
-                self.postHoc_output_choice.SetItems(['No Output Available'])
+            inputdat = read_marxan_input(self.project['filepaths']['marxan_input'])
+            SCENNAME = inputdat.get('SCENNAME')
+            self.postHoc_output_choice.SetItems(self.postHoc_choices(self.project['filepaths']['marxan_input']) or
+                                                ['No Output Available'])
 
-            
             self.postHoc_output_choice_txt.SetLabel("Output: " + SCENNAME)
             self.postHoc_output_choice.SetSelection(0)
 
+    def postHoc_choices(self, inputfile):
+        """
+        Returns the solutions of Marxan's output: the best solution and every replicate (empty if there is no output)
+        """
+        inputdat = read_marxan_input(inputfile)
+        fn = inputdat.output_file("_best")
+        if not os.path.isfile(fn + '.csv') and not os.path.isfile(fn + '.txt'):
+            return []
+        return ['Best Solution'] + ["r" + "%05d" % t for t in range(1, inputdat.get('NUMREPS', 1) + 1)]
+
+    def postHoc_selections(self, inputfile, choices):
+        """
+        Returns the planning unit IDs and the IDs selected in each of the solutions 'choices', by solution
+        """
+        selections = {}
+        for choice in choices:
+            solution = marxanconpy.manipulation.get_marxan_output(inputfile, choice)
+            selections[choice] = solution[(solution.iloc[:, 1].astype("str") == "1").values].iloc[:, 0].values
+        return solution.iloc[:, 0].values, selections
+
     def on_postHoc_file(self,event):
         self.project['filepaths']['posthoc'] = self.postHoc_file.GetPath()
 
 
+# ########################## project update functions ##################################################################
+    def project_build(self):
+        """
+        Returns the build graph of the project (see ProjectBuild): the files and options each step of the analysis
+        depends on, and how to build it again
+        """
+        def filepaths(*keys):
+            return lambda project: [project['filepaths'][key] for key in keys]
+
+        return ProjectBuild([
+            BuildStep('rescale', self.rescale_demo_matrix,
+                      inputs=filepaths('pu_filepath', 'demo_cu_filepath', 'demo_cu_cm_filepath'),
+                      options=('demo_conmat_format', 'demo_conmat_rescale_edge'),
+                      state=filepaths('pu_file_pu_id', 'demo_cu_file_pu_id'),
+                      outputs=filepaths('demo_pu_cm_filepath'),
+                      enabled=lambda project: project['options']['demo_conmat_rescale'] != "Identical Grids" and
+                                              os.path.isfile(project['filepaths']['demo_cu_cm_filepath'])),
+            BuildStep('landscape', self.generate_land_matrix,
+                      inputs=filepaths('pu_filepath', 'land_cu_filepath', 'land_res_mat_filepath', 'land_res_filepath'),
+                      options=('land_conmat_type', 'land_res_matrixType', 'land_hab_buff', 'land_res_cutoff',
+                               'land_lcp_cutoff'),
+                      state=filepaths('pu_file_pu_id', 'land_cu_file_hab_id', 'land_res_file_hab_id'),
+                      outputs=filepaths('land_pu_cm_filepath'),
+                      enabled=lambda project: project['options']['land_conmat_type'] !=
+                                              "Connectivity Edge List with Habitat" and
+                                              project['filepaths']['land_pu_cm_filepath'] != ""),
+            BuildStep('metrics', self.update_metrics, depends=['rescale', 'landscape'],
+                      inputs=filepaths('pu_filepath', 'demo_pu_cm_filepath', 'land_pu_cm_filepath', 'demo_cu_filepath',
+                                       'demo_cu_cm_filepath', 'land_cu_filepath', 'fa_filepath', 'aa_filepath'),
+                      options=('demo_metrics', 'land_metrics', 'demo_conmat_format', 'demo_conmat_type',
+                               'calc_metrics_pu', 'calc_metrics_cu', 'land_hab_thresh'),
+                      state=filepaths('pu_file_pu_id', 'demo_cu_file_pu_id', 'land_cu_file_hab_id'),
+                      enabled=lambda project: any(any(project['options'].get(type + '_metrics', {}).values())
+                                                  for type in ['demo', 'land']),
+                      main_thread=True),
+            BuildStep('discrete features', self.update_discrete_features, depends=['metrics'],
+                      state=self.discrete_features,
+                      enabled=lambda project: len(self.discrete_features(project)) > 0),
+            BuildStep('marxan files', lambda project: self.write_export_files(self.export_jobs()),
+                      depends=['metrics', 'discrete features'],
+                      inputs=filepaths('pu_filepath', 'orig_spec_filepath', 'orig_cf_filepath', 'orig_pudat_filepath',
+                                       'fa_filepath', 'aa_filepath'),
+                      options=('cf_export', 'bd_filecheck', 'pudat_filecheck', 'bd_threshold',
+                               'min_plan_graph_method', 'fa_status', 'aa_status', 'spec_set', 'targets'),
+                      state=lambda project: project.get('spec_dat'),
+                      outputs=lambda project: [project['filepaths']['cf_filepath'],
+                                               project['filepaths']['spec_filepath']] +
+                                              ([project['filepaths']['pudat_filepath']]
+                                               if project['options']['pudat_filecheck'] else []),
+                      enabled=lambda project: project['options']['metricsCalculated'],
+                      main_thread=True),
+            BuildStep('marxan', self.run_marxan_step, depends=['marxan files'],
+                      inputs=self.marxan_input_files,
+                      options=('solver', 'marxan', 'marxan_bit'),
+                      outputs=self.marxan_solution_files,
+                      enabled=lambda project: os.path.isfile(project['filepaths']['marxan_input'])),
+            BuildStep('post-hoc', self.update_postHoc, depends=['marxan'],
+                      inputs=lambda project: filepaths('pu_filepath', 'demo_pu_cm_filepath',
+                                                       'land_pu_cm_filepath')(project) +
+                                             self.marxan_output_files(project),
+                      options=('demo_conmat_format',),
+                      outputs=lambda project: list(self.postHoc_outputs(project)),
+                      enabled=lambda project: len(self.postHoc_outputs(project)) > 0)])
+
+    def discrete_features(self, project):
+        """
+        Returns the names of the discrete features made from the planning unit metrics (see on_preEval_create_new)
+        """
+        return sorted(k for type in ['spec_demo_pu', 'spec_land_pu']
+                      for k in project.get('connectivityMetrics', {}).get(type, {}) if '_discrete_' in k)
+
+    def update_metrics(self, project):
+        """
+        Calculates the metrics again, keeping the discrete features made from them (which the 'discrete features' step
+        then recomputes)
+        """
+        discrete = {}
+        for type in ['spec_demo_pu', 'spec_land_pu']:
+            discrete[type] = dict((k, v) for k, v in project.get('connectivityMetrics', {}).get(type, {}).items()
+                                  if '_discrete_' in k)
+        self.calc_metrics()
+        for type in discrete:
+            for k, v in discrete[type].items():
+                project['connectivityMetrics'].setdefault(type, {}).setdefault(k, v)
+
+    def update_discrete_features(self, project):
+        """
+        Recomputes the discrete features from the metrics they were made from
+        """
+        for type in ['spec_demo_pu', 'spec_land_pu']:
+            if type in project.get('connectivityMetrics', {}):
+                rediscretize_features(project['connectivityMetrics'][type])
+        clear_metric_statistics()
+
+    def marxan_input_files(self, project):
+        """
+        Returns the Marxan input file and the files it refers to
+        """
+        filepaths = [project['filepaths']['marxan_input']]
+        try:
+            inputdat = read_marxan_input(project['filepaths']['marxan_input'])
+        except OSError:
+            return filepaths
+        for parameter in ['PUNAME', 'SPECNAME', 'PUVSPRNAME', 'BOUNDNAME']:
+            if inputdat.raw(parameter, '') != '':
+                filepaths.append(os.path.join(inputdat.inputdir, inputdat.raw(parameter)))
+        return filepaths
+
+    def marxan_solution_files(self, project):
+        """
+        Returns the solution files the next Marxan run will write (see MarxanInput.solution_files)
+        """
+        try:
+            return read_marxan_input(project['filepaths']['marxan_input']).solution_files()
+        except OSError:
+            return []
+
+    def marxan_output_files(self, project):
+        """
+        Returns the solution files of the last Marxan run (the best solution and the replicates)
+        """
+        try:
+            inputdat = read_marxan_input(project['filepaths']['marxan_input'])
+        except OSError:
+            return []
+        return sorted(glob.glob(inputdat.output_file('_best') + '.*') + glob.glob(inputdat.output_file('_r0') + '*'))
+
+    def run_marxan_step(self, project):
+        """
+        Runs Marxan (or the Python annealer) on the project's Marxan input file and waits for it to finish
+        """
+        inputfile = project['filepaths']['marxan_input']
+        inputdat = read_marxan_input(inputfile)
+        if project['options'].get('solver', 'Marxan') == 'Python':
+            ids, solutions, summary = run_annealer(inputdat, cancelled=self.update_cancelled.is_set,
+                                                   tables=self.call_on_main_thread(self.annealer_tables))
+            if self.update_cancelled.is_set():
+                raise Exception("Cancelled")
+            write_annealer_output(inputdat, ids, solutions, summary)
+            return
+        executable = get_marxan_executable(project['options']['marxan'], project['options']['marxan_bit'])
+        runner = MarxanRunner(None, executable, os.path.basename(inputfile), cwd=os.path.dirname(inputfile))
+        # cancel_update stops Marxan through the runner
+        self.update_runner = runner
+        try:
+            with profiler.span('marxan', input=runner.inputfile):
+                for line in runner.lines():
+                    print(line)
+                    if self.update_cancelled.is_set() and not runner.cancelled:
+                        runner.cancel()
+                returncode = runner.proc.wait()
+        finally:
+            self.update_runner = None
+        if runner.cancelled:
+            raise Exception("Cancelled")
+        if returncode != 0:
+            raise Exception("Marxan finished with exit code " + str(returncode))
+
+    def postHoc_outputs(self, project):
+        """
+        Returns the post-hoc evaluations of all solutions written next to Marxan's output by the 'post-hoc' step (one
+        per planning unit connectivity matrix) and the format and file path of their connectivity matrix, by file path
+        """
+        if not os.path.isfile(project['filepaths']['marxan_input']):
+            return {}
+        inputdat = read_marxan_input(project['filepaths']['marxan_input'])
+        outputs = {}
+        if os.path.isfile(project['filepaths']['demo_pu_cm_filepath']):
+            outputs[inputdat.output_file('_postHoc_demographic.csv')] = (project['options']['demo_conmat_format'],
+                                                                         project['filepaths']['demo_pu_cm_filepath'])
+        if os.path.isfile(project['filepaths']['land_pu_cm_filepath']):
+            outputs[inputdat.output_file('_postHoc_landscape.csv')] = ("Edge List with Habitat",
+                                                                       project['filepaths']['land_pu_cm_filepath'])
+        return outputs
+
+    def update_postHoc(self, project):
+        """
+        Evaluates post-hoc connectivity for the best solution and every replicate (see on_batch_postHoc) with each
+        planning unit connectivity matrix
+        """
+        choices = self.postHoc_choices(project['filepaths']['marxan_input'])
+        if len(choices) == 0:
+            raise Exception("No Marxan output to evaluate")
+        IDs, selections = self.postHoc_selections(project['filepaths']['marxan_input'], choices)
+        pu = self.get_postHoc_pu(project)
+        for filepath, (format, filename) in self.postHoc_outputs(project).items():
+            tidy, distribution = calc_postHoc_replicates(filename, format, IDs=IDs, selections=selections, pu=pu)
+            tidy.to_csv(filepath, index=False)
+            distribution.to_csv(str.replace(filepath, ".csv", "_distribution.csv"), index=False)
+
+    def on_update_project(self, event):
+        """
+        Runs again the steps of the analysis whose inputs changed since they were last run (see project_build)
+        """
+        self.set_metric_options()
+        build = self.project_build()
+        try:
+            wx.BeginBusyCursor()
+            try:
+                stale = build.stale(self.project)
+            finally:
+                wx.EndBusyCursor()
+        except:
+            self.log.Show()
+            raise
+        if len(stale) == 0:
+            marxanconpy.warn_dialog("The project is up to date.", "Update Project")
+            return
+
+        dlg = wx.MessageDialog(self, "These steps are out of date and will be run again: " + ", ".join(stale) + ".",
+                               "Update Project", wx.OK | wx.CANCEL)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        dlg.Destroy()
+
+        # the steps run in a background thread, which hands the steps which must run on the main thread back to it
+        self.log.Show()
+        self.update_cancelled = threading.Event()
+        self.update_runner = None
+        self.update_running = []
+        self.update_done = 0
+        self.update_progress = wx.ProgressDialog("Update Project", "Running: " + stale[0] + " " * 40,
+                                                 maximum=len(stale), parent=self,
+                                                 style=wx.PD_CAN_ABORT | wx.PD_APP_MODAL | wx.PD_ELAPSED_TIME)
+        # the dialog is checked for 'Cancel' regularly, as steps can run for a long time without any progress
+        self.update_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_update_timer, self.update_timer)
+        self.update_timer.Start(250)
+        threading.Thread(target=self.update_project_thread, args=(build,), daemon=True).start()
+
+    def update_project_thread(self, build):
+        """
+        Runs the project build in the background, and posts EVT_UPDATE_PROGRESS as steps start and finish and
+        EVT_UPDATE_DONE with the report when it is over
+        """
+        try:
+            report = build.update(self.project, call_main=self.call_on_main_thread,
+                                  cancelled=self.update_cancelled.is_set,
+                                  callback=lambda name, report: wx.PostEvent(self, UpdateProgressEvent(name=name,
+                                                                                                      report=report)))
+        except Exception as e:
+            print("Error while updating the project: " + repr(e))
+            report = pandas.DataFrame([{'step': 'update', 'status': repr(e), 'seconds': 0.0}])
+        wx.PostEvent(self, UpdateDoneEvent(report=report))
+
+    def call_on_main_thread(self, function, *args):
+        """
+        Calls a function on the main thread (from a background thread) and waits for its result
+        """
+        done = threading.Event()
+        result = {}
+
+        def call():
+            try:
+                result['value'] = function(*args)
+            except BaseException as e:
+                result['error'] = e
+            finally:
+                done.set()
+
+        wx.CallAfter(call)
+        done.wait()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def on_update_progress(self, event):
+        if event.report is None:
+            self.update_running.append(event.name)
+        else:
+            if event.name in self.update_running:
+                self.update_running.remove(event.name)
+            self.update_done += 1
+        self.on_update_timer(None)
+
+    def on_update_timer(self, event):
+        """
+        Shows the steps being run, and cancels the update if 'Cancel' was pressed
+        """
+        if not hasattr(self, 'update_progress'):
+            return
+        if self.update_cancelled.is_set():
+            message = "Cancelling..."
+        else:
+            message = "Running: " + ", ".join(self.update_running)
+        if not self.update_progress.Update(min(self.update_done, self.update_progress.GetRange() - 1), message)[0]:
+            self.cancel_update()
+
+    def cancel_update(self):
+        """
+        Starts no more steps of the project update, and stops Marxan if it is running
+        """
+        self.update_cancelled.set()
+        runner = self.update_runner
+        if runner is not None:
+            runner.cancel()
+
+    def on_update_done(self, event):
+        """
+        Updates the GUI once the project update is over (the steps run in worker threads leave it to be done here)
+        """
+        self.update_timer.Stop()
+        self.Unbind(wx.EVT_TIMER, handler=self.on_update_timer, source=self.update_timer)
+        if hasattr(self, 'update_progress'):
+            self.update_progress.Destroy()
+            del self.update_progress
+        report = event.report
+        print(report.to_string(index=False))
+
+        built = set(report['step'][report['status'] == 'ok'])
+        if 'discrete features' in built:
+            self.colormap_shapefile_choices()
+            self.colormap_metric_choices(1)
+            self.colormap_metric_choices(2)
+            self.colormap_metric_choices("pre-eval")
+            self.update_discrete_grid()
+        if 'marxan' in built:
+            self.load_marxan_results()
+        if 'post-hoc' in built:
+            self.enable_postHoc()
+
+        if (report['status'] == 'ok').all():
+            marxanconpy.warn_dialog("The project is up to date: " + ", ".join(report['step']) + " run again.",
+                                    "Update Successful")
+        elif self.update_cancelled.is_set():
+            marxanconpy.warn_dialog("The project update was cancelled. Steps run again: " +
+                                    (", ".join(report['step'][report['status'] == 'ok']) or "none") + ".",
+                                    "Update Cancelled")
+        else:
+            marxanconpy.warn_dialog("Some steps could not be run again. See the debugging console for details.")
+
 # ###########################  spec grid popup functions ###############################################################
     def on_customize_spec(self, event):
         if self.calc_metrics_pu.GetValue() & self.project['options']['metricsCalculated']:
@@ -2730,8 +3621,114 @@ class GettingStarted (gui.GettingStarted):
 
 # ########################### file popup viewer #####################################################################
 
+def read_table_file(file):
+    """
+    Reads a comma or tab separated file through a memory map
+    """
+    with open(file) as f:
+        header = f.readline()
+    return pandas.read_csv(file, sep='\t' if '\t' in header else ',', memory_map=True)
+
+
+class DataFrameTable(wx.grid.GridTableBase):
+    """
+    Read-only virtual grid table over a DataFrame. The grid only asks for the cells it draws, so the data is never
+    copied into the widget. Rows are shown 'page_size' at a time (all at once if None) and are sorted through an array
+    of row positions rather than by reordering the data. Cells are displayed with 'formatter(value, position, col)' if
+    supplied.
+    """
+    def __init__(self, data, row_labels=None, page_size=None, formatter=None):
+        wx.grid.GridTableBase.__init__(self)
+        self.data = data
+        self.row_labels = row_labels
+        self.formatter = formatter
+        self.page_size = page_size
+        self.page = 0
+        self.order = numpy.arange(data.shape[0])
+        self.sorted_by = None
+        self.ascending = True
+
+    def GetNumberRows(self):
+        if self.page_size is None:
+            return self.data.shape[0]
+        return max(0, min(self.page_size, self.data.shape[0] - self.first_row()))
+
+    def GetNumberCols(self):
+        return self.data.shape[1]
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        position = self.order[self.first_row() + row]
+        if self.formatter is None:
+            return str(self.data.iat[position, col])
+        return self.formatter(self.data.iat[position, col], position, col)
+
+    def SetValue(self, row, col, value):
+        pass
+
+    def GetColLabelValue(self, col):
+        label = str(self.data.columns[col])
+        if col == self.sorted_by:
+            label = label + (u" ▲" if self.ascending else u" ▼")
+        return label
+
+    def GetRowLabelValue(self, row):
+        position = self.order[self.first_row() + row]
+        if self.row_labels is None:
+            return str(position + 1)
+        return str(self.row_labels[position])
+
+    def first_row(self):
+        return 0 if self.page_size is None else self.page * self.page_size
+
+    def page_count(self):
+        if self.page_size is None:
+            return 1
+        return max(1, int(numpy.ceil(self.data.shape[0] / float(self.page_size))))
+
+    def sort(self, col):
+        """
+        Sorts the rows by a column, toggling between ascending and descending order, and returns to the first page
+        """
+        self.ascending = not self.ascending if col == self.sorted_by else True
+        self.sorted_by = col
+        self.order = self.data.iloc[:, col].reset_index(drop=True).sort_values(ascending=self.ascending,
+                                                                              kind='mergesort').index.values
+        self.page = 0
+
+    def refresh(self, grid, rows_before):
+        """
+        Tells the grid that the rows it shows have changed (after sorting or paging)
+        """
+        rows = self.GetNumberRows()
+        grid.BeginBatch()
+        if rows < rows_before:
+            grid.ProcessTableMessage(wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED,
+                                                              rows, rows_before - rows))
+        elif rows > rows_before:
+            grid.ProcessTableMessage(wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED,
+                                                              rows - rows_before))
+        grid.ProcessTableMessage(wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_REQUEST_VIEW_GET_VALUES))
+        grid.EndBatch()
+        grid.ForceRefresh()
+
+
+def fit_grid_columns(grid, table, sample=100):
+    """
+    Sizes the columns of a virtual grid to their label and first 'sample' rows (AutoSizeColumns reads every row)
+    """
+    dc = wx.ClientDC(grid)
+    dc.SetFont(grid.GetLabelFont())
+    for col in range(table.GetNumberCols()):
+        texts = [table.GetColLabelValue(col)] + [table.GetValue(row, col)
+                                                 for row in range(min(sample, table.GetNumberRows()))]
+        grid.SetColSize(col, max(dc.GetTextExtent(t)[0] for t in texts) + 20)
+
+
 class file_viewer(wx.Dialog):
-    def __init__(self, parent, file, title):
+    def __init__(self, parent, file, title, page_size=10000):
         wx.Dialog.__init__(self, parent, id=wx.ID_ANY, title=title, pos=wx.DefaultPosition,
                            size=wx.Size(-1, -1), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
 
@@ -2743,11 +3740,11 @@ class file_viewer(wx.Dialog):
 
         self.file_grid = wx.grid.Grid(self, wx.ID_ANY, wx.DefaultPosition, wx.DefaultSize, 0)
 
-        # Load file
-        df = marxanconpy.read_csv_tsv(file)
+        # Load file, the grid only reads the cells it displays
+        self.file_table = DataFrameTable(read_table_file(file), page_size=page_size)
 
         # Grid
-        self.file_grid.CreateGrid(df.shape[0], df.shape[1])
+        self.file_grid.SetTable(self.file_table, False)
         self.file_grid.EnableEditing(False)
         self.file_grid.EnableGridLines(True)
         self.file_grid.EnableDragGridSize(False)
@@ -2757,11 +3754,7 @@ class file_viewer(wx.Dialog):
         self.file_grid.EnableDragColMove(False)
         self.file_grid.EnableDragColSize(True)
         self.file_grid.SetColLabelSize(30)
-        for col, label in enumerate(df.columns):
-            self.file_grid.SetColLabelValue(col,label)
-            for index in df.index:
-                self.file_grid.SetCellValue(index, col, str(df.iloc[index, col]))
-        self.file_grid.AutoSizeColumns()
+        fit_grid_columns(self.file_grid, self.file_table)
         self.file_grid.SetColLabelAlignment(wx.ALIGN_CENTRE, wx.ALIGN_CENTRE)
 
         # Rows
@@ -2773,14 +3766,20 @@ class file_viewer(wx.Dialog):
         self.file_grid.SetDefaultCellAlignment(wx.ALIGN_CENTRE, wx.ALIGN_CENTRE)
         file_mainsizer.Add(self.file_grid, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.ALIGN_CENTER_VERTICAL | wx.EXPAND, 5)
 
-        file_button_sizer = wx.FlexGridSizer(0, 3, 0, 0)
+        file_button_sizer = wx.FlexGridSizer(0, 4, 0, 0)
         file_button_sizer.AddGrowableCol(0)
         file_button_sizer.SetFlexibleDirection(wx.BOTH)
         file_button_sizer.SetNonFlexibleGrowMode(wx.FLEX_GROWMODE_SPECIFIED)
 
         self.spacer_text = wx.StaticText(self, wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0)
         self.spacer_text.Wrap(-1)
-        file_button_sizer.Add(self.spacer_text, 0, wx.ALL, 5)
+        file_button_sizer.Add(self.spacer_text, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+
+        self.file_previous = wx.Button(self, wx.ID_ANY, u"< Previous", wx.DefaultPosition, wx.DefaultSize, 0)
+        file_button_sizer.Add(self.file_previous, 0, wx.ALIGN_RIGHT | wx.ALL, 5)
+
+        self.file_next = wx.Button(self, wx.ID_ANY, u"Next >", wx.DefaultPosition, wx.DefaultSize, 0)
+        file_button_sizer.Add(self.file_next, 0, wx.ALIGN_RIGHT | wx.ALL, 5)
 
         self.file_ok = wx.Button(self, wx.ID_ANY, u"OK", wx.DefaultPosition, wx.DefaultSize, 0)
         file_button_sizer.Add(self.file_ok, 0, wx.ALIGN_RIGHT | wx.ALL, 5)
@@ -2795,26 +3794,310 @@ class file_viewer(wx.Dialog):
 
         # Connect Events
         self.file_ok.Bind(wx.EVT_BUTTON, self.on_file_ok)
+        self.file_previous.Bind(wx.EVT_BUTTON, self.on_file_previous)
+        self.file_next.Bind(wx.EVT_BUTTON, self.on_file_next)
+        self.file_grid.Bind(wx.grid.EVT_GRID_LABEL_LEFT_CLICK, self.on_file_label)
 
+        self.update_page_text()
         self.Show()
 
+    def update_page_text(self):
+        first = self.file_table.first_row()
+        rows = self.file_table.data.shape[0]
+        self.spacer_text.SetLabel("Rows " + str(min(first + 1, rows)) + "-" +
+                                  str(first + self.file_table.GetNumberRows()) + " of " + str(rows) +
+                                  " (click a column label to sort)")
+        self.file_previous.Enable(self.file_table.page > 0)
+        self.file_next.Enable(self.file_table.page < self.file_table.page_count() - 1)
+        self.Layout()
+
+    def change_page(self, page):
+        rows_before = self.file_table.GetNumberRows()
+        self.file_table.page = page
+        self.file_table.refresh(self.file_grid, rows_before)
+        self.file_grid.MakeCellVisible(0, 0)
+        self.update_page_text()
+
+    def on_file_previous(self, event):
+        self.change_page(self.file_table.page - 1)
+
+    def on_file_next(self, event):
+        self.change_page(self.file_table.page + 1)
+
+    def on_file_label(self, event):
+        if event.GetRow() == -1 and event.GetCol() >= 0:
+            rows_before = self.file_table.GetNumberRows()
+            self.file_table.sort(event.GetCol())
+            self.file_table.refresh(self.file_grid, rows_before)
+            self.update_page_text()
+        else:
+            event.Skip()
+
     def on_file_ok(self,event):
         self.Hide()
 
+# ########################## parameter sweep popup #####################################################################
+
+class SweepDialog(wx.Dialog):
+    def __init__(self, parent, options, sweepdir):
+        wx.Dialog.__init__(self, parent, id=wx.ID_ANY, title="Marxan Parameter Sweep", pos=wx.DefaultPosition,
+                           size=wx.Size(-1, -1), style=wx.DEFAULT_DIALOG_STYLE)
+
+        self.SetSizeHints(wx.DefaultSize, wx.DefaultSize)
+
+        sweep_mainsizer = wx.BoxSizer(wx.VERTICAL)
+
+        sweep_def = wx.StaticText(self, wx.ID_ANY, u"Marxan is run once for every combination of the values below. "
+                                                   u"Values are separated by commas (e.g. 0,0.5,1) or given as a "
+                                                   u"range (start:stop:number of values, e.g. 0:1:5). Leave the "
+                                                   u"targets empty to keep those of the spec file.",
+                                  wx.DefaultPosition, wx.DefaultSize, 0)
+        sweep_def.Wrap(400)
+        sweep_mainsizer.Add(sweep_def, 0, wx.ALL, 5)
+
+        sweep_sizer = wx.FlexGridSizer(0, 2, 0, 0)
+        sweep_sizer.AddGrowableCol(1)
+        sweep_sizer.SetFlexibleDirection(wx.BOTH)
+        sweep_sizer.SetNonFlexibleGrowMode(wx.FLEX_GROWMODE_SPECIFIED)
+
+        self.sweep_BLM = self.add_row(sweep_sizer, u"Connectivity Strength Modifier (BLM)",
+                                      options.get('sweep_BLM', options['CSM']))
+        self.sweep_NUMITNS = self.add_row(sweep_sizer, u"Number of Iterations (NUMITNS)",
+                                          options.get('sweep_NUMITNS', options['NUMITNS']))
+        self.sweep_targets = self.add_row(sweep_sizer, u"Targets (all conservation features)",
+                                          options.get('sweep_targets', ''))
+
+        sweep_sizer.Add(wx.StaticText(self, wx.ID_ANY, u"Simultaneous Marxan Runs"), 0,
+                        wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.sweep_processes = wx.SpinCtrl(self, wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize,
+                                           wx.SP_ARROW_KEYS, 1, multiprocessing.cpu_count(),
+                                           int(options.get('sweep_processes',
+                                                           max(1, multiprocessing.cpu_count() - 1))))
+        sweep_sizer.Add(self.sweep_processes, 0, wx.ALL, 5)
+
+        sweep_sizer.Add(wx.StaticText(self, wx.ID_ANY, u"Sweep Directory"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.sweep_dir = wx.DirPickerCtrl(self, wx.ID_ANY, options.get('sweep_dir', sweepdir), u"Select a folder",
+                                          wx.DefaultPosition, wx.DefaultSize, wx.DIRP_DEFAULT_STYLE)
+        sweep_sizer.Add(self.sweep_dir, 0, wx.ALL | wx.EXPAND, 5)
+
+        sweep_mainsizer.Add(sweep_sizer, 1, wx.EXPAND, 5)
+        sweep_mainsizer.Add(self.CreateStdDialogButtonSizer(wx.OK | wx.CANCEL), 0, wx.ALL | wx.EXPAND, 5)
+
+        self.SetSizer(sweep_mainsizer)
+        self.Layout()
+        sweep_mainsizer.Fit(self)
+        self.Centre(wx.BOTH)
+
+    def add_row(self, sizer, label, value):
+        sizer.Add(wx.StaticText(self, wx.ID_ANY, label), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        text = wx.TextCtrl(self, wx.ID_ANY, str(value), wx.DefaultPosition, wx.Size(200, -1), 0)
+        sizer.Add(text, 0, wx.ALL | wx.EXPAND, 5)
+        return text
+
+    def get_values(self):
+        """
+        Returns the sweep settings as project options
+        """
+        return {'sweep_BLM': self.sweep_BLM.GetValue(),
+                'sweep_NUMITNS': self.sweep_NUMITNS.GetValue(),
+                'sweep_targets': self.sweep_targets.GetValue(),
+                'sweep_processes': self.sweep_processes.GetValue(),
+                'sweep_dir': self.sweep_dir.GetPath()}
+
 # ######################################################################################################################
 
 # ########################## debug mode ################################################################################
 
 class RedirectText(object):
-    def __init__(self, aWxTextCtrl):
+    """
+    Buffered sink for stdout/stderr. Writes (from any thread) only append to a buffer; a timer moves the buffered
+    text to the console in one call, so fast output can't flood the event queue. The console keeps the last
+    'max_chars' characters and the output can also be copied to a rotating log file (see 'set_logfile').
+    """
+    def __init__(self, aWxTextCtrl, interval=250, max_chars=1000000):
         self.out = aWxTextCtrl
+        self.max_chars = max_chars
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.logger = None
+        self.timer = wx.Timer(self.out)
+        self.out.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+        self.timer.Start(interval)
 
     def write(self, string):
-        wx.CallAfter(self.out.WriteText, string)
+        with self.lock:
+            self.buffer.append(string)
 
     def flush(self):
-        # do nothing...
-       None
+        # the timer flushes to the console
+        None
+
+    def set_logfile(self, filepath, max_bytes=5000000, backups=3):
+        """
+        Copies the output to 'filepath', rolling over to 'filepath.1', 'filepath.2', ... every 'max_bytes' (no file if
+        None)
+        """
+        self.flush_buffer()
+        if self.logger is not None:
+            for handler in list(self.logger.handlers):
+                handler.close()
+                self.logger.removeHandler(handler)
+            self.logger = None
+        if filepath is not None:
+            handler = logging.handlers.RotatingFileHandler(filepath, maxBytes=max_bytes, backupCount=backups)
+            handler.terminator = ""
+            self.logger = logging.getLogger('MarxanConnect.console')
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(handler)
+
+    def on_timer(self, event):
+        self.flush_buffer()
+
+    def flush_buffer(self):
+        with self.lock:
+            if len(self.buffer) == 0:
+                return
+            text = "".join(self.buffer)
+            self.buffer = []
+
+        if self.logger is not None:
+            self.logger.info(text)
+        if len(text) > self.max_chars:
+            text = text[-self.max_chars:]
+        self.out.AppendText(text)
+
+        # drop the oldest text, leaving some room so this doesn't happen on every flush
+        excess = self.out.GetLastPosition() - self.max_chars
+        if excess > 0:
+            self.out.Remove(0, excess + self.max_chars // 10)
+
+class PerformancePanel(wx.Panel):
+    """
+    Lists the spans recorded by the profiler (see Profiler) as they finish: nested spans are indented under the span
+    they ran in. Like RedirectText, spans from any thread are buffered and a timer adds them to the list. The panel
+    only listens to the profiler while it is visible (see set_active), and lists the spans it missed when shown again.
+    It can also save the spans to a trace file and time each function of marxanconpy.
+    """
+    columns = [("Span", 260), ("Wall (s)", 70), ("CPU (s)", 70), ("Peak memory (MB)", 110),
+               ("Memory change (MB)", 120), ("Details", 400)]
+
+    def __init__(self, parent, interval=500, max_rows=5000):
+        wx.Panel.__init__(self, parent, wx.ID_ANY)
+        self.interval = interval
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.buffer = []
+
+        self.list = wx.ListCtrl(self, wx.ID_ANY, style=wx.LC_REPORT)
+        for i, (label, width) in enumerate(self.columns):
+            self.list.InsertColumn(i, label, width=width)
+        self.trace_button = wx.ToggleButton(self, wx.ID_ANY, "Save Trace...")
+        self.trace_button.SetToolTip("Saves the spans to a trace file (Chrome trace event format), which "
+                                     "chrome://tracing or https://ui.perfetto.dev open")
+        self.instrument_check = wx.CheckBox(self, wx.ID_ANY, "Time each marxanconpy function")
+        self.instrument_check.SetToolTip("Records a span for each call to a marxanconpy function (e.g. each metric) "
+                                         "which takes more than a millisecond. This slows down functions which are "
+                                         "called very often.")
+        clear_button = wx.Button(self, wx.ID_ANY, "Clear")
+
+        buttons = wx.BoxSizer(wx.HORIZONTAL)
+        buttons.Add(self.trace_button, 0, wx.ALL, 5)
+        buttons.Add(self.instrument_check, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        buttons.AddStretchSpacer()
+        buttons.Add(clear_button, 0, wx.ALL, 5)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.list, 1, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(buttons, 0, wx.EXPAND)
+        self.SetSizer(sizer)
+
+        self.trace_button.Bind(wx.EVT_TOGGLEBUTTON, self.on_trace)
+        self.instrument_check.Bind(wx.EVT_CHECKBOX, self.on_instrument)
+        clear_button.Bind(wx.EVT_BUTTON, self.on_clear)
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+    def set_active(self, active):
+        """
+        Starts (or stops) listening to the profiler and adding its spans to the list
+        """
+        if active == self.timer.IsRunning():
+            return
+        if active:
+            self.list.DeleteAllItems()
+            spans = profiler.listen(self.add)
+            with self.lock:
+                self.buffer = spans[-self.max_rows:] + self.buffer
+            self.timer.Start(self.interval)
+        else:
+            self.timer.Stop()
+            profiler.unlisten(self.add)
+            with self.lock:
+                self.buffer = []
+
+    def on_destroy(self, event):
+        if event.GetEventObject() is self:
+            self.set_active(False)
+        event.Skip()
+
+    def add(self, span):
+        with self.lock:
+            self.buffer.append(span)
+
+    def on_timer(self, event):
+        with self.lock:
+            if len(self.buffer) == 0:
+                return
+            spans = self.buffer
+            self.buffer = []
+
+        # spans finish after the spans nested in them: the list is in order of start
+        self.list.Freeze()
+        for span in sorted(spans, key=lambda span: span['start']):
+            row = self.list.GetItemCount()
+            self.list.InsertItem(row, "    " * span['depth'] + span['name'])
+            self.list.SetItem(row, 1, str(round(span['wall'], 3)))
+            self.list.SetItem(row, 2, str(round(span['cpu'], 3)))
+            self.list.SetItem(row, 3, "" if span['peak_mb'] is None else str(int(span['peak_mb'])))
+            self.list.SetItem(row, 4, "" if span['delta_mb'] is None else str(int(span['delta_mb'])))
+            self.list.SetItem(row, 5, ", ".join(k + ": " + str(v) for k, v in span['args'].items()))
+        while self.list.GetItemCount() > self.max_rows:
+            self.list.DeleteItem(0)
+        self.list.EnsureVisible(self.list.GetItemCount() - 1)
+        self.list.Thaw()
+
+    def on_trace(self, event):
+        if self.trace_button.GetValue():
+            dlg = wx.FileDialog(self, "Save the trace to", defaultFile="MarxanConnect_trace.json",
+                                wildcard="Trace files (*.json)|*.json|All files (*.*)|*.*",
+                                style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+            if dlg.ShowModal() == wx.ID_OK:
+                profiler.set_trace(dlg.GetPath())
+                self.trace_button.SetLabel("Stop Trace")
+                print("Saving the profiling trace to " + dlg.GetPath())
+            else:
+                self.trace_button.SetValue(False)
+            dlg.Destroy()
+        else:
+            profiler.set_trace(None)
+            self.trace_button.SetLabel("Save Trace...")
+
+    def on_instrument(self, event):
+        if self.instrument_check.GetValue():
+            # marxanconpy is imported if it wasn't yet
+            marxanconpy._load()
+            print("Timing " + str(profiler.instrument('marxanconpy')) + " marxanconpy functions")
+        else:
+            profiler.uninstrument()
+
+    def on_clear(self, event):
+        with self.lock:
+            self.buffer = []
+        with profiler.lock:
+            profiler.spans = []
+        self.list.DeleteAllItems()
+
 
 class LogForm(wx.Frame):
     def __init__(self, parent):
@@ -2822,34 +4105,451 @@ class LogForm(wx.Frame):
         self.Bind(wx.EVT_CLOSE, self.__close)
         parent.set_icon(frame=self, rootpath=MCPATH)
 
-        # Add a panel
-        panel = wx.Panel(self, wx.ID_ANY)
+        # the console and the performance panel (see PerformancePanel) are on separate tabs
+        self.notebook = notebook = wx.Notebook(self, wx.ID_ANY)
+        panel = wx.Panel(notebook, wx.ID_ANY)
         log = wx.TextCtrl(panel, wx.ID_ANY, size=(350, 350), style=wx.TE_MULTILINE | wx.TE_READONLY | wx.HSCROLL)
 
         # Add widgets to a sizer
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(log, 1, wx.ALL | wx.EXPAND, 5)
         panel.SetSizer(sizer)
+        self.performance = PerformancePanel(notebook)
+        notebook.AddPage(panel, "Console")
+        notebook.AddPage(self.performance, "Performance")
+        self.Bind(wx.EVT_SHOW, self.on_show)
+        notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.on_show)
 
         # redirect text here
-        redir = RedirectText(log)
-        sys.stdout = redir
-        sys.stderr = redir
+        self.redir = RedirectText(log)
+        sys.stdout = self.redir
+        sys.stderr = self.redir
+
+    def on_show(self, event):
+        event.Skip()
+        # the frame and the selected page have changed once the event is handled
+        wx.CallAfter(self.update_performance)
+
+    def update_performance(self):
+        if self:
+            self.performance.set_active(self.IsShown() and self.notebook.GetCurrentPage() is self.performance)
 
     def __close(self, event):
         self.Hide()
 
 
+# ########################## startup ###################################################################################
+
+# modules which are slow to import and should not be loaded before the first window is shown (see startup_report)
+startup_heavy_modules = ['matplotlib', 'matplotlib.pyplot', 'cartopy', 'geopandas', 'shapely', 'fiona', 'pyproj',
+                         'igraph', 'rasterio', 'marxanconpy']
+
+
+def loaded_heavy_modules():
+    """
+    Returns the slow-to-import modules (startup_heavy_modules) which have been imported so far
+    """
+    return [name for name in startup_heavy_modules if name in sys.modules]
+
+
+# ########################## marxan runner #############################################################################
+
+MarxanProgressEvent, EVT_MARXAN_PROGRESS = wx.lib.newevent.NewEvent()
+MarxanDoneEvent, EVT_MARXAN_DONE = wx.lib.newevent.NewEvent()
+
+
+def get_marxan_executable(marxan="Marxan", bit="64-bit", system=None):
+    """
+    Returns the path of the Marxan (or Marxan with Zones) executable for the operating system
+    """
+    system = platform.system() if system is None else system
+    x64 = bit == "64-bit"
+    if system == 'Windows':
+        if marxan == "Marxan":
+            name = 'Marxan_x64.exe' if x64 else 'Marxan.exe'
+        else:
+            name = 'MarZone_x64.exe' if x64 else 'MarZone.exe'
+    elif not marxan == "Marxan":
+        raise Exception("Marxan with Zones is only available for Windows at the moment")
+    elif system == 'Darwin':
+        name = 'MarOpt_v243_Mac64' if x64 else 'MarOpt_v243_Mac32'
+    else:
+        name = 'MarOpt_v243_Linux64' if x64 else 'MarOpt_v243_Linux32'
+    return os.path.join(MCPATH, 'Marxan243', name)
+
+
+class MarxanRunner(threading.Thread):
+    """
+    Runs Marxan in the background and reads its output line by line. On macOS and Linux the output goes through a
+    pseudo-terminal so that Marxan doesn't buffer it; on Windows it is a pipe and arrives in bursts (see
+    marxan_output_buffered). Lines are printed to the debug log, and the progress (run,
+    iteration, score, fraction done and estimated seconds remaining) is posted to 'window' as EVT_MARXAN_PROGRESS
+    events at most 'interval' seconds apart. EVT_MARXAN_DONE is posted with the return code when Marxan exits.
+    """
+    def __init__(self, window, executable, inputfile, cwd, numreps=1, interval=0.2):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.window = window
+        self.executable = executable
+        self.inputfile = inputfile
+        self.cwd = cwd
+        self.numreps = max(1, numreps)
+        self.interval = interval
+        self.proc = None
+        self.cancelled = False
+
+    def run(self):
+        start = time.time()
+        progress = {'run': 0, 'runs_done': 0, 'iteration': 0, 'complete': 0, 'score': None, 'best_run': None}
+        posted = 0
+        with profiler.span('marxan', input=self.inputfile, runs=self.numreps) as args:
+            try:
+                for line in self.lines():
+                    print(line)
+                    if parse_marxan_line(line, progress) and time.time() - posted > self.interval:
+                        posted = time.time()
+                        wx.PostEvent(self.window, MarxanProgressEvent(**self.estimate(progress, start)))
+                returncode = self.proc.wait()
+            except Exception as e:
+                print("Error while running Marxan: " + str(e))
+                returncode = -1
+            args['returncode'] = returncode
+        wx.PostEvent(self.window, MarxanDoneEvent(returncode=returncode, cancelled=self.cancelled,
+                                                  progress=progress, seconds=time.time() - start))
+
+    def lines(self):
+        """
+        Starts Marxan and yields its output, one line at a time. Marxan waits for 'return' before exiting, which is
+        sent as soon as it asks.
+        """
+        master = None
+        if os.name == 'posix':
+            import pty
+            master, slave = pty.openpty()
+            self.proc = subprocess.Popen([self.executable, self.inputfile], cwd=self.cwd,
+                                         stdin=slave, stdout=slave, stderr=slave, close_fds=True)
+            os.close(slave)
+            read = lambda: os.read(master, 4096)
+            send_return = lambda: os.write(master, b"\n")
+        else:
+            self.proc = subprocess.Popen([self.executable, self.inputfile], cwd=self.cwd,
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+            read = lambda: self.proc.stdout.read1(4096)
+
+            def send_return():
+                self.proc.stdin.write(b"\n")
+                self.proc.stdin.flush()
+
+        pending = ""
+        try:
+            while True:
+                try:
+                    chunk = read()
+                except OSError:
+                    # the pseudo-terminal is closed when Marxan exits
+                    break
+                if not chunk:
+                    break
+                text = pending + chunk.decode('utf-8', 'replace')
+                lines = re.split(r"[\r\n]+", text)
+                pending = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        yield line
+                if "Press return" in text:
+                    if pending.strip():
+                        yield pending
+                    pending = ""
+                    try:
+                        send_return()
+                    except (OSError, ValueError):
+                        pass
+            if pending.strip():
+                yield pending
+        finally:
+            if master is not None:
+                os.close(master)
+
+    def estimate(self, progress, start):
+        done = min(1.0, (progress['runs_done'] + progress['complete'] / 100.0) / self.numreps)
+        elapsed = time.time() - start
+        return {'run': progress['run'],
+                'runs': self.numreps,
+                'iteration': progress['iteration'],
+                'score': progress['score'],
+                'fraction': done,
+                'eta': elapsed * (1 - done) / done if done > 0 else None}
+
+    def cancel(self):
+        """
+        Stops Marxan, killing it if it hasn't exited 5 seconds later
+        """
+        self.cancelled = True
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            threading.Timer(5, self.kill).start()
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+
+# ########################## marxan parameter sweep ####################################################################
+
+SweepProgressEvent, EVT_SWEEP_PROGRESS = wx.lib.newevent.NewEvent()
+SweepDoneEvent, EVT_SWEEP_DONE = wx.lib.newevent.NewEvent()
+
+
+class MarxanSweep(threading.Thread):
+    """
+    Runs the Marxan jobs of a parameter sweep in the background, at most 'processes' at a time, and posts
+    EVT_SWEEP_PROGRESS events to 'window' as they finish. The output of each job goes to marxan.log in its directory.
+    EVT_SWEEP_DONE is posted with the summary table (see summarize_sweep) once all jobs have finished.
+    """
+    name = 'sweep'
+    title = 'Parameter Sweep'
+
+    def __init__(self, window, executable, jobs, sweepdir, scenname, processes=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.window = window
+        self.executable = executable
+        self.jobs = jobs
+        self.sweepdir = sweepdir
+        self.scenname = scenname
+        self.processes = processes if processes else max(1, multiprocessing.cpu_count() - 1)
+        self.procs = set()
+        self.lock = threading.Lock()
+        self.cancelled = False
+
+    def run(self):
+        start = time.time()
+        done = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.processes) as pool:
+            futures = {pool.submit(self.run_job, job): job for job in self.jobs}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    futures[future]['returncode'] = future.result()
+                except Exception as e:
+                    print("Error while running Marxan (" + futures[future]['job'] + "): " + str(e))
+                    futures[future]['returncode'] = -1
+                done += 1
+                elapsed = time.time() - start
+                wx.PostEvent(self.window, SweepProgressEvent(done=done, jobs=len(self.jobs),
+                                                             eta=elapsed * (len(self.jobs) - done) / done))
+        summary = None
+        if not self.cancelled:
+            try:
+                summary = summarize_sweep(self.jobs, self.sweepdir, self.scenname)
+            except Exception as e:
+                print("Error while summarizing the parameter sweep: " + str(e))
+        wx.PostEvent(self.window, SweepDoneEvent(cancelled=self.cancelled, summary=summary, knee=None,
+                                                 seconds=time.time() - start))
+
+    def run_job(self, job):
+        """
+        Runs Marxan in the job directory and returns its exit code
+        """
+        jobdir = os.path.join(self.sweepdir, job['job'])
+        with open(os.path.join(jobdir, 'marxan.log'), 'w') as log:
+            with self.lock:
+                if self.cancelled:
+                    return None
+                proc = subprocess.Popen([self.executable, 'input.dat'], cwd=jobdir, stdin=subprocess.PIPE, stdout=log,
+                                        stderr=subprocess.STDOUT,
+                                        creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+                self.procs.add(proc)
+            try:
+                # Marxan waits for 'return' before exiting
+                proc.communicate(b"\n")
+            finally:
+                with self.lock:
+                    self.procs.discard(proc)
+        print("Marxan " + job['job'] + " finished with exit code " + str(proc.returncode))
+        return proc.returncode
+
+    def cancel(self):
+        """
+        Stops the running Marxan jobs and skips the others
+        """
+        with self.lock:
+            self.cancelled = True
+            for proc in self.procs:
+                if proc.poll() is None:
+                    proc.terminate()
+
+
+class BLMCalibration(MarxanSweep):
+    """
+    Finds the BLM at the knee of the cost versus boundary trade-off curve (see trade_off_knee) with a golden-section
+    search on log10(BLM) between 'blm_min' and 'blm_max'. The two ends and the first two interior points are run at
+    the same time, after which each step runs a single Marxan job, until the search interval is narrower than
+    'tolerance' (in log10 units) or 'max_jobs' jobs have been run. The jobs are written from the project's Marxan
+    input file 'inputdat' (see write_sweep_job) and EVT_SWEEP_DONE is posted with the summary table of all the
+    jobs and the BLM at the knee.
+    """
+    name = 'calibration'
+    title = 'BLM Calibration'
+
+    def __init__(self, window, executable, inputdat, inputdir, sweepdir, scenname, blm_min, blm_max, max_jobs=10,
+                 tolerance=0.05, processes=None):
+        MarxanSweep.__init__(self, window, executable, [], sweepdir, scenname, processes)
+        self.inputdat = inputdat
+        self.inputdir = inputdir
+        self.bounds = (numpy.log10(blm_min), numpy.log10(blm_max))
+        self.max_jobs = max(4, max_jobs)
+        self.tolerance = tolerance
+        self.start = time.time()
+
+    def run(self):
+        self.start = time.time()
+        summary = None
+        knee = None
+        try:
+            invphi = (numpy.sqrt(5) - 1) / 2
+            a, b = self.bounds
+            c, d = b - invphi * (b - a), a + invphi * (b - a)
+            points = dict(zip([a, b, c, d], self.evaluate([a, b, c, d])))
+            extremes = (points[a], points[b])
+            score = lambda x: trade_off_knee(points[x][0], points[x][1], extremes)
+            while len(self.jobs) < self.max_jobs and b - a > self.tolerance:
+                if score(c) > score(d):
+                    b, d = d, c
+                    c = b - invphi * (b - a)
+                    points[c] = self.evaluate([c])[0]
+                else:
+                    a, c = c, d
+                    d = a + invphi * (b - a)
+                    points[d] = self.evaluate([d])[0]
+
+            summary = summarize_sweep(self.jobs, self.sweepdir, self.scenname)
+            summary['Knee Score'] = trade_off_knee(summary['Mean Cost'], summary['Mean Boundary'], extremes)
+            summary = summary.sort_values('BLM').reset_index(drop=True)
+            knee = float(summary['BLM'][summary['Knee Score'].idxmax()])
+            print("BLM calibration: the knee of the trade-off curve is at BLM " + str(knee) + " (" +
+                  str(len(self.jobs)) + " Marxan jobs)")
+        except Exception as e:
+            if not self.cancelled:
+                print("Error during the BLM calibration: " + str(e))
+        wx.PostEvent(self.window, SweepDoneEvent(cancelled=self.cancelled, summary=summary, knee=knee,
+                                                 seconds=time.time() - self.start))
+
+    def evaluate(self, log_blms):
+        """
+        Runs Marxan (at the same time) for each log10(BLM) and returns the mean cost and boundary of each
+        """
+        jobs = []
+        for log_blm in log_blms:
+            job = {'job': "job" + "%04d" % (len(self.jobs) + 1), 'BLM': float(10 ** log_blm), 'NUMITNS': None,
+                   'target': None}
+            write_sweep_job(job, self.inputdat, self.inputdir, self.sweepdir)
+            self.jobs.append(job)
+            jobs.append(job)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.processes) as pool:
+            for job, returncode in zip(jobs, pool.map(self.run_job, jobs)):
+                job['returncode'] = returncode
+
+        if self.cancelled:
+            raise Exception("cancelled")
+        summary = summarize_sweep(jobs, self.sweepdir, self.scenname)
+        if not 'Mean Cost' in summary.columns or summary['Mean Cost'].isnull().any():
+            raise Exception("Marxan did not finish successfully, see marxan.log in " + self.sweepdir)
+        elapsed = time.time() - self.start
+        wx.PostEvent(self.window, SweepProgressEvent(done=len(self.jobs), jobs=self.max_jobs,
+                                                     eta=elapsed * (self.max_jobs - len(self.jobs)) / len(self.jobs)))
+        return list(zip(summary['Mean Cost'], summary['Mean Boundary']))
+
+
+# ########################## batch rescaling ###########################################################################
+
+RescaleProgressEvent, EVT_RESCALE_PROGRESS = wx.lib.newevent.NewEvent()
+RescaleDoneEvent, EVT_RESCALE_DONE = wx.lib.newevent.NewEvent()
+
+
+# ########################## post-hoc evaluation #######################################################################
+
+PostHocDoneEvent, EVT_POSTHOC_DONE = wx.lib.newevent.NewEvent()
+
+
+# ########################## project build graph #######################################################################
+
+UpdateProgressEvent, EVT_UPDATE_PROGRESS = wx.lib.newevent.NewEvent()
+UpdateDoneEvent, EVT_UPDATE_DONE = wx.lib.newevent.NewEvent()
+
+
+# ########################## python annealer ###########################################################################
+
+class AnnealerRunner(threading.Thread):
+    """
+    Runs the Python annealer (see run_annealer) in the background and posts the same EVT_MARXAN_PROGRESS and
+    EVT_MARXAN_DONE events as MarxanRunner, so that it is used in place of Marxan. The results are written as Marxan
+    output files, and the best solution and selection frequency are also sent with EVT_MARXAN_DONE. 'tables' are the
+    project's in-memory tables (see read_annealing_problem).
+    """
+    def __init__(self, window, inputdat, processes=None, tables=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.window = window
+        self.inputdat = inputdat
+        self.processes = processes
+        self.tables = tables
+        self.cancelled = False
+
+    def run(self):
+        start = time.time()
+        progress = {'run': 0, 'runs_done': 0, 'iteration': 0, 'complete': 0, 'score': None, 'best_run': None}
+        results = None
+        returncode = 0
+
+        def callback(done, reps, score):
+            elapsed = time.time() - start
+            progress.update({'run': done, 'runs_done': done, 'score': score})
+            wx.PostEvent(self.window, MarxanProgressEvent(run=done, runs=reps, iteration=0, score=score,
+                                                          fraction=done / float(reps),
+                                                          eta=elapsed * (reps - done) / done))
+
+        try:
+            print("Running the Python annealer on " + self.inputdat.filepath)
+            ids, solutions, summary = run_annealer(self.inputdat, self.processes, callback, lambda: self.cancelled,
+                                                   self.tables)
+            if not self.cancelled:
+                best = write_annealer_output(self.inputdat, ids, solutions, summary)
+                progress['best_run'] = best + 1
+                print("Best solution is run " + str(best + 1))
+                results = {'best_solution': solutions[best].tolist(),
+                           'select_freq': solutions[summary['Run_Number'].values - 1].sum(axis=0).tolist()}
+        except Exception as e:
+            print("Error while running the Python annealer: " + str(e))
+            returncode = -1
+        wx.PostEvent(self.window, MarxanDoneEvent(returncode=returncode, cancelled=self.cancelled,
+                                                  progress=progress, seconds=time.time() - start, results=results))
+
+    def cancel(self):
+        """
+        Cancels the replicates which haven't started yet, without waiting for those running
+        """
+        self.cancelled = True
+
+
 # ##########################  run the GUI ##############################################################################
-app = wx.App(False)
 
-# create an object of CalcFrame
-frame = MarxanConnectGUI(None)
-# show the frame
-frame.Show(True)
-# start the applications
-app.MainLoop()
+if __name__ == '__main__':
+    # required by the process pools in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+
+    app = wx.App(False)
 
-# stop the app
-app.Destroy()
+    # create an object of CalcFrame
+    frame = MarxanConnectGUI(None)
+    # note which slow modules were imported while the frame was built (see startup_report), then show the frame
+    frame.loaded_before_show = loaded_heavy_modules()
+    frame.Show(True)
+    # report the startup time once the window is up
+    wx.CallAfter(frame.startup_report)
+    # start the applications
+    app.MainLoop()
 
+    # stop the app
+    app.Destroy()
@@ -0,0 +1,57 @@
+"""
+Compares the Python annealer (MarxanConnectEngine.anneal) with Marxan on the tutorial data.
+
+The objective of the annealer is first checked against the scores Marxan reported for its own solutions, then the
+annealer is run on the same problem and the summary of its replicates is compared with Marxan's summary file.
+
+usage: python benchmarks/annealer.py [--reps 10] [--processes 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+import MarxanConnectEngine
+
+tutorial = os.path.join(root, 'docs', 'tutorial', 'CF_demographic', 'input_connect.dat')
+columns = ['Score', 'Cost', 'Planning_Units', 'Connectivity', 'Shortfall', 'Missing_Values']
+
+
+def check_objective(inputdat, problem, settings, reps=5):
+    print("Objective of Marxan's solutions (Marxan / Python annealer)")
+    marxan = MarxanConnectEngine.marxanconpy.read_csv_tsv(inputdat.output_file('_sum.txt'))
+    for rep in range(1, reps + 1):
+        solution = MarxanConnectEngine.marxanconpy.read_csv_tsv(inputdat.output_file("_r" + "%05d" % rep + ".txt"))
+        x = pandas.Series(solution.iloc[:, 1].values, index=solution.iloc[:, 0].values)[problem['ids']].values
+        summary = MarxanConnectEngine.solution_summary(problem, x, settings['BLM'], settings['MISSLEVEL'])
+        print("  run " + str(rep) + ": score " + str(marxan['Score'][rep - 1]) + " / " +
+              str(round(summary['Score'], 4)) + ", connectivity " + str(marxan['Connectivity'][rep - 1]) + " / " +
+              str(summary['Connectivity']))
+
+
+def compare(inputdat, reps, processes):
+    marxan = MarxanConnectEngine.marxanconpy.read_csv_tsv(inputdat.output_file('_sum.txt'))
+    inputdat = inputdat.copy()
+    inputdat.set('NUMREPS', reps)
+    start = time.time()
+    ids, solutions, summary = MarxanConnectEngine.run_annealer(inputdat, processes=processes)
+    print("Python annealer: " + str(reps) + " replicates in " + str(round(time.time() - start, 1)) + " seconds")
+    print(pandas.DataFrame({'Marxan (' + str(len(marxan)) + ' runs)': marxan[columns].mean(),
+                            'Python annealer (' + str(reps) + ' runs)': summary[columns].mean()}).round(2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares the Python annealer with Marxan")
+    parser.add_argument('--reps', type=int, default=10)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    inputdat = MarxanConnectEngine.read_marxan_input(tutorial)
+    problem = MarxanConnectEngine.read_annealing_problem(inputdat)
+    settings = MarxanConnectEngine.annealer_settings(inputdat)
+    check_objective(inputdat, problem, settings)
+    compare(inputdat, args.reps, args.processes)
@@ -0,0 +1,87 @@
+"""
+Benchmarks the landscape connectivity engines (MarxanConnectEngine.habitatresistance2conmats_euclidean and
+MarxanConnectEngine.habitatresistance2conmats_lcp).
+
+Both engines are checked against marxanconpy.spatial.habitatresistance2conmats, in its "Euclidean Distance" and
+"Least-Cost Path" modes, on the CF_landscape tutorial (with a random resistance matrix for the least-cost paths), and
+the time each takes is printed. marxanconpy returns its connectivity as JSON, with 10 decimals, so the values are
+compared to 1e-10.
+
+usage: python benchmarks/landscape.py [--buff 1] [--seed 0] [--processes 4]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+import pandas
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+import MarxanConnectEngine
+
+tutorial = os.path.join(root, 'docs', 'tutorial', 'CF_landscape')
+pu_filepath, pu_id = os.path.join(tutorial, 'reefs.shp'), 'pu_id'
+hab_filepath, hab_id = os.path.join(tutorial, 'bioregion_short.shp'), 'shrt_lb'
+
+
+def random_resistance(filepath, seed):
+    """
+    Writes a resistance matrix between the habitats of the tutorial, with resistances between 0.5 and 5
+    """
+    habitats = sorted(MarxanConnectEngine.gpd.GeoDataFrame.from_file(hab_filepath)[hab_id].astype('str').unique())
+    rng = numpy.random.RandomState(seed)
+    pandas.DataFrame(rng.uniform(0.5, 5, (len(habitats), len(habitats))), index=habitats,
+                     columns=habitats).to_csv(filepath)
+
+
+def compare(name, reference, conmat):
+    """
+    Prints whether the connections above 0 of marxanconpy ('reference', as JSON) and of an engine are the same
+    """
+    reference = pandas.read_json(io.StringIO(reference), orient='split')
+    keys = ['habitat', 'id1', 'id2']
+    for table in [reference, conmat]:
+        for key in keys:
+            table[key] = table[key].astype('str')
+    reference = reference[reference['value'] > 0]
+    both = reference.merge(conmat, on=keys, how='outer', suffixes=('_reference', '_engine')).fillna(0)
+    difference = (both['value_reference'] - both['value_engine']).abs().max() if len(both) > 0 else 0
+    print("  " + name + ": " + str(len(reference)) + " / " + str(len(conmat)) + " connections (marxanconpy / engine), "
+          "largest difference " + str(difference) + ", same: " + str(bool(difference < 1e-10)))
+
+
+def check_tutorial(buff, seed, processes):
+    print("Equivalence with marxanconpy on CF_landscape (buffer " + str(buff) + ")")
+    with tempfile.TemporaryDirectory(prefix='marxanconnect_landscape_') as workdir:
+        res_mat_filepath = os.path.join(workdir, 'resistance.csv')
+        random_resistance(res_mat_filepath, seed)
+        for mode in ["Euclidean Distance", "Least-Cost Path"]:
+            start = time.time()
+            reference = MarxanConnectEngine.marxanconpy.spatial.habitatresistance2conmats(
+                buff, hab_filepath, hab_id, res_mat_filepath, pu_filepath, pu_id, mode)
+            seconds = time.time() - start
+            start = time.time()
+            if mode == "Euclidean Distance":
+                conmat = MarxanConnectEngine.habitatresistance2conmats_euclidean(buff, hab_filepath, hab_id,
+                                                                                 pu_filepath, pu_id,
+                                                                                 processes=processes)
+            else:
+                conmat = MarxanConnectEngine.habitatresistance2conmats_lcp(buff, hab_filepath, hab_id, res_mat_filepath,
+                                                                           pu_filepath, pu_id, processes=processes)
+            compare(mode, reference, conmat)
+            print("  " + mode + ": " + str(round(seconds, 2)) + " seconds (marxanconpy), " +
+                  str(round(time.time() - start, 2)) + " seconds (engine)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the landscape connectivity engines")
+    parser.add_argument('--buff', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    check_tutorial(args.buff, args.seed, args.processes)
@@ -0,0 +1,108 @@
+"""
+Benchmarks the minimum planning graph boundary (MarxanConnectEngine.min_plan_graph).
+
+The sparse Kruskal and Boruvka trees are first checked against the minimum spanning tree of the dense matrix and
+against marxanconpy's graph of the connectivity (with igraph's minimum spanning tree, as marxanconpy has no minimum
+planning graph of its own) on the tutorial connectivity matrices, then both methods are timed on synthetic graphs.
+
+usage: python benchmarks/min_plan_graph.py [--nodes 100000] [--degree 8] [--seed 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy
+import pandas
+import scipy.sparse
+import scipy.sparse.csgraph
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+import MarxanConnectEngine
+
+tutorials = [(os.path.join('docs', 'tutorial', 'CSD_demographic', 'reefFlow.csv'), "Matrix"),
+             (os.path.join('docs', 'tutorial', 'CF_demographic', 'hexFlow.csv'), "Matrix"),
+             (os.path.join('docs', 'tutorial', 'CF_landscape', 'IsolationByDistance.csv'), "Edge List with Habitat")]
+
+
+def tree_edges(tree):
+    tree = tree.tocoo()
+    return set(zip(numpy.minimum(tree.row, tree.col), numpy.maximum(tree.row, tree.col)))
+
+
+def dense_tree(conmat):
+    strength = numpy.triu((conmat + conmat.T).toarray(), 1)
+    distance = numpy.zeros_like(strength)
+    distance[strength > 0] = 1.0 / strength[strength > 0]
+    return scipy.sparse.csgraph.minimum_spanning_tree(distance)
+
+
+def marxanconpy_tree(filepath, matrixformat, ids):
+    """
+    Returns the edges (by planning unit index) and total weight of the minimum spanning tree of marxanconpy's graph of
+    the connectivity (marxanconpy.manipulation.connectivity2graph), averaged over the habitats listed for each pair as
+    marxanconpy does (like MarxanConnectEngine.boundary_conmat) and made undirected by adding both directions, with
+    igraph's spanning tree of 1/connectivity
+    """
+    if matrixformat == "Matrix":
+        connectivity = pandas.read_csv(filepath, index_col=0)
+    else:
+        connectivity = pandas.read_csv(filepath).groupby(['id1', 'id2'])['value'].mean().reset_index()
+        connectivity = connectivity[connectivity['value'] > 0]
+        matrixformat = "Edge List"
+    graph = MarxanConnectEngine.marxanconpy.manipulation.connectivity2graph(connectivity, matrixformat, ids)
+    graph.to_undirected(mode='collapse', combine_edges='sum')
+    graph.delete_edges([edge.index for edge in graph.es if edge['weight'] <= 0 or edge.source == edge.target])
+    tree = graph.spanning_tree(weights=[1 / weight for weight in graph.es['weight']])
+    return (set((min(edge.source, edge.target), max(edge.source, edge.target)) for edge in tree.es),
+            sum(1 / weight for weight in tree.es['weight']))
+
+
+def check_tutorials():
+    print("Equivalence with the dense minimum spanning tree and with marxanconpy's graph")
+    for filepath, matrixformat in tutorials:
+        ids, conmat = MarxanConnectEngine.boundary_conmat(os.path.join(root, filepath), matrixformat)
+        dense = dense_tree(conmat)
+        reference_edges, reference_weight = marxanconpy_tree(os.path.join(root, filepath), matrixformat, ids)
+        for method in ["Kruskal", "Boruvka"]:
+            tree = MarxanConnectEngine.min_plan_graph(conmat, method=method)
+            same_weight = numpy.isclose((1.0 / tree.data).sum(), dense.sum())
+            same_edges = tree_edges(tree) == tree_edges(dense)
+            print("  " + filepath + " " + method + ": " + str(tree.nnz) + " edges, same total weight: " +
+                  str(same_weight) + ", same edges: " + str(same_edges))
+            same_weight = numpy.isclose((1.0 / tree.data).sum(), reference_weight)
+            same_edges = tree_edges(tree) == reference_edges
+            print("    marxanconpy: " + str(len(reference_edges)) + " edges, same total weight: " +
+                  str(same_weight) + ", same edges: " + str(same_edges))
+
+
+def synthetic(nodes, degree, seed):
+    random = numpy.random.RandomState(seed)
+    rows = numpy.repeat(numpy.arange(nodes), degree)
+    cols = (rows + random.randint(1, nodes, size=len(rows))) % nodes
+    return scipy.sparse.csr_matrix((random.uniform(size=len(rows)), (rows, cols)), shape=(nodes, nodes))
+
+
+def time_synthetic(nodes, degree, seed):
+    conmat = synthetic(nodes, degree, seed)
+    print("Synthetic graph: " + str(nodes) + " nodes, " + str(conmat.nnz) + " connections")
+    trees = {}
+    for method in ["Kruskal", "Boruvka"]:
+        start = time.time()
+        trees[method] = MarxanConnectEngine.min_plan_graph(conmat, method=method)
+        print("  " + method + ": " + str(round(time.time() - start, 3)) + " seconds, " +
+              str(trees[method].nnz) + " edges")
+    print("  same total weight: " + str(numpy.isclose((1.0 / trees["Kruskal"].data).sum(),
+                                                      (1.0 / trees["Boruvka"].data).sum())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the minimum planning graph boundary")
+    parser.add_argument('--nodes', type=int, default=100000)
+    parser.add_argument('--degree', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_tutorials()
+    time_synthetic(args.nodes, args.degree, args.seed)
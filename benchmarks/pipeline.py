@@ -0,0 +1,368 @@
+"""
+Benchmarks the stages of the Marxan Connect pipeline, without the GUI, on the tutorial projects and on synthetic grids
+(hexagonal grids of planning units connected by an edge list, see synthetic.py).
+
+The stages are: load_project, rescale_matrix, habitatresistance2conmats (Euclidean distance),
+habitatresistance2conmats_lcp (least-cost paths, with a random resistance matrix), calc_metrics, export (conservation
+feature and boundary files) and post-hoc. Stages which do not apply to a project (e.g. rescaling without connectivity
+units) are skipped. Each project runs in its own process, so the peak memory (RSS) recorded after each stage is that of
+the project alone.
+
+The results are appended to a JSON history. A stage is flagged as a regression when its time or peak memory exceeds
+the median of its last runs on the same machine by more than the tolerance, and the script then exits with status 1.
+The largest synthetic grid (1,000,000 units) needs several GB of memory; a project which fails is reported as such.
+
+usage: python benchmarks/pipeline.py [--projects CF_demographic,synthetic_10000] [--sizes 10000,100000,1000000]
+                                     [--history benchmarks/pipeline_history.json] [--tolerance 1.25] [--baseline 5]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy
+import pandas
+import scipy.sparse
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+stages = ['load_project', 'rescale_matrix', 'habitatresistance2conmats', 'habitatresistance2conmats_lcp',
+          'calc_metrics', 'export', 'post-hoc']
+
+tutorial = os.path.join(root, 'docs', 'tutorial')
+tutorials = {
+    'CF_demographic': {'dir': 'CF_demographic', 'project': 'tutorial.MarCon', 'type': 'demo',
+                       'pu': 'hex_planning_units.shp', 'pu_id': 'FID',
+                       'cu': 'hex_planning_units.shp', 'cu_id': 'FID',
+                       'conmat': 'hexFlow.csv', 'format': "Matrix"},
+    'CF_landscape': {'dir': 'CF_landscape', 'project': 'tutorial.MarCon', 'type': 'land',
+                     'pu': 'reefs.shp', 'pu_id': 'pu_id',
+                     'habitat': 'bioregion_short.shp', 'habitat_id': 'shrt_lb',
+                     'conmat': 'IsolationByDistance.csv', 'format': "Edge List with Habitat"},
+    'CSD_demographic': {'dir': 'CSD_demographic', 'project': 'tutorial.MarCon', 'type': 'demo',
+                        'pu': 'reefs.shp', 'pu_id': 'pu_id',
+                        'conmat': 'reefFlow.csv', 'format': "Matrix"},
+    'CSD_landscape': {'dir': 'CSD_landscape', 'type': 'land',
+                      'pu': 'hex_planning_units.shp', 'pu_id': 'FID',
+                      'habitat': 'bioregion_short.shp', 'habitat_id': 'shrt_lb'},
+    'targets': {'dir': 'targets', 'project': 'targettradeoff.MarCon', 'type': 'demo',
+                'pu': 'reefs.shp', 'pu_id': 'pu_id',
+                'conmat': 'reefFlow.csv', 'format': "Matrix"},
+}
+
+# metrics calculated by the calc_metrics stage
+metrics = {'demo': ['in_degree', 'out_degree', 'between_cent', 'eig_vect_cent', 'google', 'self_recruit',
+                    'local_retention', 'outflow', 'inflow'],
+           'land': ['in_degree', 'out_degree', 'between_cent', 'eig_vect_cent', 'google']}
+
+
+class Skip(Exception):
+    pass
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of this process (and of the processes it started) in MB, or None if unknown
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except (ImportError, AttributeError):
+            return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def project_spec(name, workdir):
+    """
+    Returns the files and settings of a tutorial project or a synthetic grid ('synthetic_<units>')
+    """
+    if name.startswith('synthetic_'):
+        units = int(name.split('_')[1])
+        conmat = os.path.join(workdir, name + '.csv')
+        start = time.time()
+        grid = synthetic.hex_grid(units)
+        synthetic.write_conmat(conmat, grid, "Edge List", radius=2)
+        print("synthetic grid of " + str(units) + " units written in " + str(round(time.time() - start, 1)) +
+              " seconds")
+        return {'dir': workdir, 'type': 'demo', 'units': units, 'columns': grid['columns'], 'rows': grid['rows'],
+                'conmat': conmat,
+                'format': "Edge List"}
+    spec = dict(tutorials[name])
+    spec['dir'] = os.path.join(tutorial, spec['dir'])
+    for k in ['project', 'pu', 'cu', 'habitat', 'conmat']:
+        if k in spec:
+            spec[k] = os.path.join(spec['dir'], spec[k])
+    return spec
+
+
+def load_project(state):
+    spec = state['spec']
+    if 'pu' in spec:
+        state['pu_ids'] = MarxanConnectEngine.conmat_id_strings(
+            MarxanConnectEngine.gpd.GeoDataFrame.from_file(spec['pu'])[spec['pu_id']])
+    if 'conmat' in spec:
+        state['ids'], state['conmats'] = MarxanConnectEngine.read_conmat_sparse(spec['conmat'], spec['format'])
+        if 'pu_ids' not in state:
+            state['pu_ids'] = state['ids']
+    if 'project' in spec:
+        project = MarxanConnectEngine.marxanconpy.marcon.load_project(spec['project'])
+        MarxanConnectEngine.marxanconpy.marcon.validate_project(project)
+        state['project'] = MarxanConnectEngine.marxanconpy.marcon.edit_working_directory(project, spec['dir'],
+                                                                                          "absolute")
+    else:
+        state['project'] = MarxanConnectEngine.marxanconpy.marcon.new_project(root)
+
+
+def rescale_matrix(state):
+    spec = state['spec']
+    if 'cu' in spec:
+        report = MarxanConnectEngine.batch_rescale_matrices([spec['conmat']], state['workdir'], spec['pu'],
+                                                            spec['pu_id'], spec['cu'], spec['cu_id'],
+                                                            matrixformat=spec['format'], processes=1)
+        if not (report['status'] == 'ok').all():
+            raise Exception(report['status'][0])
+    elif 'units' in spec:
+        # planning units of 2 x 2 hexagons of the synthetic grid
+        cells = state['ids'].astype('int') - 1
+        pu = (cells // spec['columns'] // 2) * ((spec['columns'] + 1) // 2) + (cells % spec['columns']) // 2
+        weights = scipy.sparse.csr_matrix((numpy.ones(len(cells)), (numpy.arange(len(cells)), pu)))
+        for key, conmat in state['conmats'].items():
+            (weights.T @ conmat @ weights).tocsr()
+    else:
+        raise Skip()
+
+
+def habitatresistance2conmats(state):
+    spec = state['spec']
+    if 'habitat' not in spec:
+        raise Skip()
+    conmat = MarxanConnectEngine.habitatresistance2conmats_euclidean(buff=1, hab_filepath=spec['habitat'],
+                                                                     hab_id=spec['habitat_id'], pu_filepath=spec['pu'],
+                                                                     pu_id=spec['pu_id'])
+    if 'conmat' not in spec:
+        spec['conmat'] = os.path.join(state['workdir'], 'land_pu_conmat.csv')
+        spec['format'] = "Edge List with Habitat"
+        conmat.to_csv(spec['conmat'], index=False)
+
+
+def habitatresistance2conmats_lcp(state, seed=0):
+    spec = state['spec']
+    if 'habitat' not in spec:
+        raise Skip()
+    habitats = sorted(MarxanConnectEngine.gpd.GeoDataFrame.from_file(spec['habitat'])[spec['habitat_id']]
+                      .astype('str').unique())
+    rng = numpy.random.RandomState(seed)
+    res_mat_filepath = os.path.join(state['workdir'], 'resistance.csv')
+    pandas.DataFrame(rng.uniform(0.5, 5, (len(habitats), len(habitats))), index=habitats,
+                     columns=habitats).to_csv(res_mat_filepath)
+    MarxanConnectEngine.habitatresistance2conmats_lcp(buff=1, hab_filepath=spec['habitat'], hab_id=spec['habitat_id'],
+                                                      res_mat_filepath=res_mat_filepath, pu_filepath=spec['pu'],
+                                                      pu_id=spec['pu_id'])
+
+
+def calc_metrics(state):
+    spec = state['spec']
+    if 'pu' not in spec or 'conmat' not in spec:
+        raise Skip()
+    project = state['project']
+    type = spec['type']
+    project['filepaths']['pu_filepath'] = spec['pu']
+    project['filepaths']['pu_file_pu_id'] = spec['pu_id']
+    project['filepaths'][type + '_pu_cm_filepath'] = spec['conmat']
+    if type == 'demo':
+        project['options']['demo_conmat_format'] = spec['format']
+    for t in ['demo', 'land']:
+        for metric in project['options'][t + '_metrics']:
+            project['options'][t + '_metrics'][metric] = t == type and metric in metrics[type]
+    MarxanConnectEngine.marxanconpy.manipulation.calc_metrics(project=project, progressbar=False, calc_metrics_pu=True,
+                                                              calc_metrics_cu=False)
+
+
+def export(state):
+    spec = state['spec']
+    if 'conmat' not in spec:
+        raise Skip()
+    bd_filepath = os.path.join(state['workdir'], 'bound.dat')
+    jobs = {bd_filepath: lambda: MarxanConnectEngine.export_boundary(bd_filepath, {'filepath': spec['conmat'],
+                                                                                   'format': spec['format'],
+                                                                                   'metric': 'conn_boundary'})}
+    cf = {}
+    for type in ['spec_demo_pu', 'spec_land_pu']:
+        cf.update(state['project'].get('connectivityMetrics', {}).get(type, {}))
+    if len(cf) > 0:
+        cf = pandas.DataFrame(cf)
+        cf['pu'] = state['pu_ids']
+        cf = cf.melt(id_vars=['pu'], var_name='name', value_name='amount')
+        cf['species'] = pandas.factorize(cf['name'])[0] + 1
+        jobs[os.path.join(state['workdir'], 'puvspr.dat')] = cf[cf['amount'] > 0][['species', 'pu', 'amount']]
+    MarxanConnectEngine.write_marxan_files(jobs)
+
+
+def posthoc(state, replicates=10, seed=0):
+    spec = state['spec']
+    if 'conmat' not in spec:
+        raise Skip()
+    solutions = sorted(f for f in os.listdir(os.path.join(spec['dir'], 'output')) if '_r0' in f) \
+        if os.path.isdir(os.path.join(spec['dir'], 'output')) else []
+    selections = {}
+    if len(solutions) > 0:
+        for f in solutions[:replicates]:
+            solution = MarxanConnectEngine.marxanconpy.read_csv_tsv(os.path.join(spec['dir'], 'output', f))
+            selections[f] = solution[(solution.iloc[:, 1].astype("str") == "1").values].iloc[:, 0].values
+        IDs = solution.iloc[:, 0].values
+    elif 'units' in spec:
+        # solutions covering 30% of the synthetic grid in one clump at a random position
+        rng = numpy.random.RandomState(seed)
+        IDs = state['ids']
+        cells = IDs.astype('int') - 1
+        x, y = cells % spec['columns'], cells // spec['columns']
+        width, height = int(spec['columns'] * numpy.sqrt(0.3)), int(spec['rows'] * numpy.sqrt(0.3))
+        for r in range(replicates):
+            x0 = rng.randint(0, spec['columns'] - width + 1)
+            y0 = rng.randint(0, spec['rows'] - height + 1)
+            selections['r' + str(r + 1)] = IDs[(x >= x0) & (x < x0 + width) & (y >= y0) & (y < y0 + height)]
+    else:
+        raise Skip()
+    # the size and spacing metrics need the planning units of the solutions (there are none for synthetic grids)
+    pu = None
+    if len(solutions) > 0 and 'pu' in spec:
+        pu = MarxanConnectEngine.gpd.GeoDataFrame.from_file(spec['pu']).to_crs(
+            '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs')
+    MarxanConnectEngine.calc_postHoc_replicates(spec['conmat'], spec['format'], IDs=IDs, selections=selections, pu=pu)
+
+
+functions = dict(zip(stages, [load_project, rescale_matrix, habitatresistance2conmats, habitatresistance2conmats_lcp,
+                              calc_metrics, export, posthoc]))
+
+
+def run_project(name, output):
+    """
+    Runs every stage on one project (in this process) and writes the timings to 'output'
+    """
+    workdir = tempfile.mkdtemp(prefix='marxanconnect_' + name + '_')
+    try:
+        state = {'workdir': workdir, 'spec': project_spec(name, workdir)}
+        os.chdir(state['spec']['dir'])
+        results = []
+        for stage in stages:
+            start = time.time()
+            try:
+                functions[stage](state)
+                status = 'ok'
+            except Skip:
+                status = 'skipped'
+            except Exception as e:
+                status = repr(e)
+            results.append({'project': name, 'stage': stage, 'status': status,
+                            'seconds': time.time() - start if status == 'ok' else None,
+                            'peak_rss_mb': peak_rss_mb()})
+            print(name + " " + stage + ": " + status + " (" + str(round(time.time() - start, 2)) + " seconds)")
+    finally:
+        os.chdir(root)
+        shutil.rmtree(workdir, ignore_errors=True)
+    with open(output, 'w') as file:
+        json.dump(results, file)
+
+
+def regressions(history, results, tolerance, baseline):
+    """
+    Compares the results with the median of the last 'baseline' runs of each stage on this machine. Returns the rows
+    of the results which are slower or use more memory than 'tolerance' times that median
+    """
+    previous = [pandas.DataFrame(run['results']).assign(run=i) for i, run in enumerate(history)
+                if run['machine'] == machine()]
+    if len(previous) == 0:
+        return pandas.DataFrame()
+    previous = pandas.concat(previous)
+    previous = previous[previous['status'] == 'ok'].sort_values('run').groupby(['project', 'stage']).tail(baseline)
+    medians = previous.groupby(['project', 'stage'])[['seconds', 'peak_rss_mb']].median()
+    results = results.join(medians, on=['project', 'stage'], rsuffix='_baseline')
+    slower = (results['seconds'] > tolerance * results['seconds_baseline']) & \
+             (results['seconds'] - results['seconds_baseline'] > 0.1)
+    larger = (results['peak_rss_mb'] > tolerance * results['peak_rss_mb_baseline'])
+    return results[(results['status'] == 'ok') & (slower | larger)]
+
+
+def machine():
+    return platform.node() + " (" + platform.platform() + ", " + str(os.cpu_count()) + " CPUs)"
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the Marxan Connect pipeline stages")
+    parser.add_argument('--projects', default=None, help="comma separated tutorial and synthetic projects "
+                                                         "(default: all tutorials and --sizes)")
+    parser.add_argument('--sizes', default="10000,100000,1000000", help="units of the synthetic grids")
+    parser.add_argument('--history', default=os.path.join(root, 'benchmarks', 'pipeline_history.json'))
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--baseline', type=int, default=5, help="number of previous runs compared with")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--output', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # only the processes running the stages import the engines (and the generator, which uses them). marxanconpy,
+        # which calculates the metrics, still imports wx.
+        import MarxanConnectEngine
+        import synthetic
+        run_project(args.child, args.output)
+        sys.exit(0)
+
+    if args.projects:
+        projects = args.projects.split(',')
+    else:
+        projects = list(tutorials) + ['synthetic_' + s for s in args.sizes.split(',') if s]
+
+    results = []
+    for name in projects:
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        output.close()
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, '--output', output.name],
+                           check=True)
+            with open(output.name) as file:
+                results += json.load(file)
+        except (subprocess.CalledProcessError, ValueError):
+            print(name + ": failed")
+        finally:
+            os.remove(output.name)
+    results = pandas.DataFrame(results, columns=['project', 'stage', 'status', 'seconds', 'peak_rss_mb'])
+    print(results.round(2).to_string(index=False))
+
+    history = []
+    if os.path.isfile(args.history):
+        with open(args.history) as file:
+            history = json.load(file)
+    flagged = regressions(history, results, args.tolerance, args.baseline)
+    history.append({'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'commit': commit(),
+                    'machine': machine(),
+                    'results': json.loads(results.to_json(orient='records'))})
+    with open(args.history, 'w') as file:
+        json.dump(history, file, indent=1)
+    print("Results added to " + args.history)
+
+    if len(flagged) > 0:
+        print("Regressions (more than " + str(args.tolerance) + " times the median of the last " + str(args.baseline) +
+              " runs):")
+        print(flagged.round(2).to_string(index=False))
+        sys.exit(1)
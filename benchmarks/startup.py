@@ -0,0 +1,112 @@
+"""
+Benchmarks the start of the GUI: the time from launching it to its first window, from source and from a frozen
+(PyInstaller) build.
+
+Each run launches the GUI with MARXANCONNECT_STARTUP_REPORT set, which makes it write its own timings to a file and
+close once the window is up (see MarxanConnectGUI.startup_report). The time before the first line of
+MarxanConnectGUI.py runs is the interpreter start (and, for frozen builds, unpacking the bundle). Per-module import
+timings are read from Python's '-X importtime' output (PYTHONPROFILEIMPORTTIME for frozen builds, which is only
+available if the bundle keeps stderr).
+
+usage: python benchmarks/startup.py [--runs 5] [--frozen dist/MarxanConnect/MarxanConnectGUI] [--top 15]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import time:       self [us] |  cumulative | imported package
+importtime_line = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr):
+    """
+    Returns the self and cumulative import time (in seconds) of each module and whether it was imported by
+    MarxanConnectGUI.py itself (top level) rather than by another module
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = importtime_line.match(line)
+        if match:
+            modules.append({'module': match.group(4),
+                            'self': int(match.group(1)) / 1e6,
+                            'cumulative': int(match.group(2)) / 1e6,
+                            'top level': len(match.group(3)) <= 1})
+    return pandas.DataFrame(modules, columns=['module', 'self', 'cumulative', 'top level'])
+
+
+def launch(command, env, timeout=300):
+    """
+    Starts the GUI once and returns its timings (in seconds) and the per-module import timings
+    """
+    report = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+    report.close()
+    env = dict(os.environ, MARXANCONNECT_STARTUP_REPORT=report.name, **env)
+    start = time.time()
+    process = subprocess.run(command, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                             timeout=timeout)
+    wall = time.time() - start
+    try:
+        with open(report.name) as file:
+            timings = json.load(file)
+    except ValueError:
+        raise Exception("The GUI closed (exit code " + str(process.returncode) + ") without reporting its startup:\n" +
+                        process.stderr.decode('utf8', 'replace')[-2000:])
+    finally:
+        os.remove(report.name)
+    if timings.get('loaded_before_show'):
+        print("  warning: imported before the window was shown: " + ", ".join(timings['loaded_before_show']))
+    return {'interpreter': timings['startup'] - start,
+            'imports': timings['imports'],
+            'first window': timings['window'] - start,
+            'exit': wall}, parse_importtime(process.stderr.decode('utf8', 'replace'))
+
+
+def benchmark(name, command, env, runs, top):
+    print(name + ": " + " ".join(command))
+    timings = []
+    imports = []
+    for run in range(runs):
+        t, modules = launch(command, env)
+        timings.append(t)
+        imports.append(modules)
+        print("  run " + str(run + 1) + ": first window after " + str(round(t['first window'], 2)) + " seconds")
+    timings = pandas.DataFrame(timings)
+    print(pandas.DataFrame({'median': timings.median(), 'min': timings.min(), 'max': timings.max()}).round(3))
+
+    imports = pandas.concat(imports)
+    if len(imports) == 0:
+        print("  no per-module import timings (stderr is not available)")
+    else:
+        modules = imports.groupby('module').agg({'self': 'median', 'cumulative': 'median', 'top level': 'max'})
+        print("Slowest imports of MarxanConnectGUI.py (median seconds, including the modules they import)")
+        print(modules[modules['top level']].sort_values('cumulative', ascending=False)
+              [['cumulative', 'self']].head(top).round(3))
+        print("Slowest modules (median seconds, excluding the modules they import)")
+        print(modules.sort_values('self', ascending=False)[['self']].head(top).round(3))
+    print("")
+    return timings.median()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the time from launching the GUI to its first window")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--frozen', default=None, help="path to the PyInstaller executable, e.g. "
+                                                       "dist/MarxanConnect/MarxanConnectGUI")
+    parser.add_argument('--top', type=int, default=15, help="number of modules listed")
+    args = parser.parse_args()
+
+    results = {'source': benchmark("source", [sys.executable, '-X', 'importtime', 'MarxanConnectGUI.py'], {},
+                                   args.runs, args.top)}
+    if args.frozen:
+        results['frozen'] = benchmark("frozen", [os.path.abspath(args.frozen)], {'PYTHONPROFILEIMPORTTIME': '1'},
+                                      args.runs, args.top)
+    print(pandas.DataFrame(results).round(3))
@@ -0,0 +1,320 @@
+"""
+Generates synthetic Marxan Connect projects of any size, for benchmarks and stress tests which can run anywhere
+without proprietary data.
+
+A project is a grid of hexagonal planning units (like hex_planning_units.shp in the tutorial) with conservation
+features, connectivity matrices in each of the supported formats (Matrix, Edge List, Edge List with Type and Edge List
+with Time), focus and avoidance areas, the original Marxan input files and a .MarCon project which uses them.
+
+Connectivity decays exponentially with distance and is cut off at 'radius' hexagons, so that each row of the matrices
+has a few dozen connections as in hexFlow.csv. The values are probabilities: a planning unit in the interior of the
+grid sends about all of its larvae to the units around it, those on the edges lose some. The "Matrix" format is dense
+and is only written for grids of up to --max-matrix-units units.
+
+usage: python benchmarks/synthetic.py OUTDIR [--units 10000] [--radius 3] [--features 10] [--extent 1000000]
+                                             [--formats "Matrix,Edge List,Edge List with Type,Edge List with Time"]
+                                             [--max-matrix-units 10000] [--seed 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy
+import pandas
+import scipy.sparse
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+import MarxanConnectEngine
+
+formats = ["Matrix", "Edge List", "Edge List with Type", "Edge List with Time"]
+filenames = {"Matrix": 'conmat_matrix.csv',
+             "Edge List": 'conmat_edge_list.csv',
+             "Edge List with Type": 'conmat_type.csv',
+             "Edge List with Time": 'conmat_time.csv'}
+
+# the matrices of the "Edge List with Type" format (distance decay, in hexagon widths) and of the "Edge List with
+# Time" format (the year to year variation of the connectivity)
+types = {'short': 1.0, 'long': 2.0}
+times = [1, 2, 3]
+
+# Web Mercator, with the grid starting where the tutorial's planning units are
+crs = 'EPSG:3857'
+origin = (15982954.0, -2260781.0)
+
+
+def hex_grid(units, extent=1000000.0):
+    """
+    Returns the planning unit IDs, the centres of the hexagons and their radius (in m) of a grid of 'units' pointy
+    topped hexagons covering a square about 'extent' m wide. Unit k (ID k + 1) is in row k // columns and column
+    k % columns; odd rows are shifted by half a hexagon.
+    """
+    columns = int(numpy.ceil(numpy.sqrt(units * numpy.sqrt(3) / 2)))
+    size = extent / (columns * numpy.sqrt(3))
+    k = numpy.arange(units)
+    row, column = k // columns, k % columns
+    return {'units': units, 'columns': columns, 'rows': int(numpy.ceil(units / columns)), 'size': size,
+            'ids': k + 1, 'row': row, 'column': column,
+            'x': origin[0] + (column + 0.5 * (row % 2)) * numpy.sqrt(3) * size,
+            'y': origin[1] + row * 1.5 * size}
+
+
+def hex_offsets(radius):
+    """
+    Returns the offsets (parity of the row, rows, columns and distance in hexagon widths) of the hexagons within
+    'radius' hexagon widths of a hexagon in an even or odd row, including itself
+    """
+    offsets = []
+    for parity in (0, 1):
+        for dr in range(-radius, radius + 1):
+            for dc in range(-radius - 1, radius + 2):
+                distance = numpy.hypot(dc + 0.5 * ((parity + dr) % 2 - parity), dr * numpy.sqrt(3) / 2)
+                if distance <= radius + 1e-9:
+                    offsets.append((parity, dr, dc, distance))
+    return offsets
+
+
+def grid_edges(grid, radius):
+    """
+    Yields the indices of the pairs of hexagons at each distance within 'radius' (source, target, distance), one
+    offset at a time so that the edges of the largest grids are never all in memory
+    """
+    for parity, dr, dc, distance in hex_offsets(radius):
+        row, column = grid['row'] + dr, grid['column'] + dc
+        target = row * grid['columns'] + column
+        keep = (grid['row'] % 2 == parity) & (row >= 0) & (column >= 0) & (column < grid['columns']) & \
+               (target < grid['units'])
+        yield numpy.flatnonzero(keep), target[keep], distance
+
+
+def connectivity(distance, scale, total, rng, n):
+    """
+    Returns 'n' connection probabilities at 'distance': exponential decay, normalized by the sum over the whole
+    neighbourhood ('total'), with +/- 50% noise
+    """
+    return numpy.exp(-distance / scale) / total * rng.uniform(0.5, 1.5, n)
+
+
+def write_conmat(filepath, grid, matrixformat, radius=3, seed=0, chunksize=1000):
+    """
+    Writes a synthetic connectivity matrix between the hexagons of 'grid' in one of the formats. Returns the number of
+    connections written.
+    """
+    rng = numpy.random.RandomState(seed)
+    offsets = hex_offsets(radius)
+    if matrixformat == "Edge List with Type":
+        group, matrices = 'type', types
+    elif matrixformat == "Edge List with Time":
+        group, matrices = 'time', dict((t, 1.5) for t in times)
+    else:
+        group, matrices = None, {None: 1.5}
+
+    connections = 0
+    if matrixformat == "Matrix":
+        scale = matrices[None]
+        total = sum(numpy.exp(-d / scale) for p, dr, dc, d in offsets if p == 0)
+        rows, cols, values = [], [], []
+        for source, target, distance in grid_edges(grid, radius):
+            rows.append(source)
+            cols.append(target)
+            values.append(connectivity(distance, scale, total, rng, len(source)))
+        conmat = scipy.sparse.csr_matrix((numpy.concatenate(values),
+                                          (numpy.concatenate(rows), numpy.concatenate(cols))),
+                                         shape=(grid['units'], grid['units']))
+        with open(filepath, 'w') as file:
+            for start in range(0, grid['units'], chunksize):
+                stop = min(start + chunksize, grid['units'])
+                pandas.DataFrame(conmat[start:stop].toarray(), index=grid['ids'][start:stop],
+                                 columns=grid['ids']).to_csv(file, header=start == 0)
+        return conmat.nnz
+
+    with open(filepath, 'w') as file:
+        file.write(",".join(([group] if group else []) + ['id1', 'id2', 'value']) + "\n")
+        for key, scale in matrices.items():
+            total = sum(numpy.exp(-d / scale) for p, dr, dc, d in offsets if p == 0)
+            for source, target, distance in grid_edges(grid, radius):
+                edges = {'id1': grid['ids'][source], 'id2': grid['ids'][target],
+                         'value': connectivity(distance, scale, total, rng, len(source))}
+                if group:
+                    edges = dict([(group, numpy.repeat(str(key), len(source)))] + list(edges.items()))
+                file.write(MarxanConnectEngine.format_csv_table(edges, header=False))
+                connections += len(source)
+    return connections
+
+
+def features(grid, count=10, seed=0):
+    """
+    Returns the amount (area in m2) of 'count' conservation features in each hexagon. Each feature is found in a few
+    patches of various sizes.
+    """
+    rng = numpy.random.RandomState(seed)
+    area = 3 * numpy.sqrt(3) / 2 * grid['size'] ** 2
+    width = grid['columns'] * numpy.sqrt(3) * grid['size']
+    amounts = {}
+    for f in range(count):
+        cover = numpy.zeros(grid['units'])
+        for patch in range(rng.randint(1, 6)):
+            x, y = origin[0] + rng.uniform(0, width), origin[1] + rng.uniform(0, width)
+            spread = rng.uniform(0.02, 0.15) * width
+            cover += numpy.exp(-((grid['x'] - x) ** 2 + (grid['y'] - y) ** 2) / (2 * spread ** 2))
+        cover = numpy.clip(cover, 0, 1)
+        amounts['feat_' + str(f + 1)] = numpy.where(cover > 0.05, cover * area, 0)
+    return pandas.DataFrame(amounts)
+
+
+def hexagons(grid):
+    """
+    Returns the hexagons of the grid as shapely polygons
+    """
+    angles = numpy.radians(30 + 60 * numpy.arange(6))
+    dx, dy = grid['size'] * numpy.cos(angles), grid['size'] * numpy.sin(angles)
+    geometry = MarxanConnectEngine.shapely.geometry
+    return [geometry.Polygon(list(zip(x + dx, y + dy))) for x, y in zip(grid['x'], grid['y'])]
+
+
+def areas(grid, seed=0):
+    """
+    Returns the focus areas (a few circles, about 10% of the grid) and the avoidance areas (a shipping lane across the
+    grid and a port) as shapely geometries
+    """
+    rng = numpy.random.RandomState(seed)
+    width = grid['columns'] * numpy.sqrt(3) * grid['size']
+    geometry = MarxanConnectEngine.shapely.geometry
+    focus = [geometry.Point(origin[0] + rng.uniform(0.1, 0.9) * width,
+                            origin[1] + rng.uniform(0.1, 0.9) * width).buffer(0.1 * width) for f in range(3)]
+    lane = origin[1] + rng.uniform(0.2, 0.8) * width
+    avoidance = [geometry.box(origin[0], lane, origin[0] + width, lane + 0.03 * width),
+                 geometry.Point(origin[0] + rng.uniform(0, width), lane).buffer(0.05 * width)]
+    return focus, avoidance
+
+
+def write_shapefile(filepath, table, geometries):
+    MarxanConnectEngine.gpd.GeoDataFrame(table, geometry=geometries, crs=crs).to_file(filepath)
+
+
+def write_marxan_input(outdir, grid, amounts):
+    """
+    Writes the original Marxan input files (pu.dat, spec.dat, puvspr.dat and bound.dat, in 'input') and input.dat,
+    which is based on the tutorial's
+    """
+    inputdir = os.path.join(outdir, 'input')
+    os.makedirs(inputdir, exist_ok=True)
+    os.makedirs(os.path.join(outdir, 'output'), exist_ok=True)
+
+    puvspr = amounts.assign(pu=grid['ids']).melt(id_vars=['pu'], var_name='name', value_name='amount')
+    puvspr['species'] = pandas.factorize(puvspr['name'])[0] + 1
+    shared = [(source, target) for source, target, distance in grid_edges(grid, 1) if abs(distance - 1) < 1e-9]
+    source = numpy.concatenate([s for s, t in shared])
+    target = numpy.concatenate([t for s, t in shared])
+    MarxanConnectEngine.write_marxan_files({
+        os.path.join(inputdir, 'pu.dat'): {'id': grid['ids'], 'cost': numpy.ones(grid['units'], dtype='int'),
+                                           'status': numpy.zeros(grid['units'], dtype='int'),
+                                           'xloc': grid['x'], 'yloc': grid['y']},
+        os.path.join(inputdir, 'spec.dat'): {'id': numpy.arange(len(amounts.columns)) + 1,
+                                             'prop': numpy.repeat(0.3, len(amounts.columns)),
+                                             'spf': numpy.repeat(1000, len(amounts.columns)),
+                                             'name': numpy.array(amounts.columns)},
+        os.path.join(inputdir, 'puvspr.dat'): puvspr[puvspr['amount'] > 0][['species', 'pu', 'amount']],
+        # each shared side once, with the length of the side of the hexagons
+        os.path.join(inputdir, 'bound.dat'): {'id1': grid['ids'][source[source < target]],
+                                              'id2': grid['ids'][target[source < target]],
+                                              'boundary': numpy.repeat(grid['size'], (source < target).sum())}})
+
+    inputdat = MarxanConnectEngine.read_marxan_input(
+        os.path.join(root, 'docs', 'tutorial', 'CF_demographic', 'input_no_connect.dat')).copy()
+    for name, value in [('INPUTDIR', 'input'), ('OUTPUTDIR', 'output'), ('SPECNAME', 'spec.dat'),
+                        ('PUNAME', 'pu.dat'), ('PUVSPRNAME', 'puvspr.dat'), ('BOUNDNAME', 'bound.dat'),
+                        ('SCENNAME', 'synthetic'), ('NUMREPS', 10)]:
+        inputdat.set(name, value)
+    inputdat.write(os.path.join(outdir, 'input.dat'))
+
+
+def write_project(outdir, projfilename, conmat, matrixformat):
+    """
+    Writes a .MarCon project using the synthetic files, with paths relative to 'outdir'
+    """
+    marcon = MarxanConnectEngine.marxanconpy.marcon
+    project = marcon.new_project(outdir)
+    projfile = os.path.join(outdir, projfilename)
+    project['filepaths'].update({'projfile': projfile, 'projfilename': projfilename,
+                                 'pu_filepath': os.path.join(outdir, 'hex_planning_units.shp'),
+                                 'pu_file_pu_id': 'pu_id',
+                                 'demo_cu_filepath': os.path.join(outdir, 'hex_planning_units.shp'),
+                                 'demo_cu_file_pu_id': 'pu_id',
+                                 'demo_cu_cm_filepath': conmat,
+                                 'demo_pu_cm_filepath': conmat,
+                                 'fa_filepath': os.path.join(outdir, 'focus_areas.shp'),
+                                 'aa_filepath': os.path.join(outdir, 'avoidance_areas.shp'),
+                                 'marxan_input': os.path.join(outdir, 'input.dat'),
+                                 'orig_pudat_filepath': os.path.join(outdir, 'input', 'pu.dat'),
+                                 'orig_spec_filepath': os.path.join(outdir, 'input', 'spec.dat'),
+                                 'orig_cf_filepath': os.path.join(outdir, 'input', 'puvspr.dat'),
+                                 'orig_bd_filepath': os.path.join(outdir, 'input', 'bound.dat')})
+    project['options'].update({'demo_conmat_format': matrixformat,
+                               'demo_conmat_type': "Probability",
+                               'demo_conmat_rescale': "Identical Grids",
+                               'calc_metrics_pu': True,
+                               'calc_metrics_cu': False})
+    project = marcon.edit_working_directory(project, outdir, "relative")
+    marcon.save_project(project=project, projfile=projfile)
+    return projfile
+
+
+def generate(outdir, units, radius=3, features_count=10, extent=1000000.0, formats=formats,
+             max_matrix_units=10000, seed=0):
+    """
+    Writes a synthetic project in 'outdir' and returns the paths of its files
+    """
+    os.makedirs(outdir, exist_ok=True)
+    grid = hex_grid(units, extent)
+    files = {}
+
+    start = time.time()
+    for matrixformat in formats:
+        if matrixformat == "Matrix" and units > max_matrix_units:
+            print("Matrix: skipped (" + str(units) + " units, more than --max-matrix-units)")
+            continue
+        files[matrixformat] = os.path.join(outdir, filenames[matrixformat])
+        connections = write_conmat(files[matrixformat], grid, matrixformat, radius, seed)
+        print(matrixformat + ": " + str(connections) + " connections, " + str(round(time.time() - start, 1)) +
+              " seconds")
+        start = time.time()
+
+    amounts = features(grid, features_count, seed)
+    write_shapefile(os.path.join(outdir, 'hex_planning_units.shp'), amounts.assign(pu_id=grid['ids']),
+                    hexagons(grid))
+    focus, avoidance = areas(grid, seed)
+    write_shapefile(os.path.join(outdir, 'focus_areas.shp'), {'id': numpy.arange(len(focus)) + 1}, focus)
+    write_shapefile(os.path.join(outdir, 'avoidance_areas.shp'), {'id': numpy.arange(len(avoidance)) + 1},
+                    avoidance)
+    print("shapefiles: " + str(round(time.time() - start, 1)) + " seconds")
+    start = time.time()
+
+    write_marxan_input(outdir, grid, amounts)
+    print("Marxan input files: " + str(round(time.time() - start, 1)) + " seconds")
+
+    # the project uses the edge list if there is one: it can be read at any size
+    matrixformat = "Edge List" if "Edge List" in files else list(files)[0]
+    files['project'] = write_project(outdir, 'synthetic.MarCon', files[matrixformat], matrixformat)
+    return files
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates a synthetic Marxan Connect project")
+    parser.add_argument('outdir')
+    parser.add_argument('--units', type=int, default=10000, help="number of planning units")
+    parser.add_argument('--radius', type=int, default=3, help="connectivity cut off, in hexagons")
+    parser.add_argument('--features', type=int, default=10, help="number of conservation features")
+    parser.add_argument('--extent', type=float, default=1000000.0, help="width of the grid in m")
+    parser.add_argument('--formats', default=",".join(formats), help="comma separated connectivity formats")
+    parser.add_argument('--max-matrix-units', type=int, default=10000,
+                        help="largest grid written in the dense Matrix format")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    files = generate(args.outdir, args.units, radius=args.radius, features_count=args.features, extent=args.extent,
+                     formats=[f for f in args.formats.split(',') if f], max_matrix_units=args.max_matrix_units,
+                     seed=args.seed)
+    for k, v in files.items():
+        print(k + ": " + v)
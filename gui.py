@@ -47,8 +47,39 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.debug_mode = wx.MenuItem( self.debug, wx.ID_ANY, u"Debug Mode"+ u"\t" + u"Ctrl+D", wx.EmptyString, wx.ITEM_NORMAL )
 		self.debug.Append( self.debug_mode )
 
+		self.debug_logfile = wx.MenuItem( self.debug, wx.ID_ANY, u"Save Log to File...", wx.EmptyString, wx.ITEM_CHECK )
+		self.debug.Append( self.debug_logfile )
+
+		self.debug_startup = wx.MenuItem( self.debug, wx.ID_ANY, u"Startup Timing Report", wx.EmptyString, wx.ITEM_NORMAL )
+		self.debug.Append( self.debug_startup )
+
 		self.menu.Append( self.debug, u"Debug" )
 
+		self.tools = wx.Menu()
+		self.update_project = wx.MenuItem( self.tools, wx.ID_ANY, u"Update Project...", wx.EmptyString, wx.ITEM_NORMAL )
+		self.tools.Append( self.update_project )
+
+		self.tools.AppendSeparator()
+
+		self.batch_rescale = wx.MenuItem( self.tools, wx.ID_ANY, u"Batch Rescale Connectivity Matrices...", wx.EmptyString, wx.ITEM_NORMAL )
+		self.tools.Append( self.batch_rescale )
+
+		self.batch_postHoc = wx.MenuItem( self.tools, wx.ID_ANY, u"Post-Hoc Evaluation of All Solutions...", wx.EmptyString, wx.ITEM_NORMAL )
+		self.tools.Append( self.batch_postHoc )
+
+		self.memory_budget = wx.MenuItem( self.tools, wx.ID_ANY, u"Memory Budget...", wx.EmptyString, wx.ITEM_NORMAL )
+		self.tools.Append( self.memory_budget )
+
+		self.tools.AppendSeparator()
+
+		self.marxan_sweep_item = wx.MenuItem( self.tools, wx.ID_ANY, u"Marxan Parameter Sweep...", wx.EmptyString, wx.ITEM_NORMAL )
+		self.tools.Append( self.marxan_sweep_item )
+
+		self.blm_calibration = wx.MenuItem( self.tools, wx.ID_ANY, u"Marxan BLM Calibration...", wx.EmptyString, wx.ITEM_NORMAL )
+		self.tools.Append( self.blm_calibration )
+
+		self.menu.Append( self.tools, u"Tools" )
+
 		self.help = wx.Menu()
 		self.glossary = wx.MenuItem( self.help, wx.ID_ANY, u"Glossary", wx.EmptyString, wx.ITEM_NORMAL )
 		self.help.Append( self.glossary )
@@ -75,6 +106,9 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.posthoc = wx.MenuItem( self.experimental, wx.ID_ANY, u"Post-Hoc Evaluation Tab", wx.EmptyString, wx.ITEM_NORMAL )
 		self.experimental.Append( self.posthoc )
 
+		self.python_annealer = wx.MenuItem( self.experimental, wx.ID_ANY, u"Python Annealer (instead of Marxan)", wx.EmptyString, wx.ITEM_CHECK )
+		self.experimental.Append( self.python_annealer )
+
 		self.help.AppendSubMenu( self.experimental, u"Experimental Features" )
 
 		self.menu.Append( self.help, u"Help" )
@@ -566,6 +600,17 @@ class MarxanConnectGUI ( wx.Frame ):
 
 		land_cu_limits_sizer.Add( self.land_HAB_thresh, 0, wx.ALL, 5 )
 
+		self.land_HAB_cutoff_txt = wx.StaticText( self.hab_res, wx.ID_ANY, u"Maximum Cost Distance", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.land_HAB_cutoff_txt.Wrap( -1 )
+
+		self.land_HAB_cutoff_txt.SetFont( wx.Font( wx.NORMAL_FONT.GetPointSize(), wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, True, wx.EmptyString ) )
+		self.land_HAB_cutoff_txt.SetToolTip( u"Least-cost paths are followed up to this cost from each planning unit. Leave empty to follow them without a limit, as marxanconpy does." )
+
+		land_cu_limits_sizer.Add( self.land_HAB_cutoff_txt, 0, wx.ALL, 5 )
+
+		self.land_HAB_cutoff = wx.TextCtrl( self.hab_res, wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+		land_cu_limits_sizer.Add( self.land_HAB_cutoff, 0, wx.ALL, 5 )
+
 
 		hab_res_sizer.Add( land_cu_limits_sizer, 1, wx.EXPAND, 5 )
 
@@ -618,7 +663,7 @@ class MarxanConnectGUI ( wx.Frame ):
 
 		land_res_def_sizer = wx.BoxSizer( wx.HORIZONTAL )
 
-		self.land_RES_def = wx.StaticText( self.res_suf, wx.ID_ANY, u"This feature is not yet operational, please check again in the next version.", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.land_RES_def = wx.StaticText( self.res_suf, wx.ID_ANY, u"Landscape connectivity is generated from the least-cost paths across a resistance surface raster (e.g. GeoTIFF) between the cells of each planning unit.", wx.DefaultPosition, wx.DefaultSize, 0 )
 		self.land_RES_def.Wrap( -1 )
 
 		land_res_def_sizer.Add( self.land_RES_def, 0, wx.ALL|wx.EXPAND, 5 )
@@ -631,17 +676,17 @@ class MarxanConnectGUI ( wx.Frame ):
 		land_res_file_sizer.SetFlexibleDirection( wx.HORIZONTAL )
 		land_res_file_sizer.SetNonFlexibleGrowMode( wx.FLEX_GROWMODE_SPECIFIED )
 
-		self.land_RES_filetext = wx.StaticText( self.res_suf, wx.ID_ANY, u"Resistance Surface Shapefile", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.land_RES_filetext = wx.StaticText( self.res_suf, wx.ID_ANY, u"Resistance Surface Raster", wx.DefaultPosition, wx.DefaultSize, 0 )
 		self.land_RES_filetext.Wrap( -1 )
 
 		self.land_RES_filetext.SetFont( wx.Font( 9, wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, True, "Arial" ) )
 
 		land_res_file_sizer.Add( self.land_RES_filetext, 0, wx.ALIGN_CENTER_VERTICAL|wx.ALL, 5 )
 
-		self.land_RES_file = wx.FilePickerCtrl( self.res_suf, wx.ID_ANY, wx.EmptyString, u"Select a file", u"ESRI Shapefile (*.shp)|*.shp|GeoPackage (*.gpkg)|*.gpkg|All files (*.*)|*.*", wx.DefaultPosition, wx.DefaultSize, wx.FLP_DEFAULT_STYLE )
+		self.land_RES_file = wx.FilePickerCtrl( self.res_suf, wx.ID_ANY, wx.EmptyString, u"Select a file", u"GeoTIFF (*.tif)|*.tif;*.tiff|All files (*.*)|*.*", wx.DefaultPosition, wx.DefaultSize, wx.FLP_DEFAULT_STYLE )
 		land_res_file_sizer.Add( self.land_RES_file, 0, wx.ALIGN_LEFT|wx.ALL|wx.EXPAND, 5 )
 
-		self.land_res_file_res_id_txt = wx.StaticText( self.res_suf, wx.ID_ANY, u"Resistance Column Label", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.land_res_file_res_id_txt = wx.StaticText( self.res_suf, wx.ID_ANY, u"Resistance Band", wx.DefaultPosition, wx.DefaultSize, 0 )
 		self.land_res_file_res_id_txt.Wrap( -1 )
 
 		self.land_res_file_res_id_txt.SetFont( wx.Font( wx.NORMAL_FONT.GetPointSize(), wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, True, wx.EmptyString ) )
@@ -653,6 +698,17 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.land_RES_file_res_id.SetSelection( 0 )
 		land_res_file_sizer.Add( self.land_RES_file_res_id, 0, wx.ALL, 5 )
 
+		self.land_RES_cutoff_txt = wx.StaticText( self.res_suf, wx.ID_ANY, u"Maximum Cost Distance", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.land_RES_cutoff_txt.Wrap( -1 )
+
+		self.land_RES_cutoff_txt.SetFont( wx.Font( wx.NORMAL_FONT.GetPointSize(), wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, True, wx.EmptyString ) )
+		self.land_RES_cutoff_txt.SetToolTip( u"Least-cost paths are followed up to this cost from each planning unit, and only the part of the resistance surface within it is read. Leave empty for the default: the cost of crossing 10 planning units over the least resistant cells." )
+
+		land_res_file_sizer.Add( self.land_RES_cutoff_txt, 0, wx.ALIGN_CENTER_VERTICAL|wx.ALL, 5 )
+
+		self.land_RES_cutoff = wx.TextCtrl( self.res_suf, wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+		land_res_file_sizer.Add( self.land_RES_cutoff, 0, wx.ALL, 5 )
+
 
 		land_res_sizer.Add( land_res_file_sizer, 1, wx.EXPAND, 5 )
 
@@ -1546,6 +1602,28 @@ class MarxanConnectGUI ( wx.Frame ):
 
 		bd_file_sizer.Add( BD_sizer, 1, wx.EXPAND, 5 )
 
+		self.BD_threshold_txt = wx.StaticText( self.exportMarxan, wx.ID_ANY, u"Connectivity Boundary Threshold:", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.BD_threshold_txt.Wrap( -1 )
+
+		self.BD_threshold_txt.SetToolTip( u"Connections weaker than or equal to this value are left out of the connectivity boundary definitions (i.e. boundary.dat). Leave empty for 0." )
+
+		bd_file_sizer.Add( self.BD_threshold_txt, 0, wx.ALIGN_CENTER_VERTICAL|wx.ALL, 5 )
+
+		self.BD_threshold = wx.TextCtrl( self.exportMarxan, wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+		bd_file_sizer.Add( self.BD_threshold, 0, wx.ALL, 5 )
+
+		self.BD_method_txt = wx.StaticText( self.exportMarxan, wx.ID_ANY, u"Minimum Planning Graph Method:", wx.DefaultPosition, wx.DefaultSize, 0 )
+		self.BD_method_txt.Wrap( -1 )
+
+		self.BD_method_txt.SetToolTip( u"Algorithm used to build the minimum planning graph boundary. Both give the same graph; Boruvka can be faster on very large connectivity matrices." )
+
+		bd_file_sizer.Add( self.BD_method_txt, 0, wx.ALIGN_CENTER_VERTICAL|wx.ALL, 5 )
+
+		BD_methodChoices = [ u"Kruskal", u"Boruvka" ]
+		self.BD_method = wx.Choice( self.exportMarxan, wx.ID_ANY, wx.DefaultPosition, wx.DefaultSize, BD_methodChoices, 0 )
+		self.BD_method.SetSelection( 0 )
+		bd_file_sizer.Add( self.BD_method, 0, wx.ALL, 5 )
+
 
 		exportMarxanMainSizer.Add( bd_file_sizer, 1, wx.EXPAND, 5 )
 
@@ -2354,6 +2432,14 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.Bind( wx.EVT_MENU, self.on_load_project, id = self.load_project.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_github, id = self.github.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_debug_mode, id = self.debug_mode.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_debug_logfile, id = self.debug_logfile.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_startup_report, id = self.debug_startup.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_update_project, id = self.update_project.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_demo_batch_rescale, id = self.batch_rescale.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_batch_postHoc, id = self.batch_postHoc.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_memory_budget, id = self.memory_budget.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_marxan_sweep, id = self.marxan_sweep_item.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_blm_calibration, id = self.blm_calibration.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_glossary, id = self.glossary.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_tutorial, id = self.tutorial.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_contributing, id = self.contributing.GetId() )
@@ -2362,6 +2448,7 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.Bind( wx.EVT_MENU, self.on_getting_started, id = self.start.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_mwz, id = self.mwz.GetId() )
 		self.Bind( wx.EVT_MENU, self.on_posthoc, id = self.posthoc.GetId() )
+		self.Bind( wx.EVT_MENU, self.on_python_annealer, id = self.python_annealer.GetId() )
 		self.PU_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_PU_file )
 		self.PU_file_pu_id.Bind( wx.EVT_CHOICE, self.on_PU_file_pu_id )
 		self.FA_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_FA_file )
@@ -2385,10 +2472,12 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.land_HAB_file_hab_id.Bind( wx.EVT_CHOICE, self.on_land_HAB_file_hab_id )
 		self.land_HAB_buff.Bind( wx.EVT_TEXT, self.on_land_HAB_buff )
 		self.land_HAB_thresh.Bind( wx.EVT_TEXT, self.on_land_HAB_thresh )
+		self.land_HAB_cutoff.Bind( wx.EVT_TEXT, self.on_land_HAB_cutoff )
 		self.land_RES_mat_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_land_RES_mat_file )
 		self.resistance_mat_customize.Bind( wx.EVT_BUTTON, self.on_resistance_mat_customize )
 		self.land_RES_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_land_RES_file )
 		self.land_RES_file_res_id.Bind( wx.EVT_CHOICE, self.on_land_RES_file_hab_id )
+		self.land_RES_cutoff.Bind( wx.EVT_TEXT, self.on_land_RES_cutoff )
 		self.land_PU_CM_progress.Bind( wx.EVT_CHECKBOX, self.on_land_PU_CM_progress )
 		self.land_PU_CM_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_land_PU_CM_file )
 		self.land_generate_button.Bind( wx.EVT_BUTTON, self.on_land_generate_button )
@@ -2446,6 +2535,8 @@ class MarxanConnectGUI ( wx.Frame ):
 		self.BD_filecheck.Bind( wx.EVT_CHECKBOX, self.on_BD_filecheck )
 		self.BD_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_BD_file )
 		self.export_BD_file.Bind( wx.EVT_BUTTON, self.on_export_BD_file )
+		self.BD_threshold.Bind( wx.EVT_TEXT, self.on_BD_threshold )
+		self.BD_method.Bind( wx.EVT_CHOICE, self.on_BD_method )
 		self.orig_PUDAT_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_orig_PUDAT_file )
 		self.PUDAT_filecheck.Bind( wx.EVT_CHECKBOX, self.on_PUDAT_filecheck )
 		self.PUDAT_file.Bind( wx.EVT_FILEPICKER_CHANGED, self.on_PUDAT_file )
@@ -2508,6 +2599,30 @@ class MarxanConnectGUI ( wx.Frame ):
 	def on_debug_mode( self, event ):
 		event.Skip()
 
+	def on_debug_logfile( self, event ):
+		event.Skip()
+
+	def on_startup_report( self, event ):
+		event.Skip()
+
+	def on_update_project( self, event ):
+		event.Skip()
+
+	def on_demo_batch_rescale( self, event ):
+		event.Skip()
+
+	def on_batch_postHoc( self, event ):
+		event.Skip()
+
+	def on_memory_budget( self, event ):
+		event.Skip()
+
+	def on_marxan_sweep( self, event ):
+		event.Skip()
+
+	def on_blm_calibration( self, event ):
+		event.Skip()
+
 	def on_glossary( self, event ):
 		event.Skip()
 
@@ -2532,6 +2647,9 @@ class MarxanConnectGUI ( wx.Frame ):
 	def on_posthoc( self, event ):
 		event.Skip()
 
+	def on_python_annealer( self, event ):
+		event.Skip()
+
 	def on_PU_file( self, event ):
 		event.Skip()
 
@@ -2601,6 +2719,9 @@ class MarxanConnectGUI ( wx.Frame ):
 	def on_land_HAB_thresh( self, event ):
 		event.Skip()
 
+	def on_land_HAB_cutoff( self, event ):
+		event.Skip()
+
 	def on_land_RES_mat_file( self, event ):
 		event.Skip()
 
@@ -2613,6 +2734,9 @@ class MarxanConnectGUI ( wx.Frame ):
 	def on_land_RES_file_hab_id( self, event ):
 		event.Skip()
 
+	def on_land_RES_cutoff( self, event ):
+		event.Skip()
+
 	def on_land_PU_CM_progress( self, event ):
 		event.Skip()
 
@@ -2732,6 +2856,12 @@ class MarxanConnectGUI ( wx.Frame ):
 	def on_export_BD_file( self, event ):
 		event.Skip()
 
+	def on_BD_threshold( self, event ):
+		event.Skip()
+
+	def on_BD_method( self, event ):
+		event.Skip()
+
 	def on_orig_PUDAT_file( self, event ):
 		event.Skip()
 
@@ -30,6 +30,81 @@ with open('gui.py', 'w', encoding="utf8") as file:
 
 block_cipher = None
 
+# modules which MarxanConnectGUI.py and MarxanConnectEngine.py import when first used (see LazyModule), and so are not
+# found by PyInstaller
+lazy_imports = [
+    'matplotlib',
+    'matplotlib.pyplot',
+    'matplotlib.colors',
+    'matplotlib.cm',
+    'matplotlib.colorbar',
+    'matplotlib.backends.backend_wxagg',
+    'cartopy',
+    'cartopy.crs',
+    'cartopy.feature',
+    'geopandas',
+    'shapely',
+    'shapely.geometry',
+    'shapely.strtree',
+    'marxanconpy',
+]
+
+# GUI toolkits, matplotlib backends and test suites which the GUI never uses but which are otherwise bundled (and
+# unpacked at every start)
+excludes = [
+    'tkinter',
+    '_tkinter',
+    'PyQt4',
+    'PyQt5',
+    'PySide',
+    'PySide2',
+    'gi',
+    'IPython',
+    'jupyter_client',
+    'notebook',
+    'tornado',
+    'matplotlib.backends.backend_tkagg',
+    'matplotlib.backends.backend_tkcairo',
+    'matplotlib.backends._backend_tk',
+    'matplotlib.backends.backend_qt4agg',
+    'matplotlib.backends.backend_qt5agg',
+    'matplotlib.backends.backend_qt5cairo',
+    'matplotlib.backends.backend_qt',
+    'matplotlib.backends.backend_gtk3agg',
+    'matplotlib.backends.backend_gtk3cairo',
+    'matplotlib.backends.backend_webagg',
+    'matplotlib.backends.backend_webagg_core',
+    'matplotlib.backends.backend_nbagg',
+    'matplotlib.tests',
+    'matplotlib.testing',
+    'cartopy.tests',
+    'pandas.tests',
+    'numpy.tests',
+    'scipy.tests',
+    'shapely.tests',
+    'geopandas.tests',
+]
+
+# data which is bundled with the modules or the documentation but not used by the GUI
+excluded_data = [
+    os.path.join('matplotlib', 'mpl-data', 'sample_data'),
+    os.path.join('cartopy', 'tests'),
+    os.path.join('docs', 'maps_for_pubs'),
+    os.path.join('docs', 'tutorial', 'targets'),
+    os.path.join('docs', 'images', 'Tutorial_figures.pptx'),
+]
+excluded_data_extensions = ('.Rmd', '.Rproj', '.R', '.bib')
+
+
+def trim_datas(datas):
+    """
+    Removes the unused data (see excluded_data) from the Analysis' data files
+    """
+    return [d for d in datas
+            if not any(d[0] == path or d[0].startswith(path + os.sep) for path in excluded_data)
+            and not (d[0].startswith('docs' + os.sep) and d[0].endswith(excluded_data_extensions))]
+
+
 if platform.system() == 'Windows':
     # Read in the WindowsSetupBuilder file to edit version
     with open('WindowsSetupBuilder.iss', 'r', encoding="utf8") as file:
@@ -96,14 +171,15 @@ if platform.system() == 'Windows':
                  pathex=paths,
                  binaries=[],
                  datas=added_files,
-                 hiddenimports=hidden_imports,
+                 hiddenimports=hidden_imports + lazy_imports,
                  hookspath=[],
                  runtime_hooks=[],
-                 excludes=[],
+                 excludes=excludes,
                  win_no_prefer_redirects=False,
                  win_private_assemblies=False,
                  cipher=block_cipher,
                  noarchive=False)
+    a.datas = trim_datas(a.datas)
     pyz = PYZ(a.pure, a.zipped_data,
                  cipher=block_cipher)
     exe = EXE(pyz,
@@ -186,14 +262,15 @@ if platform.system() == 'Darwin':
                  pathex=['/Users/remidaigle/Documents/GitHub/MarxanConnect'],
                  binaries=binaries,
                  datas=added_files,
-                 hiddenimports=hidden_imports,
+                 hiddenimports=hidden_imports + lazy_imports,
                  hookspath=[],
                  runtime_hooks=[],
-                 excludes=[],
+                 excludes=excludes,
                  win_no_prefer_redirects=False,
                  win_private_assemblies=False,
                  cipher=block_cipher,
                  noarchive=False)
+    a.datas = trim_datas(a.datas)
     pyz = PYZ(a.pure, a.zipped_data,
               cipher=block_cipher)
     exe = EXE(pyz,
@@ -0,0 +1,10 @@
+"""
+The tests import MarxanConnectEngine from the repository root, as the benchmarks do. It doesn't need wx.
+
+usage: python -m pytest -q tests
+"""
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
@@ -0,0 +1,101 @@
+"""
+Tests of the Python annealer: the objective of a solution, the annealing and its output files.
+"""
+import os
+
+import numpy
+import pandas
+import pytest
+import scipy.sparse
+
+import MarxanConnectEngine
+
+
+@pytest.fixture
+def problem():
+    """
+    Four planning units in a line, with costs 1 to 4, a boundary of 1 between neighbours and a fixed boundary of 0.5 at
+    both ends, and one feature (spf 10) of which each planning unit holds 1 and 2 are needed
+    """
+    cost = numpy.array([1.0, 2.0, 3.0, 4.0])
+    status = numpy.zeros(4, dtype='int')
+    amount = scipy.sparse.csr_matrix(numpy.ones((4, 1)))
+    target = numpy.array([2.0])
+    boundary = scipy.sparse.csr_matrix(([1.0] * 6, ([0, 1, 1, 2, 2, 3], [1, 0, 2, 1, 3, 2])), shape=(4, 4))
+    return {'ids': numpy.array([1, 2, 3, 4]), 'cost': cost, 'status': status, 'amount': amount, 'target': target,
+            'spf': numpy.array([10.0]), 'penalty': MarxanConnectEngine.feature_penalties(cost, status, amount, target),
+            'out': boundary, 'in': boundary.T.tocsr(), 'fixed': numpy.array([0.5, 0, 0, 0.5]), 'asymmetric': False}
+
+
+def settings(**changes):
+    values = {'BLM': 2.0, 'PROP': 0.5, 'RANDSEED': 1, 'NUMREPS': 1, 'NUMITNS': 10000, 'NUMTEMP': 100,
+              'STARTTEMP': -1.0, 'COOLFAC': 6.0, 'MISSLEVEL': 1.0}
+    values.update(changes)
+    return values
+
+
+def test_solution_summary(problem):
+    # the penalty is the cost of the two cheapest planning units
+    assert problem['penalty'].tolist() == [3.0]
+
+    # cost 1 + 2, boundary 0.5 (fixed) + 1 (between 2 and 3), no shortfall
+    summary = MarxanConnectEngine.solution_summary(problem, numpy.array([1, 1, 0, 0]), blm=2.0)
+    assert summary == {'Score': 6.0, 'Cost': 3.0, 'Planning_Units': 2, 'Connectivity': 1.5, 'Penalty': 0.0,
+                       'Shortfall': 0.0, 'Missing_Values': 0}
+
+    # cost 1, boundary 0.5 + 1, and a shortfall of 1 weighted by spf * penalty / target = 10 * 3 / 2
+    summary = MarxanConnectEngine.solution_summary(problem, numpy.array([1, 0, 0, 0]), blm=2.0)
+    assert summary == {'Score': 19.0, 'Cost': 1.0, 'Planning_Units': 1, 'Connectivity': 1.5, 'Penalty': 15.0,
+                       'Shortfall': 1.0, 'Missing_Values': 1}
+    assert MarxanConnectEngine.solution_summary(problem, numpy.array([1, 0, 0, 0]), 2.0, misslevel=0.5)[
+        'Missing_Values'] == 0
+
+
+def is_local_optimum(problem, solution, blm):
+    score = MarxanConnectEngine.solution_summary(problem, solution, blm)['Score']
+    for i in range(len(solution)):
+        flipped = solution.copy()
+        flipped[i] = 1 - flipped[i]
+        if MarxanConnectEngine.solution_summary(problem, flipped, blm)['Score'] < score:
+            return False
+    return True
+
+
+def test_anneal_seeded(problem):
+    # the best solution has a score of 6, the other local optima ([0, 1, 1, 0] and [0, 0, 1, 1]) have 9 and 10
+    for seed in range(5):
+        first = MarxanConnectEngine.anneal(problem, settings(), numpy.random.default_rng(seed))
+        again = MarxanConnectEngine.anneal(problem, settings(), numpy.random.default_rng(seed))
+        assert first.tolist() == [1, 1, 0, 0]
+        numpy.testing.assert_array_equal(first, again)
+
+
+def test_anneal_locked(problem):
+    problem['status'] = numpy.array([0, 3, 2, 0])
+    solution = MarxanConnectEngine.anneal(problem, settings(), numpy.random.default_rng(0))
+    assert solution[1] == 0 and solution[2] == 1
+
+
+def test_anneal_zero_temperature(problem):
+    # only the changes which improve the objective are accepted, so the annealing ends in a local optimum
+    for seed in range(5):
+        solution = MarxanConnectEngine.anneal(problem, settings(STARTTEMP=0.0), numpy.random.default_rng(seed))
+        assert is_local_optimum(problem, solution, 2.0)
+
+
+def test_write_annealer_output(tmp_path):
+    lines = ['SCENNAME test\n', 'OUTPUTDIR output\n', 'SAVERUN 3\n', 'SAVEBEST 2\n', 'SAVESUMMARY 3\n',
+             'SAVESUMSOLN 0\n']
+    filepath = str(tmp_path / 'input.dat')
+    with open(filepath, 'w') as file:
+        file.writelines(lines)
+    inputdat = MarxanConnectEngine.MarxanInput(lines, filepath)
+    solutions = numpy.array([[1, 0, 1], [0, 1, 1]], dtype='int8')
+    summary = pandas.DataFrame({'Run_Number': [1, 2], 'Score': [5.0, 4.0]})
+
+    best = MarxanConnectEngine.write_annealer_output(inputdat, numpy.array([1, 2, 3]), solutions, summary)
+    assert best == 1
+    assert sorted(os.listdir(str(tmp_path / 'output'))) == ['test_best.txt', 'test_r00001.csv', 'test_r00002.csv',
+                                                            'test_sum.csv']
+    written = pandas.read_csv(str(tmp_path / 'output' / 'test_best.txt'))
+    assert written['solution'].tolist() == [0, 1, 1]
@@ -0,0 +1,152 @@
+"""
+Tests of the project build graph and of the discrete features it recomputes.
+"""
+import numpy
+import pytest
+
+import MarxanConnectEngine
+
+
+@pytest.fixture
+def project(tmp_path):
+    """
+    A project with an input file, an option and a state, and the build graph input -> metrics -> features, with a
+    'posthoc' step which depends on the metrics and is only enabled with an option
+    """
+    for name in ['pu.shp', 'pu.dbf', 'conmat.csv']:
+        (tmp_path / name).write_text(name)
+    return {'options': {'method': 'Kruskal', 'posthoc': True},
+            'filepaths': {'pu': str(tmp_path / 'pu.shp'), 'conmat': str(tmp_path / 'conmat.csv'),
+                          'metrics': str(tmp_path / 'metrics.csv')},
+            'metrics': ['in_degree']}
+
+
+@pytest.fixture
+def build():
+    return MarxanConnectEngine.ProjectBuild([
+        MarxanConnectEngine.BuildStep('input', None, inputs=lambda p: [p['filepaths']['pu'], p['filepaths']['conmat']]),
+        MarxanConnectEngine.BuildStep('metrics', None, depends=['input'], options=['method'],
+                                      state=lambda p: p['metrics'], outputs=lambda p: [p['filepaths']['metrics']]),
+        MarxanConnectEngine.BuildStep('features', None, depends=['metrics']),
+        MarxanConnectEngine.BuildStep('posthoc', None, depends=['metrics'], enabled=lambda p: p['options']['posthoc']),
+    ])
+
+
+def built(build, project):
+    with open(project['filepaths']['metrics'], 'w') as file:
+        file.write('metrics')
+    build.mark_built(project, *build.steps)
+    assert build.stale(project) == []
+
+
+def test_stale_not_built(build, project):
+    assert build.stale(project) == ['input', 'metrics', 'features', 'posthoc']
+    assert build.stale(project, ['features']) == ['input', 'metrics', 'features']
+    built(build, project)
+    assert build.stale(project, ['features']) == []
+
+
+def test_stale_input_content(build, project, tmp_path):
+    built(build, project)
+    # the modification time doesn't count, only the content
+    (tmp_path / 'conmat.csv').write_text('conmat.csv')
+    assert build.stale(project) == []
+    (tmp_path / 'conmat.csv').write_text('changed')
+    assert build.stale(project) == ['input', 'metrics', 'features', 'posthoc']
+
+
+def test_stale_shapefile_sidecar(build, project, tmp_path):
+    built(build, project)
+    (tmp_path / 'pu.dbf').write_text('changed attributes')
+    assert build.stale(project) == ['input', 'metrics', 'features', 'posthoc']
+    built(build, project)
+    (tmp_path / 'pu.prj').write_text('a new projection')
+    assert build.stale(project) == ['input', 'metrics', 'features', 'posthoc']
+
+
+def test_stale_moved_input(build, project, tmp_path):
+    built(build, project)
+    (tmp_path / 'conmat.csv').rename(tmp_path / 'moved.csv')
+    project['filepaths']['conmat'] = str(tmp_path / 'moved.csv')
+    assert build.stale(project) == []
+
+
+def test_stale_option_and_state(build, project):
+    built(build, project)
+    project['options']['method'] = 'Boruvka'
+    assert build.stale(project) == ['metrics', 'features', 'posthoc']
+    built(build, project)
+    project['metrics'].append('out_degree')
+    assert build.stale(project) == ['metrics', 'features', 'posthoc']
+    # options which no step depends on don't make any step stale
+    built(build, project)
+    project['options']['unused'] = 1
+    assert build.stale(project) == []
+
+
+def test_stale_missing_output(build, project, tmp_path):
+    built(build, project)
+    (tmp_path / 'metrics.csv').unlink()
+    assert build.stale(project) == ['metrics', 'features', 'posthoc']
+
+
+def test_stale_disabled(build, project):
+    project['options']['posthoc'] = False
+    assert build.stale(project) == ['input', 'metrics', 'features']
+    build.mark_built(project, 'input')
+    assert build.stale(project) == ['metrics', 'features']
+
+
+def test_depends_on_unknown_step():
+    with pytest.raises(ValueError):
+        MarxanConnectEngine.ProjectBuild([MarxanConnectEngine.BuildStep('metrics', None, depends=['input']),
+                                          MarxanConnectEngine.BuildStep('input', None)])
+
+
+def test_update(build, project):
+    built_steps = []
+    for step in build.steps.values():
+        step.build = lambda p, name=step.name: built_steps.append(name)
+
+    def metrics(p):
+        open(p['filepaths']['metrics'], 'w').close()
+        built_steps.append('metrics')
+    build.steps['metrics'].build = metrics
+    build.steps['features'].build = lambda p: 1 / 0
+
+    report = build.update(project, threads=2)
+    assert built_steps[:2] == ['input', 'metrics'] and sorted(built_steps) == ['input', 'metrics', 'posthoc']
+    status = dict(zip(report['step'], report['status']))
+    assert status['features'].startswith('ZeroDivisionError')
+    assert [status[name] for name in ['input', 'metrics', 'posthoc']] == ['ok', 'ok', 'ok']
+    # only the step which failed is still stale
+    assert build.stale(project) == ['features']
+
+
+def test_rediscretize_features():
+    MarxanConnectEngine.clear_metric_statistics()
+    values = list(range(1, 101))
+    metrics = {'in_degree': values,
+               'in_degree_discrete_lower_quartile_to_maximum': [],
+               'in_degree_discrete_minimum_to_median_lockout': [],
+               'in_degree_discrete_90th_percentile_to_maximum_lockin': [],
+               'in_degree_discrete_10.5_to_20': [],
+               'out_degree_discrete_minimum_to_maximum': [0],
+               'other': [1]}
+    recomputed = MarxanConnectEngine.rediscretize_features(metrics)
+
+    assert sorted(recomputed) == ['in_degree_discrete_10.5_to_20',
+                                  'in_degree_discrete_90th_percentile_to_maximum_lockin',
+                                  'in_degree_discrete_lower_quartile_to_maximum',
+                                  'in_degree_discrete_minimum_to_median_lockout']
+    array = numpy.array(values)
+    quartiles = numpy.quantile(array, [0.25, 0.5])
+    numpy.testing.assert_array_equal(metrics['in_degree_discrete_lower_quartile_to_maximum'], array >= quartiles[0])
+    numpy.testing.assert_array_equal(metrics['in_degree_discrete_minimum_to_median_lockout'], array <= quartiles[1])
+    numpy.testing.assert_array_equal(metrics['in_degree_discrete_90th_percentile_to_maximum_lockin'],
+                                     array >= numpy.percentile(array, 90))
+    numpy.testing.assert_array_equal(metrics['in_degree_discrete_10.5_to_20'], (array >= 10.5) & (array <= 20))
+    assert all(isinstance(v, int) for v in metrics['in_degree_discrete_10.5_to_20'])
+    # features whose metric is gone are left as they are
+    assert metrics['out_degree_discrete_minimum_to_maximum'] == [0]
+    assert metrics['other'] == [1]
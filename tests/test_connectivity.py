@@ -0,0 +1,231 @@
+"""
+Tests of the connectivity engines: the sparse readers, the boundaries, the minimum planning graph and the least-cost
+paths.
+"""
+import io
+import os
+
+import numpy
+import pandas
+import pytest
+import scipy.sparse
+import scipy.sparse.csgraph
+
+import MarxanConnectEngine
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+hexflow = os.path.join(root, 'docs', 'tutorial', 'CF_demographic', 'hexFlow.csv')
+isolation = os.path.join(root, 'docs', 'tutorial', 'CF_landscape', 'IsolationByDistance.csv')
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    """
+    A memory budget small enough that the tutorial files are read a few rows at a time
+    """
+    monkeypatch.setattr(MarxanConnectEngine, 'memory_budget_mb', 2)
+
+
+def assert_same_conmats(expected, actual):
+    assert sorted(expected, key=str) == sorted(actual, key=str)
+    for key in expected:
+        assert expected[key].shape == actual[key].shape
+        assert abs(expected[key] - actual[key]).max() == 0
+
+
+def test_read_conmat_sparse_matrix():
+    ids, conmats = MarxanConnectEngine.read_conmat_sparse(hexflow, "Matrix")
+    dense = pandas.read_csv(hexflow, index_col=0)
+    assert list(conmats) == [None]
+    assert list(ids) == [str(i) for i in dense.index]
+    numpy.testing.assert_array_equal(conmats[None].toarray(), dense.values)
+
+
+def test_read_conmat_sparse_chunked_matrix(small_budget):
+    MarxanConnectEngine.memory_budget_mb = 1e6
+    expected_ids, expected = MarxanConnectEngine.read_conmat_sparse(hexflow, "Matrix")
+
+    MarxanConnectEngine.memory_budget_mb = 2
+    assert MarxanConnectEngine.chunk_rows(MarxanConnectEngine.dense_matrix_mb(1, len(expected_ids))) < 100
+    ids, conmats = MarxanConnectEngine.read_conmat_sparse_chunked(hexflow, "Matrix")
+    numpy.testing.assert_array_equal(ids, expected_ids)
+    assert_same_conmats(expected, conmats)
+
+    # read_conmat_sparse reads the file in chunks itself when it is over the budget
+    ids, conmats = MarxanConnectEngine.read_conmat_sparse(hexflow, "Matrix")
+    numpy.testing.assert_array_equal(ids, expected_ids)
+    assert_same_conmats(expected, conmats)
+
+
+def test_read_conmat_sparse_chunked_ids(small_budget):
+    MarxanConnectEngine.memory_budget_mb = 1e6
+    all_ids, expected = MarxanConnectEngine.read_conmat_sparse(hexflow, "Matrix")
+    ids = list(all_ids[::-3]) + ['not an id']
+    MarxanConnectEngine.memory_budget_mb = 2
+    chunked_ids, conmats = MarxanConnectEngine.read_conmat_sparse_chunked(hexflow, "Matrix", ids)
+
+    numpy.testing.assert_array_equal(chunked_ids, ids)
+    order = [list(all_ids).index(i) for i in ids[:-1]]
+    subset = conmats[None].toarray()
+    numpy.testing.assert_array_equal(subset[:-1, :-1], expected[None].toarray()[numpy.ix_(order, order)])
+    assert not subset[-1].any() and not subset[:, -1].any()
+
+
+def test_read_conmat_sparse_chunked_edge_list(tmp_path, small_budget):
+    MarxanConnectEngine.memory_budget_mb = 1e6
+    ids, expected = MarxanConnectEngine.read_conmat_sparse(hexflow, "Matrix")
+    coo = expected[None].tocoo()
+    edges = pandas.DataFrame({'id1': ids[coo.row], 'id2': ids[coo.col], 'value': coo.data})
+    # zero connections are dropped
+    edges = pandas.concat([edges, pandas.DataFrame({'id1': [ids[0]], 'id2': [ids[1]], 'value': [0.0]})])
+    filepath = str(tmp_path / 'edges.csv')
+    edges.to_csv(filepath, index=False)
+
+    MarxanConnectEngine.memory_budget_mb = 2
+    chunked_ids, conmats = MarxanConnectEngine.read_conmat_sparse_chunked(filepath, "Edge List", ids)
+    numpy.testing.assert_array_equal(chunked_ids, ids)
+    assert_same_conmats(expected, conmats)
+
+    # without the IDs, they are the IDs with connections, sorted
+    chunked_ids, conmats = MarxanConnectEngine.read_conmat_sparse_chunked(filepath, "Edge List")
+    numpy.testing.assert_array_equal(chunked_ids, numpy.unique(numpy.concatenate([ids[coo.row], ids[coo.col]])))
+    assert conmats[None].nnz == coo.nnz
+
+
+def test_read_conmat_sparse_chunked_habitat(small_budget):
+    pytest.importorskip('marxanconpy')
+    MarxanConnectEngine.memory_budget_mb = 1e6
+    expected_ids, expected = MarxanConnectEngine.read_conmat_sparse(isolation, "Edge List with Habitat")
+    MarxanConnectEngine.memory_budget_mb = 2
+    ids, conmats = MarxanConnectEngine.read_conmat_sparse_chunked(isolation, "Edge List with Habitat")
+    numpy.testing.assert_array_equal(ids, expected_ids)
+    assert_same_conmats(expected, conmats)
+
+
+def spanning_tree_weight(rows, cols, weights, n):
+    graph = scipy.sparse.csr_matrix((weights, (rows, cols)), shape=(n, n))
+    return scipy.sparse.csgraph.minimum_spanning_tree(graph).sum()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_boruvka_spanning_tree(seed):
+    random = numpy.random.RandomState(seed)
+    n = 200
+    # two components, and a few units without connections
+    rows = random.randint(0, n // 2 - 5, 800)
+    cols = random.randint(0, n // 2 - 5, 800)
+    rows = numpy.concatenate([rows, rows + n // 2])
+    cols = numpy.concatenate([cols, cols + n // 2])
+    keep = rows < cols
+    rows, cols = rows[keep], cols[keep]
+    # duplicate edges, where only the lightest can be kept
+    rows, cols = numpy.concatenate([rows, rows[:50]]), numpy.concatenate([cols, cols[:50]])
+    weights = random.rand(len(rows)) + 0.1
+
+    selected = MarxanConnectEngine.boruvka_spanning_tree(rows, cols, weights, n)
+    components = scipy.sparse.csgraph.connected_components(
+        scipy.sparse.csr_matrix((weights, (rows, cols)), shape=(n, n)), directed=False)[0]
+    assert selected.dtype == bool
+    assert selected.sum() == n - components
+    # the selected edges make a forest with the components of the graph
+    tree = scipy.sparse.csr_matrix((weights[selected], (rows[selected], cols[selected])), shape=(n, n))
+    assert scipy.sparse.csgraph.connected_components(tree, directed=False)[0] == components
+    # of minimum weight. Duplicates are summed by csr_matrix, so the reference is built from the lightest of each.
+    lightest = pandas.DataFrame({'r': rows, 'c': cols, 'w': weights}).groupby(['r', 'c'])['w'].min().reset_index()
+    assert weights[selected].sum() == pytest.approx(spanning_tree_weight(lightest['r'].values, lightest['c'].values,
+                                                                         lightest['w'].values, n))
+
+
+def test_boruvka_spanning_tree_ties():
+    # every edge has the same weight: ties are broken by edge order
+    rows = numpy.array([0, 1, 2, 0])
+    cols = numpy.array([1, 2, 3, 3])
+    selected = MarxanConnectEngine.boruvka_spanning_tree(rows, cols, numpy.ones(4), 4)
+    numpy.testing.assert_array_equal(selected, [True, True, True, False])
+
+
+def test_boruvka_spanning_tree_no_edges():
+    selected = MarxanConnectEngine.boruvka_spanning_tree(numpy.array([], dtype='int'), numpy.array([], dtype='int'),
+                                                         numpy.array([]), 3)
+    assert len(selected) == 0
+
+
+def test_min_plan_graph_methods():
+    ids, conmats = MarxanConnectEngine.read_conmat_sparse(hexflow, "Matrix")
+    kruskal = MarxanConnectEngine.min_plan_graph(conmats[None], "Kruskal")
+    boruvka = MarxanConnectEngine.min_plan_graph(conmats[None], "Boruvka")
+    assert kruskal.nnz == boruvka.nnz
+    assert (1.0 / kruskal.data).sum() == pytest.approx((1.0 / boruvka.data).sum())
+    # the tree keeps the strongest connections, so no other edge makes a cheaper one
+    undirected = scipy.sparse.triu(conmats[None] + conmats[None].T, k=1).tocsr()
+    undirected.data = 1.0 / undirected.data
+    assert (1.0 / kruskal.data).sum() == pytest.approx(scipy.sparse.csgraph.minimum_spanning_tree(undirected).sum())
+    with pytest.raises(Exception):
+        MarxanConnectEngine.min_plan_graph(conmats[None], "Prim")
+
+
+def test_boundary_conmat_mean(tmp_path):
+    # 1 -> 2 is listed in both habitats, 2 -> 1 only in one and 1 -> 3 is under the threshold in one of two
+    edges = pandas.DataFrame({'habitat': ['h1', 'h2', 'h1', 'h1', 'h2'],
+                              'id1': [1, 1, 2, 1, 1], 'id2': [2, 2, 1, 3, 3], 'value': [0.2, 0.4, 0.6, 0.1, 0.5]})
+    filepath = str(tmp_path / 'edges.csv')
+    edges.to_csv(filepath, index=False)
+    ids, conmat = MarxanConnectEngine.boundary_conmat(filepath, "Edge List with Habitat", hab_thresh=0.2)
+    assert list(ids) == ['1', '2', '3']
+    numpy.testing.assert_allclose(conmat.toarray(), [[0, 0.3, 0.25], [0.6, 0, 0], [0, 0, 0]])
+
+    # the time steps are averaged with the same rule for the boundary and the post-hoc graph
+    edges.rename(columns={'habitat': 'time'}).to_csv(filepath, index=False)
+    ids, conmat = MarxanConnectEngine.boundary_conmat(filepath, "Edge List with Time")
+    numpy.testing.assert_allclose(conmat.toarray(), [[0, 0.3, 0.3], [0.6, 0, 0], [0, 0, 0]])
+    posthoc_ids, posthoc = MarxanConnectEngine.posthoc_graph(filepath, "Edge List with Time")
+    numpy.testing.assert_array_equal(posthoc_ids, ids)
+    numpy.testing.assert_allclose(posthoc[None].toarray(), conmat.toarray())
+
+    # a file without any connection
+    edges.iloc[:0].to_csv(filepath, index=False)
+    ids, conmat = MarxanConnectEngine.boundary_conmat(filepath, "Edge List with Time")
+    assert len(ids) == 0 and conmat.nnz == 0
+
+
+def test_boundary_json(tmp_path):
+    filepath = str(tmp_path / 'conmat.csv')
+    pandas.DataFrame([[0, 0.5], [0.25, 0]], index=[1, 2], columns=[1, 2]).to_csv(filepath)
+    boundaries = {'conn_boundary_demo_pu': {'metric': 'conn_boundary', 'filepath': filepath, 'format': "Matrix"},
+                  'conn_boundary_land_pu': '{"columns":["id1","id2","boundary"],"index":[0],"data":[["1","2",1.0]]}',
+                  'min_plan_graph_demo_pu': {'metric': 'min_plan_graph', 'filepath': str(tmp_path / 'moved.csv'),
+                                             'format': "Matrix"}}
+    saved = MarxanConnectEngine.boundary_json(boundaries)
+    table = pandas.read_json(io.StringIO(saved['conn_boundary_demo_pu']), orient='split',
+                             dtype={'id1': str, 'id2': str})
+    assert table.to_dict('list') == {'id1': ['1', '2'], 'id2': ['2', '1'], 'boundary': [0.5, 0.25]}
+    # tables are saved as they are, and so are the boundaries whose connectivity matrix is gone
+    assert saved['conn_boundary_land_pu'] == boundaries['conn_boundary_land_pu']
+    assert saved['min_plan_graph_demo_pu'] == boundaries['min_plan_graph_demo_pu']
+
+
+def test_least_cost_connectivity():
+    # three planning units in a line: 0 -(1)- 1 -(2)- 2, so the least costs are 1, 2 and 3
+    graph = scipy.sparse.csr_matrix(([1.0, 2.0], ([0, 1], [1, 2])), shape=(3, 3))
+    ids = numpy.array(['a', 'b', 'c'])
+    shares = numpy.array([[1.0, 0.5], [1.0, 0.5], [1.0, 0.0]])
+    separate = MarxanConnectEngine.least_cost_connectivity({'h1': graph, 'h2': graph.copy()}, {'h1': 'h1', 'h2': 'h2'},
+                                                           ids, ['h1', 'h2'], shares, processes=1)
+    shared = MarxanConnectEngine.least_cost_connectivity({'g': graph}, {'h1': 'g', 'h2': 'g'}, ids, ['h1', 'h2'],
+                                                         shares, processes=1)
+    pandas.testing.assert_frame_equal(separate, shared)
+
+    # 1/cost^2, divided by the largest row sum (1 + 1/4, from 'b') and by the shares of the home habitat
+    inverse = numpy.array([[0, 1, 1 / 9], [1, 0, 1 / 4], [1 / 9, 1 / 4, 0]]) / 1.25
+    h1 = shared[shared['habitat'] == 'h1']
+    numpy.testing.assert_allclose(h1['value'], inverse[h1['id1'].map('abc'.index), h1['id2'].map('abc'.index)])
+    assert len(h1) == 6
+    h2 = shared[shared['habitat'] == 'h2']
+    assert list(zip(h2['id1'], h2['id2'])) == [('a', 'b'), ('b', 'a')]
+    numpy.testing.assert_allclose(h2['value'], [0.25 / 1.25, 0.25 / 1.25])
+
+    # a search bounded at a cost of 2 doesn't reach 'c' from 'a'
+    bounded = MarxanConnectEngine.least_cost_connectivity({'g': graph}, {'h1': 'g'}, ids, ['h1', 'h2'], shares,
+                                                          cutoff=2, processes=1)
+    assert ('a', 'c') not in set(zip(bounded['id1'], bounded['id2']))
+    assert set(bounded['habitat']) == {'h1'}
@@ -0,0 +1,164 @@
+"""
+Tests of the Marxan engines: the input file, the lock rules and the progress read from Marxan's output.
+"""
+import os
+import shutil
+
+import numpy
+import pytest
+
+import MarxanConnectEngine
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+tutorial = os.path.join(root, 'docs', 'tutorial', 'CF_demographic')
+
+
+@pytest.fixture
+def inputdat(tmp_path):
+    """
+    A copy of the tutorial's Marxan input file, with its input directory
+    """
+    shutil.copy(os.path.join(tutorial, 'input_connect.dat'), str(tmp_path))
+    shutil.copytree(os.path.join(tutorial, 'input'), str(tmp_path / 'input'))
+    os.mkdir(str(tmp_path / 'output'))
+    return MarxanConnectEngine.read_marxan_input(str(tmp_path / 'input_connect.dat'))
+
+
+def test_marxan_input_get(inputdat):
+    assert inputdat.get('BLM') == 0.2
+    assert inputdat.get('PROP') == 0.5
+    assert inputdat.get('NUMITNS') == 1000000
+    assert isinstance(inputdat.get('NUMITNS'), int)
+    assert inputdat.get('STARTTEMP') == -1.0
+    assert inputdat.get('SPECNAME') == 'spec_connect.dat'
+    assert inputdat.get('VERSION') == '0.1'
+    assert inputdat.get('BLOCKDEFNAME') is None
+    assert inputdat.get('BLOCKDEFNAME', 'blockdef.dat') == 'blockdef.dat'
+    assert 'SCENNAME' in inputdat and 'ASYMMETRICCONNECTIVITY' not in inputdat
+    assert inputdat.raw('PROP') == '5.00000000000000E-0001'
+    assert inputdat.validate() == []
+
+
+def test_marxan_input_round_trip(inputdat, tmp_path):
+    with open(inputdat.filepath, 'r', encoding='utf8') as file:
+        lines = file.readlines()
+
+    changed = inputdat.copy()
+    changed.set('BLM', 1.5)
+    changed.set('ASYMMETRICCONNECTIVITY', 1, after='BLM')
+    changed.remove('SAVELOG')
+    changed.write(str(tmp_path / 'changed.dat'))
+    # the copy is changed, not the cached file
+    assert inputdat.get('BLM') == 0.2
+
+    reread = MarxanConnectEngine.read_marxan_input(str(tmp_path / 'changed.dat'))
+    assert reread.get('BLM') == 1.5
+    assert reread.get('ASYMMETRICCONNECTIVITY') == 1
+    assert reread.index['ASYMMETRICCONNECTIVITY'] == reread.index['BLM'] + 1
+    assert 'SAVELOG' not in reread
+    # everything else, including the headings, is written as it was read
+    with open(str(tmp_path / 'changed.dat'), 'r', encoding='utf8') as file:
+        written = file.readlines()
+    assert [line for line in written if not line.startswith(('BLM', 'ASYMMETRICCONNECTIVITY'))] == \
+        [line for line in lines if not line.startswith(('BLM', 'SAVELOG'))]
+
+    inputdat.copy().write(str(tmp_path / 'same.dat'))
+    with open(str(tmp_path / 'same.dat'), 'r', encoding='utf8') as file:
+        assert file.readlines() == lines
+
+
+def test_marxan_input_output_files(inputdat, tmp_path):
+    assert inputdat.output_file('_best.txt') == os.path.join(str(tmp_path), 'output', 'connect_best.txt')
+    inputdat = inputdat.copy()
+    inputdat.set('NUMREPS', 3)
+    inputdat.set('SAVEBEST', 3)
+    assert inputdat.solution_files() == [os.path.join(str(tmp_path), 'output', name) for name in
+                                         ['connect_best.csv', 'connect_r00001.txt', 'connect_r00002.txt',
+                                          'connect_r00003.txt']]
+    inputdat.set('SAVERUN', 0)
+    assert inputdat.solution_files() == [os.path.join(str(tmp_path), 'output', 'connect_best.csv')]
+
+
+def test_marxan_input_validate(inputdat):
+    inputdat = inputdat.copy()
+    inputdat.set('NUMREPS', 'ten')
+    inputdat.set('PUNAME', 'missing.dat')
+    inputdat.set('OUTPUTDIR', 'missing')
+    problems = inputdat.validate()
+    assert len(problems) == 3
+    assert any('invalid value for NUMREPS' in problem for problem in problems)
+    assert any('PUNAME missing.dat' in problem for problem in problems)
+    assert any('output directory OUTPUTDIR missing' in problem for problem in problems)
+    with pytest.raises(ValueError):
+        inputdat.get('NUMREPS')
+
+
+def test_read_marxan_input_cache(inputdat):
+    assert MarxanConnectEngine.read_marxan_input(inputdat.filepath) is inputdat
+    with open(inputdat.filepath, 'a', encoding='utf8') as file:
+        file.write('ASYMMETRICCONNECTIVITY 1\n')
+    reread = MarxanConnectEngine.read_marxan_input(inputdat.filepath)
+    assert reread is not inputdat
+    assert reread.get('ASYMMETRICCONNECTIVITY') == 1
+
+
+def test_lock_status():
+    status = numpy.array([0, 0, 1, 0, 2])
+    assert MarxanConnectEngine.lock_status(status, []).tolist() == [0, 0, 1, 0, 2]
+
+    locked_in = [True, True, False, False, False]
+    locked_out = [False, True, True, False, False]
+    # later rules take precedence over earlier ones
+    assert MarxanConnectEngine.lock_status(status, [(locked_in, 2), (locked_out, 3)]).tolist() == [2, 3, 3, 0, 2]
+    assert MarxanConnectEngine.lock_status(status, [(locked_out, 3), (locked_in, 2)]).tolist() == [2, 2, 3, 0, 2]
+    # masks may be lists of 0 and 1, as the discrete features are
+    assert MarxanConnectEngine.lock_status(status, [([0, 0, 0, 1, 1], 3)]).tolist() == [0, 0, 1, 3, 3]
+    # the status isn't changed in place
+    assert status.tolist() == [0, 0, 1, 0, 2]
+
+
+def new_progress():
+    return {'run': 0, 'runs_done': 0, 'iteration': 0, 'complete': 0, 'score': None, 'best_run': None}
+
+
+def test_parse_marxan_line():
+    progress = new_progress()
+    assert not MarxanConnectEngine.parse_marxan_line("  Marxan v 2.43", progress)
+    assert progress == new_progress()
+
+    assert MarxanConnectEngine.parse_marxan_line("Run 1 ", progress)
+    assert (progress['run'], progress['runs_done']) == (1, 0)
+
+    assert MarxanConnectEngine.parse_marxan_line("  Init: Value 8390.5 Cost 8049.0 PUs 327", progress)
+    assert (progress['score'], progress['complete']) == (8390.5, 5)
+
+    assert MarxanConnectEngine.parse_marxan_line(" time 12 temp 1.23e+02 Complete 40% currval 1234.5", progress)
+    assert (progress['iteration'], progress['complete'], progress['score']) == (12, 40, 1234.5)
+
+    assert MarxanConnectEngine.parse_marxan_line("  ThermalAnnealing: Value 1000.0 Cost 900.0", progress)
+    assert (progress['score'], progress['complete']) == (1000.0, 90)
+
+    # the run is finished
+    assert MarxanConnectEngine.parse_marxan_line("Run 1 is finished (out of 3).", progress)
+    assert (progress['run'], progress['runs_done'], progress['complete']) == (1, 1, 0)
+
+    # a stage line which starts with the run starts the run, it isn't a run line
+    assert MarxanConnectEngine.parse_marxan_line("Run 2 Init: Value 9000.0 Cost 8000.0", progress)
+    assert (progress['run'], progress['runs_done'], progress['score'], progress['complete']) == (2, 1, 9000.0, 5)
+
+    assert MarxanConnectEngine.parse_marxan_line("end run 2", progress)
+    assert (progress['runs_done'], progress['complete']) == (2, 0)
+
+    progress['run'] = 3
+    assert MarxanConnectEngine.parse_marxan_line("Best solution is run 2", progress)
+    assert (progress['best_run'], progress['runs_done'], progress['complete']) == (2, 3, 0)
+
+
+def test_parse_marxan_line_stage_complete():
+    # the share completed never goes back within a run
+    progress = new_progress()
+    MarxanConnectEngine.parse_marxan_line("Run 1 Init: Value 10 Cost 10", progress)
+    MarxanConnectEngine.parse_marxan_line("Run 1 Iterative Improvement: Value 5 Cost 5", progress)
+    assert progress['complete'] == 100
+    MarxanConnectEngine.parse_marxan_line("Run 1 Init: Value 1e+02 Cost 100", progress)
+    assert (progress['complete'], progress['score']) == (100, 100.0)
@@ -0,0 +1,49 @@
+"""
+Tests of the post-hoc evaluation of many solutions at once.
+"""
+import numpy
+import pytest
+import scipy.sparse
+
+import MarxanConnectEngine
+
+ids = numpy.array(['1', '2', '3', '4'])
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """
+    Replaces the connectivity file with a chain 1 -> 2 -> 3 -> 4 (and 4 -> 4), or with the graphs given to 'set'
+    """
+    chain = scipy.sparse.csr_matrix(([0.5, 0.5, 0.5, 0.25], ([0, 1, 2, 3], [1, 2, 3, 3])), shape=(4, 4))
+    conmats = {None: chain}
+
+    def set(new):
+        conmats.clear()
+        conmats.update(new)
+    monkeypatch.setattr(MarxanConnectEngine, 'posthoc_graph', lambda filepath, matrixformat: (ids, conmats))
+    return set
+
+
+def test_calc_postHoc_replicates(graph):
+    tidy, distribution = MarxanConnectEngine.calc_postHoc_replicates('conmat.csv', "Edge List", [1, 2, 3, 4],
+                                                                     {'a': [1, 2, 3], 'b': [4], 'c': []})
+    values = tidy.set_index(['Metric', 'Solution'])['Value']
+    assert [values['Planning Units', s] for s in 'abc'] == [3, 1, 0]
+    assert [values['Connections', s] for s in 'abc'] == [2, 1, 0]
+    assert values['Eigenvalue', 'b'] == 0.25
+    assert list(tidy.columns) == ['Solution', 'Metric', 'Value', 'Planning Area', 'Percent']
+    assert distribution.set_index('Metric').loc['Planning Units', 'count'] == 3
+
+
+def test_calc_postHoc_replicates_empty(graph):
+    tidy, distribution = MarxanConnectEngine.calc_postHoc_replicates('conmat.csv', "Edge List", [1, 2, 3, 4], {})
+    assert len(tidy) == 0 and len(distribution) == 0
+    assert list(tidy.columns) == ['Solution', 'Metric', 'Value', 'Planning Area', 'Percent']
+
+    # a file with types but without any connection
+    graph({})
+    tidy, distribution = MarxanConnectEngine.calc_postHoc_replicates('conmat.csv', "Edge List with Type",
+                                                                     [1, 2, 3, 4], {'a': [1, 2]})
+    assert tidy['Metric'].tolist() == ['Planning Units'] and tidy['Value'].tolist() == [2]
+    assert len(distribution) == 1